@@ -4,26 +4,58 @@ Grid actions.
 Should be used in replay and undo features.
 """
 
+import sys
 from dataclasses import dataclass, field
 from layer_util import Layer
 from grid import Grid
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PaintStep:
 
     affected_grid_square: tuple[int, int]
     affected_layer: Layer
 
     def undo_apply(self, grid: Grid):
-        sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.erase(self.affected_layer)
+        grid.erase_cell(self.affected_grid_square[0], self.affected_grid_square[1], self.affected_layer)
 
     def redo_apply(self, grid: Grid):
-        sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.add(self.affected_layer)
+        grid.paint_cell(self.affected_grid_square[0], self.affected_grid_square[1], self.affected_layer)
 
 
-@dataclass
+class PaintSteps:
+    """
+    Shared steps of one canvas, keyed by (x, y, layer index). Steps are immutable, so every action
+    painting the same layer on the same square can hold the same step (and the same square tuple).
+    Owned by the window, which starts a new one on reset, so steps are only kept while it is in use.
+    """
+
+    def __init__(self) -> None:
+        self.steps = {}
+
+    def of(self, square: tuple[int, int], layer: Layer) -> PaintStep:
+        """
+        Returns the shared step for painting layer on square.
+        """
+        key = (square[0], square[1], layer.index)
+        step = self.steps.get(key)
+        if step is None:
+            step = PaintStep(square, layer)
+            self.steps[key] = step
+        return step
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Approximate bytes used by the shared steps and their squares. Every step adds the same
+        number of bytes, so this is O(1).
+        Actions only hold references to them, see PaintAction.memory_usage.
+        """
+        step = PaintStep((0, 0), None)
+        return {"shared_steps": sys.getsizeof(self.steps) + len(self.steps) * (
+            sys.getsizeof(step) + sys.getsizeof(step.affected_grid_square)
+        )}
+
+
+@dataclass(slots=True)
 class PaintAction:
 
     steps: list[PaintStep] = field(default_factory=list)
@@ -45,3 +77,15 @@ class PaintAction:
 
     def add_step(self, step: PaintStep):
         self.steps.append(step)
+
+    def nbytes(self) -> int:
+        """
+        Approximate bytes used by the action and its list of steps.
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.steps)
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Approximate bytes used by the action and its list of steps.
+        """
+        return {"history": self.nbytes()}
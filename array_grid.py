@@ -0,0 +1,233 @@
+from __future__ import annotations
+import sys
+import numpy as np
+from data_structures.referential_array import ArrayR
+from grid import Grid, GridColumn
+from layer_store import GridContext, LayerStore, SetLayerStore
+from layer_util import Layer, get_layers
+from memory import array_bytes, object_bytes
+
+class ArraySetGrid(Grid):
+    """
+    SET style grid stored as arrays instead of one SetLayerStore per cell.
+    Each cell takes one byte for the index of its layer (-1 when empty) and one byte for its
+    special flag, and grid-wide operations are single array operations or O(1).
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    EMPTY = -1
+
+    # the only draw style the arrays can hold
+    DRAW_STYLE_OPTIONS = (Grid.DRAW_STYLE_SET,)
+
+    def __init__(self, draw_style: str, x: int, y: int) -> None:
+        """
+        Description: Initialise the array backed grid object.
+
+        Args:
+        - draw_style: Style with which colours will be drawn, must be DRAW_STYLE_SET
+        - x: x dimension of the grid
+        - y: y dimension of the grid
+
+        Raises:
+        - ValueError: if draw_style is not DRAW_STYLE_SET
+
+        Time complexity:
+        Best = Worst case: O(x*y) for filling the arrays, done in numpy rather than per store
+        """
+        if draw_style not in ArraySetGrid.DRAW_STYLE_OPTIONS:
+            raise ValueError(f"ArraySetGrid only supports the {Grid.DRAW_STYLE_SET} draw style")
+        self.draw_style = draw_style
+        self.x = x
+        self.y = y
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+
+        # layer index of every cell, EMPTY if no layer is stored
+        self.layers = np.full((x, y), ArraySetGrid.EMPTY, dtype=np.int8)
+
+        # special flag of every cell, True if the colour should be inverted
+        self.inverted = np.zeros((x, y), dtype=np.bool_)
+
+        # grid-wide specials invert every cell again
+        self.context = GridContext()
+
+        # cells changed since the renderer last took them, see take_dirty
+        self.dirty = set()
+        self.all_dirty = True
+
+        # O(x)
+        self.grid = ArrayR(x)
+        for i in range(len(self.grid)):
+            self.grid[i] = GridColumn(self, i)
+
+    def cell(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return a store view of a single cell
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - store view reading and writing the arrays at (x, y)
+        """
+        return ArraySetCell(self, x, y)
+
+    def memory_usage(self) -> dict[str, dict[str, int]]:
+        """
+        Description: Approximate bytes used by the grid, keyed by draw style and split by category
+
+        Time complexity:
+        Best = Worst case: O(1), the column views all have the same size
+        """
+        return {self.draw_style: {
+            "grid": object_bytes(self) + array_bytes(self.grid) + self.column_views_bytes(),
+            "layer_arrays": self.layers.nbytes,
+            "bitsets": self.inverted.nbytes,
+        }}
+
+    def clear(self) -> None:
+        """
+        Description: Empty every cell in place
+
+        Time complexity:
+        Best = Worst case: O(x*y), as numpy fills of the existing arrays
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.context.special_count = 0
+        self.mark_all_dirty()
+        self.layers.fill(ArraySetGrid.EMPTY)
+        self.inverted.fill(False)
+
+    def reinitialise(self, draw_style: str) -> None:
+        """
+        Description: Empty the grid
+
+        Args:
+        - draw_style: Style with which colours will be drawn, must be DRAW_STYLE_SET
+
+        Raises:
+        - ValueError: if draw_style is not DRAW_STYLE_SET
+        """
+        if draw_style not in ArraySetGrid.DRAW_STYLE_OPTIONS:
+            raise ValueError(f"ArraySetGrid only supports the {Grid.DRAW_STYLE_SET} draw style")
+        self.clear()
+
+    def special(self):
+        """
+        Description: Activate the special affect on all grid squares.
+
+        Time complexity:
+        Best = Worst case: O(1), only the special count of the grid context changes
+        """
+        self.mark_all_dirty()
+        self.context.special_count += 1
+
+
+class ArraySetCell(LayerStore):
+    """
+    SetLayerStore interface over one cell of an ArraySetGrid.
+    """
+
+    __slots__ = ("grid", "x", "y")
+
+    def __init__(self, grid: ArraySetGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        """
+        Description: Set the layer of the cell.
+
+        Args:
+        - layer: one of the layer types in layers.py
+
+        Returns:
+        - True if the cell was actually changed
+        """
+        if self.grid.layers[self.x, self.y] != layer.index:
+            self.grid.layers[self.x, self.y] = layer.index
+            return True
+        return False
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: applies the layer of the cell to the start colour, then inverts it if special is on
+
+        Args:
+        - start: initial color of pixel
+        - timestamp: timestamp of pixel
+        - x: x coordinate of pixel
+        - y: y coordinate of pixel
+
+        Returns:
+        - colour this square should show, given the current layers
+
+        Complexity:
+        - Best case: O(1), when no layer is stored
+        - Worst case: O(apply)
+        """
+        index = int(self.grid.layers[self.x, self.y])
+        if index == ArraySetGrid.EMPTY:
+            color = start
+        else:
+            color = get_layers()[index].apply(start, timestamp, x, y)
+        if self.grid.inverted[self.x, self.y] != self.grid.context.is_special():
+            color = (255-color[0], 255-color[1], 255-color[2])
+        return color
+
+    def erase(self, layer: Layer) -> bool:
+        """
+        Description: Remove the layer of the cell.
+
+        Args:
+        - layer: one of the layer types in layers.py
+
+        Returns:
+        - True if the cell was actually changed
+        """
+        if self.grid.layers[self.x, self.y] != ArraySetGrid.EMPTY:
+            self.grid.layers[self.x, self.y] = ArraySetGrid.EMPTY
+            return True
+        return False
+
+    def layer_indices(self) -> list[int]:
+        index = int(self.grid.layers[self.x, self.y])
+        return [] if index == ArraySetGrid.EMPTY else [index]
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: Same as get_color, cells of an ArraySetGrid have no colour cache
+        """
+        return self.get_color(start, timestamp, x, y)
+
+    def special(self):
+        """
+        Description: Toggle the inversion of this cell's colour
+        """
+        self.grid.inverted[self.x, self.y] = not self.grid.inverted[self.x, self.y]
+
+    def copy(self) -> SetLayerStore:
+        """
+        Description: Returns a standalone SetLayerStore with the cell's layer, inverted as the cell
+        currently is, grid-wide specials included
+        """
+        store = SetLayerStore()
+        store.layer = int(self.grid.layers[self.x, self.y])
+        store.is_special = bool(self.grid.inverted[self.x, self.y]) != self.grid.context.is_special()
+        return store
+
+    def clear(self) -> None:
+        """
+        Description: Remove the layer and the inversion of the cell
+        """
+        self.grid.layers[self.x, self.y] = ArraySetGrid.EMPTY
+        self.grid.inverted[self.x, self.y] = False
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Bytes used by the view, the cell's bytes are counted by the grid
+        """
+        return {"views": sys.getsizeof(self)}
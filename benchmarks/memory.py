@@ -0,0 +1,69 @@
+"""
+Memory benchmark for paint history and layer stores.
+
+Measures the bytes allocated per PaintStep recorded by on_paint, comparing the
+old representation (a regular dataclass and a fresh (x, y) tuple per step) with
+shared slotted PaintSteps, and the bytes per empty layer store.
+
+Usage: python -m benchmarks.memory
+"""
+
+from __future__ import annotations
+import tracemalloc
+from dataclasses import dataclass
+from action import PaintAction, PaintSteps
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from layer_util import Layer, get_layers
+
+GRID_SIZE = 32
+STROKES = 20
+
+
+@dataclass
+class DictPaintStep:
+    """ PaintStep as it was before, with a per-instance __dict__. """
+
+    affected_grid_square: tuple[int, int]
+    affected_layer: Layer
+
+
+def measure(build) -> int:
+    """ Returns the bytes still allocated by the result of build(). """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def paint_history(make_step) -> list[PaintAction]:
+    """ Paints every cell of the grid STROKES times, cycling through the layers. """
+    layers = [layer for layer in get_layers() if layer is not None]
+    actions = []
+    for stroke in range(STROKES):
+        action = PaintAction()
+        layer = layers[stroke % len(layers)]
+        for x in range(GRID_SIZE):
+            for y in range(GRID_SIZE):
+                action.add_step(make_step((x, y), layer))
+        actions.append(action)
+    return actions
+
+
+def main() -> None:
+    steps = GRID_SIZE * GRID_SIZE * STROKES
+    before = measure(lambda: paint_history(DictPaintStep))
+    after = measure(lambda: paint_history(PaintSteps().of))
+    print(f"{steps} paint steps")
+    print(f"  dataclass + tuple per step: {before / steps:8.1f} bytes/step")
+    print(f"  shared slotted steps:       {after / steps:8.1f} bytes/step")
+    for store_type in (SetLayerStore, AdditiveLayerStore, SequenceLayerStore):
+        n = GRID_SIZE * GRID_SIZE
+        size = measure(lambda: [store_type() for _ in range(n)])
+        print(f"  {store_type.__name__ + ':':27} {size / n:8.1f} bytes/store")
+
+
+if __name__ == "__main__":
+    main()
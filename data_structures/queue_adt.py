@@ -100,6 +100,100 @@ class CircularQueue(Queue[T]):
         self.rear = 0
 
 
+class GrowableCircularQueue(CircularQueue[T]):
+    """ Circular queue whose array starts small and doubles when full.
+    The array is halved again once the queue drops to a quarter of it.
+
+    Attributes:
+         initial_capacity (int): the array never shrinks below this size
+         max_capacity (int): the queue is full once it holds this many elements
+    """
+    GROWTH_FACTOR = 2
+
+    def __init__(self, initial_capacity: int, max_capacity: int) -> None:
+        CircularQueue.__init__(self, initial_capacity)
+        self.initial_capacity = len(self.array)
+        self.max_capacity = max_capacity
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue, growing the array if needed.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        :raises Exception: if the queue holds max_capacity elements
+        """
+        if self.is_full():
+            raise Exception("Queue is full")
+        if len(self) == len(self.array):
+            self._resize(min(self.max_capacity, len(self.array) * self.GROWTH_FACTOR))
+        CircularQueue.append(self, item)
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front, shrinking the array if needed.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        :raises Exception: if the queue is empty
+        """
+        item = CircularQueue.serve(self)
+        if len(self.array) > self.initial_capacity and len(self) <= len(self.array) // 4:
+            self._resize(max(self.initial_capacity, len(self.array) // self.GROWTH_FACTOR))
+        return item
+
+    def append_front(self, item: T) -> None:
+        """ Adds an element in front of the queue's front, so it is served next.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        :raises Exception: if the queue holds max_capacity elements
+        """
+        if self.is_full():
+            raise Exception("Queue is full")
+        if len(self) == len(self.array):
+            self._resize(min(self.max_capacity, len(self.array) * self.GROWTH_FACTOR))
+        self.front = (self.front - 1) % len(self.array)
+        self.array[self.front] = item
+        self.length += 1
+
+    def serve_rear(self) -> T:
+        """ Deletes and returns the element at the queue's rear, i.e. the last one appended.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        self.rear = (self.rear - 1) % len(self.array)
+        item = self.array[self.rear]
+        if len(self.array) > self.initial_capacity and len(self) <= len(self.array) // 4:
+            self._resize(max(self.initial_capacity, len(self.array) // self.GROWTH_FACTOR))
+        return item
+
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element at position index counted from the front, without serving it.
+        :complexity: O(1)
+        :raises IndexError: if index is not in [0, len(self))
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("No such index in the queue")
+        return self.array[(self.front + index) % len(self.array)]
+
+    def is_full(self) -> bool:
+        """ True if the queue holds max_capacity elements. """
+        return len(self) >= self.max_capacity
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue and releases the grown array. """
+        CircularQueue.clear(self)
+        if len(self.array) > self.initial_capacity:
+            self.array = ArrayR(self.initial_capacity)
+
+    def _resize(self, capacity: int) -> None:
+        """ Moves the elements, front first, into an array of the given capacity.
+        :complexity: O(capacity)
+        """
+        new_array = ArrayR(capacity)
+        for i in range(len(self)):
+            new_array[i] = self.array[(self.front + i) % len(self.array)]
+        self.array = new_array
+        self.front = 0
+        self.rear = len(self) % capacity
+
+
 class TestQueue(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
@@ -184,6 +278,55 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+class TestGrowableCircularQueue(unittest.TestCase):
+    """ Tests for the growable queue."""
+
+    def test_grow_and_shrink(self):
+        queue = GrowableCircularQueue(2, 100)
+        for i in range(50):
+            queue.append(i)
+        self.assertEqual(len(queue), 50)
+        self.assertEqual(len(queue.array), 64)
+        for i in range(45):
+            self.assertEqual(queue.serve(), i)
+        self.assertLessEqual(len(queue.array), 16)
+        for i in range(45, 50):
+            self.assertEqual(queue.serve(), i)
+        self.assertTrue(queue.is_empty())
+        self.assertEqual(len(queue.array), 2)
+
+    def test_wrap_around(self):
+        queue = GrowableCircularQueue(4, 100)
+        for i in range(3):
+            queue.append(i)
+        queue.serve()
+        for i in range(3, 8):
+            queue.append(i)
+        for i in range(1, 8):
+            self.assertEqual(queue.serve(), i)
+
+    def test_both_ends(self):
+        queue = GrowableCircularQueue(2, 100)
+        for i in range(5):
+            queue.append(i)
+        for i in range(-1, -6, -1):
+            queue.append_front(i)
+        self.assertEqual([queue[i] for i in range(len(queue))], [-5, -4, -3, -2, -1, 0, 1, 2, 3, 4])
+        self.assertEqual(queue.serve_rear(), 4)
+        self.assertEqual(queue.serve(), -5)
+        for i in range(3, -1, -1):
+            self.assertEqual(queue.serve_rear(), i)
+        self.assertEqual(queue.serve(), -4)
+        self.assertEqual(len(queue), 3)
+        self.assertRaises(IndexError, queue.__getitem__, 3)
+
+    def test_max_capacity(self):
+        queue = GrowableCircularQueue(1, 3)
+        for i in range(3):
+            queue.append(i)
+        self.assertTrue(queue.is_full())
+        self.assertRaises(Exception, queue.append, 3)
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import os
+from collections.abc import Iterator
+import numpy as np
+from frame_buffer import FrameBuffer
+from grid import Grid
+from replay import ReplayTracker
+
+class ReplayExporter:
+    """
+    Plays a replay on a grid without a window and streams the frames to disk, as a PNG sequence or
+    an animated GIF. Only the current frame is held in memory, and each frame only recomputes the
+    cells changed since the previous one (see FrameBuffer).
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    # seconds of canvas time per action, as MyWindow.REPLAY_TIMER_DELTA
+    ACTION_DELTA = 0.05
+
+    def __init__(
+        self, actions_per_frame: int = 1, cell_size: int = 1, bg: tuple[int, int, int] = (255, 255, 255),
+        action_delta: float = ACTION_DELTA,
+    ) -> None:
+        """
+        Description: Initialise the exporter
+
+        Args:
+        - actions_per_frame: number of replay actions played between two frames
+        - cell_size: width and height in pixels of every cell
+        - bg: colour of an empty cell
+        - action_delta: canvas time between two actions, for time dependent layers
+
+        Raises:
+        - ValueError: if actions_per_frame or cell_size is less than 1
+        """
+        if actions_per_frame < 1 or cell_size < 1:
+            raise ValueError("actions_per_frame and cell_size must be at least 1")
+        self.actions_per_frame = actions_per_frame
+        self.cell_size = cell_size
+        self.bg = bg
+        self.action_delta = action_delta
+
+    def frames(self, tracker: ReplayTracker, grid: Grid) -> Iterator[np.ndarray]:
+        """
+        Description: Play the whole replay on grid, yielding a frame after every actions_per_frame actions
+        and after the last one
+
+        Args:
+        - tracker: replay to play, it is drained
+        - grid: empty grid to play the replay on
+
+        Returns:
+        - iterator of (y*cell_size, x*cell_size, 3) uint8 arrays, laid out like Grid.render
+
+        Time complexity:
+        Best = Worst case: O(n*apply + f*(d*get_color + x*y*cell_size**2)), for n actions, f frames and
+        d dirty or live cells per frame
+        """
+        tracker.start_replay()
+        buffer = FrameBuffer(grid.x, grid.y)
+        played = 0
+        finished = False
+        while not finished:
+            batch = 0
+            while batch < self.actions_per_frame:
+                finished = tracker.play_next_action(grid)
+                if finished:
+                    break
+                batch += 1
+            if batch > 0:
+                played += batch
+                buffer.update(grid, played * self.action_delta, self.bg)
+                yield buffer.frame(self.cell_size)
+
+    def export_png(self, tracker: ReplayTracker, grid: Grid, directory: str, prefix: str = "frame") -> int:
+        """
+        Description: Write the replay as numbered PNG files, e.g. frame000000.png
+
+        Args:
+        - tracker: replay to play, it is drained
+        - grid: empty grid to play the replay on
+        - directory: folder for the files, created if needed
+        - prefix: start of every file name
+
+        Returns:
+        - number of frames written
+        """
+        from PIL import Image  # installed with arcade
+
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for frame in self.frames(tracker, grid):
+            Image.fromarray(frame).save(os.path.join(directory, f"{prefix}{count:06d}.png"))
+            count += 1
+        return count
+
+    def export_gif(self, tracker: ReplayTracker, grid: Grid, path: str, duration: int = 50, loop: int = 0) -> int:
+        """
+        Description: Write the replay as an animated GIF, encoding each frame as soon as it is made.
+        Every frame has its own 256 colour palette.
+
+        Args:
+        - tracker: replay to play, it is drained
+        - grid: empty grid to play the replay on
+        - path: file to write
+        - duration: milliseconds each frame is shown, GIF rounds it down to 10ms steps
+        - loop: number of times the animation repeats, 0 for forever
+
+        Returns:
+        - number of frames written
+        """
+        from PIL import GifImagePlugin, Image  # installed with arcade
+
+        count = 0
+        with open(path, "wb") as file:
+            for frame in self.frames(tracker, grid):
+                image = Image.fromarray(frame).quantize(256)
+                if count == 0:
+                    header, _ = GifImagePlugin.getheader(image, info={"loop": loop, "duration": duration})
+                    for block in header:
+                        file.write(block)
+                for block in GifImagePlugin.getdata(image, duration=duration, include_color_table=True):
+                    file.write(block)
+                count += 1
+            file.write(b";")  # trailer
+        return count
@@ -0,0 +1,386 @@
+from __future__ import annotations
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from grid import Grid
+from layer_store import GridContext
+from layer_util import get_layers
+from layers import rainbow_resolution
+
+class CellRenderer(ABC):
+    """
+    Keeps a picture of a grid up to date between frames. Colours are only recomputed for the cells
+    the grid reports as dirty (see Grid.take_dirty), and for live cells, which hold time dependent
+    layers (see layer_util.traits). Only cells in the region, e.g. the visible ones, are recomputed.
+    Subclasses decide where the colours go, see refresh.
+
+    Each renderer has its own resolution for the hues of the rainbow layer, see layers.rainbow_resolution.
+    Stores cache their colour along with the resolution it was computed at, so renderers of different
+    resolutions can draw the same grid.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, x: int, y: int, hue_steps: int|None = None) -> None:
+        """
+        Description: Initialise the renderer for a grid of x by y cells
+
+        Args:
+        - hue_steps: number of rainbow hues looked up from a table, None to compute them exactly
+
+        Raises:
+        - ValueError: if hue_steps is not a positive multiple of 20
+        """
+        self.x = x
+        self.y = y
+        self.hue_steps = hue_steps
+        with rainbow_resolution(hue_steps):
+            pass  # checks hue_steps
+
+        # cells x0 <= x < x1, y0 <= y < y1 kept up to date, as (x0, y0, x1, y1)
+        self.region = (0, 0, x, y)
+
+        # True if every cell of the region should be recomputed on the next update
+        self.stale = True
+
+        # cells of the region with time dependent layers, recomputed every frame
+        self.live = set()
+
+    def set_region(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """
+        Description: Only keep the cells x0 <= x < x1, y0 <= y < y1 up to date from now on
+        """
+        if (x0, y0, x1, y1) != self.region:
+            self.region = (x0, y0, x1, y1)
+            self.stale = True
+
+    def update(self, grid: Grid, timestamp: float, bg: tuple[int, int, int]) -> int:
+        """
+        Description: Recompute the colour of the dirty and live cells of the region and refresh the cells
+        whose colour changed
+
+        Args:
+        - grid: grid being drawn, with the same dimensions as the renderer
+        - timestamp: timestamp of the frame
+        - bg: colour of an empty cell
+
+        Returns:
+        - number of cells refreshed
+
+        Time complexity:
+        Best case: O(1), when no cell is dirty or live
+        Worst case: O(r*(get_color+layer_indices)), when every cell is dirty, where r is the number of cells
+        in the region
+        """
+        dirty = grid.take_dirty()
+        full = dirty is None or self.stale
+        if full:
+            self.stale = False
+            self.live = set()
+        cells = self.pending(dirty, full)
+
+        layers = get_layers()
+        changed = 0
+        with rainbow_resolution(self.hue_steps):
+            for i, j in cells:
+                store = grid[i][j]
+                if full or (i, j) in dirty:
+                    # the layers of the cell may have changed
+                    if any(layers[index].time_dependent for index in store.layer_indices()):
+                        self.live.add((i, j))
+                    else:
+                        self.live.discard((i, j))
+                if self.refresh(i, j, store.get_color(bg[:], timestamp, i, j)):
+                    changed += 1
+        return changed
+
+    def pending(self, dirty: set[tuple[int, int]]|None, full: bool):
+        """
+        Description: Returns the cells to recompute: every cell of the region if full, otherwise the dirty
+        cells of the region and the live cells
+
+        Time complexity:
+        Best = Worst case: O(r) if full, O(dirty+live) otherwise
+        """
+        x0, y0, x1, y1 = self.region
+        if full:
+            return ((i, j) for i in range(x0, x1) for j in range(y0, y1))
+        return {(i, j) for i, j in dirty if x0 <= i < x1 and y0 <= j < y1} | self.live
+
+    @abstractmethod
+    def refresh(self, x: int, y: int, color: tuple[int, int, int]) -> bool:
+        """
+        Show a new colour for a cell.
+        Returns true if the colour differs from the one shown.
+        """
+        pass
+
+
+class FrameBuffer(CellRenderer):
+    """
+    Headless picture of a grid as an RGB array, laid out like Grid.render, updated in place from
+    one frame to the next.
+    """
+
+    def __init__(self, x: int, y: int, hue_steps: int|None = None) -> None:
+        """
+        Description: Initialise a black frame of x by y cells, see CellRenderer for hue_steps
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        CellRenderer.__init__(self, x, y, hue_steps)
+        self.image = np.zeros((y, x, 3), dtype=np.uint8)
+
+        # cells refreshed since the last take_changed
+        self.changed = set()
+
+    def refresh(self, x: int, y: int, color: tuple[int, int, int]) -> bool:
+        """
+        Description: Write the colour of a cell into the frame, if it changed
+        """
+        pixel = self.image[self.y-1-y, x]
+        if pixel[0] == color[0] and pixel[1] == color[1] and pixel[2] == color[2]:
+            return False
+        pixel[:] = color
+        self.changed.add((x, y))
+        return True
+
+    def take_changed(self) -> set[tuple[int, int]]:
+        """
+        Description: Returns the cells refreshed since the last call
+        """
+        changed = self.changed
+        self.changed = set()
+        return changed
+
+    def frame(self, cell_size: int = 1) -> np.ndarray:
+        """
+        Description: Returns a copy of the frame with every cell cell_size pixels wide and high
+
+        Time complexity:
+        Best = Worst case: O(x*y*cell_size**2)
+        """
+        if cell_size > 1:
+            return self.image.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+        return self.image.copy()
+
+
+class GridSnapshot:
+    """
+    Copies of the stores of the cells of a grid, taken while the grid is locked, so that colours can be
+    computed from them while the grid keeps changing. Only the dirty cells are copied again each time.
+    Reads like a grid for CellRenderer.update: snapshot[x][y] and take_dirty.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, x: int, y: int) -> None:
+        self.x = x
+        self.y = y
+
+        # columns[x][y] is the copied store of a cell of the region
+        self.columns = {}
+
+        # dirty cells of the last capture, None if every cell was copied
+        self.dirty = None
+
+    def capture(self, grid: Grid, region: tuple[int, int, int, int], full: bool) -> None:
+        """
+        Description: Copy the stores of the cells of the region that changed since the last capture,
+        or of every cell of the region if full or if the grid has no record of its dirty cells.
+        The grid must not change during the capture.
+
+        Time complexity:
+        Best case: O(d*copy), where d is the number of dirty cells in the region
+        Worst case: O(r*copy), when every cell is copied, where r is the number of cells in the region
+        """
+        dirty = grid.take_dirty()
+        x0, y0, x1, y1 = region
+        if dirty is None or full:
+            self.columns = {}
+            cells = ((i, j) for i in range(x0, x1) for j in range(y0, y1))
+            dirty = None
+        else:
+            cells = [(i, j) for i, j in dirty if x0 <= i < x1 and y0 <= j < y1]
+
+        # grid-wide specials keep changing the grid's contexts, so the copies get frozen ones
+        contexts = {}
+        for i, j in cells:
+            store = grid[i][j].copy()
+            if store.context is not None:
+                if id(store.context) not in contexts:
+                    frozen = GridContext()
+                    frozen.special_count = store.context.special_count
+                    contexts[id(store.context)] = frozen
+                store.context = contexts[id(store.context)]
+            self.columns.setdefault(i, {})[j] = store
+        self.dirty = dirty
+
+    def take_dirty(self) -> set[tuple[int, int]]|None:
+        """
+        Description: Returns the dirty cells of the last capture, None if every cell was copied
+        """
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    def __getitem__(self, x: int) -> dict:
+        return self.columns[x]
+
+
+class FrameWorker:
+    """
+    Computes the colours of a grid on a background thread, so slow layers don't hold up drawing.
+
+    Code changing the grid must hold lock. The worker only holds it to copy the stores of the cells
+    changed since the last frame into a GridSnapshot, then computes the colours from the copies
+    without the lock, so every frame comes from one consistent state of the grid and painting is
+    never blocked by a slow frame. The finished frame is copied into the back buffer, which is then
+    swapped with the front buffer under swap_lock. The window only reads the front buffer under
+    swap_lock (see present and frame), so it never sees a half-written frame.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, grid: Grid, bg: tuple[int, int, int], hue_steps: int|None = None) -> None:
+        """
+        Description: Initialise the worker, start must be called to run it
+
+        Args:
+        - grid: grid to compute the frames of
+        - bg: colour of an empty cell
+        - hue_steps: resolution of the rainbow hues of the frames, see CellRenderer
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        self.grid = grid
+        self.bg = bg
+
+        # held while the grid is copied by the worker or changed by anyone else
+        self.lock = threading.RLock()
+
+        # updated incrementally by the worker, then copied to the back buffer
+        self.work = FrameBuffer(grid.x, grid.y, hue_steps)
+
+        # copies of the cells the worker reads, only touched by the worker thread
+        self.snapshot = GridSnapshot(grid.x, grid.y)
+
+        # guards front, back, changed and frames
+        self.swap_lock = threading.Lock()
+        self.front = np.zeros_like(self.work.image)
+        self.back = np.zeros_like(self.work.image)
+
+        # cells whose colour changed in frames not presented yet, every cell at first
+        self.changed = {(x, y) for x in range(grid.x) for y in range(grid.y)}
+
+        # number of frames swapped in
+        self.frames = 0
+
+        # region of the grid to compute, see CellRenderer.set_region
+        self.region = self.work.region
+
+        self.timestamp = 0
+        self.requested = threading.Event()
+        self.swapped = threading.Event()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        """
+        Description: Start the worker thread
+        """
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Description: Ask the worker thread to finish. It is not waited for, as the caller may hold lock.
+        """
+        self.stopped = True
+        self.requested.set()
+
+    def request(self, timestamp: float, region: tuple[int, int, int, int]|None = None) -> None:
+        """
+        Description: Ask for a frame at a timestamp. Requests made while a frame is computed are merged.
+
+        Args:
+        - timestamp: timestamp of the frame
+        - region: (x0, y0, x1, y1) cells to compute, e.g. the visible ones, None to keep the current one
+        """
+        if region is not None:
+            self.region = region
+        self.timestamp = timestamp
+        self.requested.set()
+
+    def run(self) -> None:
+        """
+        Description: Compute a frame for every request until stopped
+
+        Time complexity:
+        Best = Worst case: O(x*y) per frame for the copy, plus the update of the dirty and live cells of the region.
+        The lock is only held for GridSnapshot.capture.
+        """
+        while True:
+            self.requested.wait()
+            self.requested.clear()
+            self.work.set_region(*self.region)
+            full = self.work.stale
+            with self.lock:
+                if self.stopped:
+                    return
+                self.snapshot.capture(self.grid, self.work.region, full)
+            self.work.update(self.snapshot, self.timestamp, self.bg)
+            changed = self.work.take_changed()
+            if full:
+                # the window may be showing other cells than the ones refreshed, so send the whole region
+                x0, y0, x1, y1 = self.work.region
+                changed = {(x, y) for x in range(x0, x1) for y in range(y0, y1)}
+            np.copyto(self.back, self.work.image)
+            with self.swap_lock:
+                self.front, self.back = self.back, self.front
+                self.changed |= changed
+                self.frames += 1
+            self.swapped.set()
+
+    def wait(self, timeout: float|None = None) -> bool:
+        """
+        Description: Wait for the next frame to be swapped in
+
+        Returns:
+        - True if a frame was swapped in before the timeout
+        """
+        swapped = self.swapped.wait(timeout)
+        self.swapped.clear()
+        return swapped
+
+    def present(self, renderer: CellRenderer) -> int:
+        """
+        Description: Refresh the cells of renderer that changed since the last call, from the front buffer.
+        Every cell is refreshed on the first call after the first frame.
+
+        Returns:
+        - number of cells refreshed
+
+        Time complexity:
+        Best = Worst case: O(c), where c is the number of changed cells
+        """
+        with self.swap_lock:
+            if self.frames == 0:
+                return 0  # nothing computed yet
+            for x, y in self.changed:
+                pixel = self.front[self.grid.y-1-y, x]
+                renderer.refresh(x, y, (int(pixel[0]), int(pixel[1]), int(pixel[2])))
+            count = len(self.changed)
+            self.changed = set()
+        return count
+
+    def frame(self) -> np.ndarray:
+        """
+        Description: Returns a copy of the latest frame, laid out like Grid.render
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        with self.swap_lock:
+            return self.front.copy()
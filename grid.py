@@ -1,6 +1,9 @@
 from __future__ import annotations
+import sys
+import numpy as np
 from data_structures.referential_array import ArrayR
 from layer_store import *
+from memory import array_bytes, change, merge, object_bytes
 
 class Grid:
     """
@@ -44,37 +47,165 @@ class Grid:
         self.y = y
         self.brush_size = Grid.DEFAULT_BRUSH_SIZE
 
+        # shared by every store of the grid
+        self.context = GridContext()
+
+        # O(x*y*comp)
+        self.grid = self.build_stores()
+
+        # grids of other draw styles, kept to be reused by reinitialise
+        self.pools = {}
+
+        # running memory_usage of the stores of each draw style, so memory_usage is O(1).
+        # The current one is shared with the stores through the context, see GridContext.usage.
+        self.usage = {}
+        self.count_usage()
+
+        # cells changed since the renderer last took them, see take_dirty
+        self.dirty = set()
+        self.all_dirty = True
+
+    def build_stores(self) -> ArrayR[ArrayR[LayerStore]]:
+        """
+        Description: Create the 2 dimensional array of empty stores for the grid's draw style
+
+        Returns:
+        - array of x columns, each an array of y stores
+
+        Time complexity:
+        Best = Worst case: O(x*y*comp), see __init__
+        """
         # setting up 1 dimensional grid
         # O(x), since time complexity of an ArrayR(CAPACITY) is O(CAPACITY)
-        self.grid = ArrayR(x)
+        grid = ArrayR(self.x)
 
         # setting up 2 dimensional grid
         # O(x), since len(grid) is same as capacity of the array, which is x.
         # Number of iterations depends on this input size, thus effects run time
-        for i in range(len(self.grid)):
+        for i in range(len(grid)):
 
             # O(y), since time complexity of an ArrayR(CAPACITY) is O(CAPACITY)
-            array_y = ArrayR(y)
+            array_y = ArrayR(self.y)
 
             # each cell in array y stores a layer
             # O(y), since number of iterations depends on this input size, thus effects run time
             for j in range(len(array_y)):
 
                 # O(comp)
-                if self.draw_style == Grid.DRAW_STYLE_SET:
-                    array_y[j] = SetLayerStore()
+                array_y[j] = self.new_store()
 
-                # O(comp)
-                elif self.draw_style == Grid.DRAW_STYLE_ADD:
-                    array_y[j] = AdditiveLayerStore()
+            # each cell in the array x stores an array y
+            grid[i] = array_y
+        return grid
 
-                # O(comp)
-                elif self.draw_style == Grid.DRAW_STYLE_SEQUENCE:
-                    array_y[j] = SequenceLayerStore()
+    def clear(self) -> None:
+        """
+        Description: Empty every store in place and reset the brush, without allocating new stores
 
-            # each cell in the array x stores an array y
-            self.grid[i] = array_y
+        Time complexity:
+        Best = Worst case: O(x*y*clear), where clear is the complexity of the store's clear
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.context.special_count = 0
+        self.mark_all_dirty()
+        for x_cell in range(self.x):
+            column = self.grid[x_cell]
+            for y_cell in range(self.y):
+                column[y_cell].clear()
+        self.count_usage()
 
+    def reinitialise(self, draw_style: str) -> None:
+        """
+        Description: Empty the grid and switch it to a draw style. The stores of the previous style are
+        kept, so switching back to it later reuses them instead of allocating new ones.
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+
+        Time complexity:
+        Best case: O(x*y*clear), when the draw style was used by this grid before
+        Worst case: O(x*y*comp), when stores of the draw style have to be created
+        """
+        if draw_style != self.draw_style:
+            self.pools[self.draw_style] = self.grid
+            self.draw_style = draw_style
+            if draw_style in self.pools:
+                self.grid = self.pools.pop(draw_style)
+            else:
+                self.grid = self.build_stores()
+                self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+                self.context.special_count = 0
+                self.mark_all_dirty()
+                self.count_usage()
+                return
+        self.clear()
+
+    def memory_usage(self) -> dict[str, dict[str, int]]:
+        """
+        Description: Approximate bytes used by the grid, keyed by draw style (the current one and any
+        pooled by reinitialise), each split by category. See memory.py.
+        The counts are kept up to date by paint_cell, erase_cell, special, clear and reinitialise, and by
+        the stores for the colour caches and programs they build while being read. Stores changed
+        directly, rather than through the grid, are only counted again by count_usage.
+
+        Time complexity:
+        Best = Worst case: O(1), the running counts are copied
+        """
+        return {draw_style: dict(usage) for draw_style, usage in self.usage.items()}
+
+    def count_usage(self) -> None:
+        """
+        Description: Count the memory usage of the stores of the current draw style from scratch,
+        and share the count with them through the context
+
+        Time complexity:
+        Best = Worst case: O(x*y*memory_usage), where memory_usage is the complexity of the store's memory_usage
+        """
+        usage = self.stores_memory_usage(self.grid)
+        self.usage[self.draw_style] = usage
+        self.context.usage = usage
+
+    def stores_memory_usage(self, grid: ArrayR[ArrayR[LayerStore]]) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by a 2 dimensional array of stores, as made by build_stores
+
+        Time complexity:
+        Best = Worst case: O(x*y*memory_usage)
+        """
+        usage = {"grid": object_bytes(self) + array_bytes(grid)}
+        for i in range(len(grid)):
+            column = grid[i]
+            usage["grid"] += array_bytes(column)
+            for j in range(len(column)):
+                merge(usage, column[j].memory_usage())
+        return usage
+
+    def column_views_bytes(self) -> int:
+        """
+        Description: Bytes used by the GridColumn views of a grid built from them (see GridColumn),
+        0 for a grid with no columns. The views all have the same size.
+        """
+        if self.x == 0:
+            return 0
+        return self.x * object_bytes(self.grid[0])
+
+    def new_store(self) -> LayerStore:
+        """
+        Description: Create an empty layer store matching the draw style of the grid
+
+        Returns:
+        - a new SetLayerStore, AdditiveLayerStore or SequenceLayerStore
+
+        Time complexity:
+        Best = Worst case: O(comp), where comp is the complexity of the store's initialiser
+        """
+        if self.draw_style == Grid.DRAW_STYLE_SET:
+            return SetLayerStore(self.context)
+        elif self.draw_style == Grid.DRAW_STYLE_ADD:
+            return AdditiveLayerStore(self.context)
+        elif self.draw_style == Grid.DRAW_STYLE_SEQUENCE:
+            return SequenceLayerStore(self.context)
+        raise ValueError(f"Unknown draw style {self.draw_style}")
 
     def __getitem__(self, index: int):
         """
@@ -110,14 +241,386 @@ class Grid:
         Description: Activate the special affect on all grid squares.
 
         Time complexity:
-        Best case: O(x*y), and draw style is set to Set Layer store. Special() would take constant time
-        Worst case:
-        O(x*y*delete_at_index) if draw style set to Sequence Layer store.
-        O(x*y*len(store)) if draw style set to Additive Layer store.
-        Therefore, overall worst case is O({x*y*delete_at_index,x*y*len(store)})
+        Best case: O(1), if draw style set to Set or Additive Layer store. The stores share the grid's context,
+        so only its special count changes, and each store applies it when it is next used.
+        Worst case: O(x*y*delete_at_index) if draw style set to Sequence Layer store.
         """
+        self.mark_all_dirty()
+        if self.special_is_shared():
+            self.context.special_count += 1
+            return
         for x_cell in range(self.x):
             for y_cell in range(self.y):
                 self.grid[x_cell][y_cell].special()
+        self.count_usage()
+
+    def special_is_shared(self) -> bool:
+        """
+        Description: Whether the stores of this draw style apply grid-wide specials through the grid context
+        """
+        return self.draw_style in (Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_ADD)
+
+    def render(
+        self, timestamp: float = 0, cell_size: int = 1, bg: tuple[int, int, int] = (255, 255, 255), path: str|None = None,
+    ) -> np.ndarray:
+        """
+        Description: Render the grid without a window, as MyWindow would draw it at a timestamp
+
+        Args:
+        - timestamp: timestamp of the frame
+        - cell_size: width and height in pixels of every cell
+        - bg: colour of an empty cell
+        - path: if given, the image is also written to this file, e.g. a .png
+
+        Returns:
+        - array of shape (y*cell_size, x*cell_size, 3) of uint8 RGB, with y = 0 on the bottom row as on screen
+
+        Time complexity:
+        Best = Worst case: O(x*y*get_color + x*y*cell_size**2)
+        """
+        start = list(bg)
+        image = np.empty((self.y, self.x, 3), dtype=np.uint8)
+        for x in range(self.x):
+            column = self[x]
+            for y in range(self.y):
+                image[self.y-1-y, x] = column[y].get_color(start, timestamp, x, y)
+        if cell_size > 1:
+            image = image.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+        if path is not None:
+            from PIL import Image  # installed with arcade, only needed to write files
+            Image.fromarray(image).save(path)
+        return image
+
+    def paint_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Add a layer to a cell, marking the cell dirty and counting its change in memory usage
+        if it changed
+
+        Returns:
+        - True if the cell was actually changed
+
+        Time complexity:
+        Best = Worst case: O(add+memory_usage)
+        """
+        store = self[x][y]
+        usage = self.context.usage
+        before = None if usage is None else store.memory_usage()
+        changed = store.add(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            if usage is not None:
+                change(usage, before, store.memory_usage())
+        return changed
+
+    def erase_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Erase a layer from a cell, marking the cell dirty and counting its change in memory usage
+        if it changed
+
+        Returns:
+        - True if the cell was actually changed
+
+        Time complexity:
+        Best = Worst case: O(erase+memory_usage)
+        """
+        store = self[x][y]
+        usage = self.context.usage
+        before = None if usage is None else store.memory_usage()
+        changed = store.erase(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            if usage is not None:
+                change(usage, before, store.memory_usage())
+        return changed
+
+    def mark_dirty(self, x: int, y: int) -> None:
+        """
+        Description: Record that the colour of a cell may have changed.
+        Code changing stores directly, rather than through paint_cell or erase_cell, should call this,
+        and count_usage if memory_usage has to take the change into account.
+        """
+        if not self.all_dirty:
+            self.dirty.add((x, y))
+
+    def mark_all_dirty(self) -> None:
+        """
+        Description: Record that the colour of every cell may have changed
+        """
+        self.all_dirty = True
+        self.dirty = set()
+
+    def take_dirty(self) -> set[tuple[int, int]]|None:
+        """
+        Description: Return the cells changed since the last call and start a new empty set
+
+        Returns:
+        - set of (x, y) cells, or None if every cell may have changed
+        """
+        dirty = None if self.all_dirty else self.dirty
+        self.dirty = set()
+        self.all_dirty = False
+        return dirty
+
+
+class GridColumn:
+    """
+    Column view used by grids that don't keep an ArrayR of stores per column, so that
+    grid[x][y] keeps working. Cells are looked up through grid.cell(x, y).
+    """
+
+    __slots__ = ("grid", "x")
+
+    def __init__(self, grid: Grid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, index: int) -> LayerStore:
+        """
+        Description: return the store of the cell at y = index in this column
+
+        Args:
+        - index: y coordinate of the cell
+
+        Returns:
+        - store of the cell
+        """
+        if not 0 <= index < self.grid.y:
+            raise IndexError("invalid index")
+        return self.grid.cell(self.x, index)
+
+
+class SparseGrid(Grid):
+    """
+    Grid which only creates a layer store for a cell the first time a layer is added to it.
+    Untouched cells read from a single shared empty store, so construction is O(x) and memory is
+    proportional to the painted area rather than to x*y.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, draw_style: str, x: int, y: int) -> None:
+        """
+        Description: Initialise the sparse grid object.
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        - x: x dimension of the grid
+        - y: y dimension of the grid
+
+        Time complexity:
+        Best = Worst case: O(x), only the column views are created, no layer stores are
+        """
+        self.draw_style = draw_style
+        self.x = x
+        self.y = y
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+
+        # shared by every store of the grid
+        self.context = GridContext()
+
+        # painted cells, keyed by (x, y)
+        self.cells = {}
+
+        # every untouched cell reads from this store, new stores start as copies of it
+        self.blank = self.new_store()
+
+        # cells changed since the renderer last took them, see take_dirty
+        self.dirty = set()
+        self.all_dirty = True
+
+        # O(x)
+        self.grid = ArrayR(x)
+        for i in range(len(self.grid)):
+            self.grid[i] = GridColumn(self, i)
+
+        # running memory_usage, see Grid.memory_usage
+        self.count_usage()
+
+    def cell(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return the store of a cell, or a lazy cell if it has not been painted yet
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - store of the cell
+        """
+        store = self.cells.get((x, y))
+        if store is None:
+            return SparseCell(self, x, y)
+        return store
+
+    def materialise(self, x: int, y: int) -> LayerStore:
+        """
+        Description: Return the store of a cell, creating it if the cell has never been painted, and counting
+        the new store in the running memory usage
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - the layer store owned by the cell
+
+        Time complexity:
+        Best case: O(1), when the cell already has a store
+        Worst case: O(copy), when a new store is created
+        """
+        store = self.cells.get((x, y))
+        if store is None:
+            # the blank store has seen every grid-wide special, just like the cell would have
+            store = self.blank.copy()
+            before = sys.getsizeof(self.cells)
+            self.cells[(x, y)] = store
+            usage = self.context.usage
+            if usage is not None:
+                usage["grid"] += sys.getsizeof(self.cells) - before + sys.getsizeof((x, y))
+                merge(usage, store.memory_usage())
+        return store
+
+    def paint_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Add a layer to a cell, creating its store if needed, see Grid.paint_cell
+
+        Time complexity:
+        Best case: O(add+memory_usage)
+        Worst case: O(add+copy+memory_usage), when the cell's store is created
+        """
+        store = self.materialise(x, y)
+        before = store.memory_usage()
+        changed = store.add(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            change(self.context.usage, before, store.memory_usage())
+        return changed
+
+    def erase_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Erase a layer from a cell, see Grid.erase_cell. Unpainted cells have nothing to erase.
+
+        Time complexity:
+        Best = Worst case: O(erase+memory_usage)
+        """
+        store = self.cells.get((x, y))
+        if store is None:
+            return False
+        before = store.memory_usage()
+        changed = store.erase(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            change(self.context.usage, before, store.memory_usage())
+        return changed
+
+    def count_usage(self) -> None:
+        """
+        Description: Count the memory usage of the grid from scratch, and share the count with its stores
+        through the context. The count is kept up to date from then on, as for Grid (see Grid.memory_usage),
+        and by materialise for the stores it creates.
+
+        Time complexity:
+        Best = Worst case: O(n*memory_usage), where n is the number of painted cells
+        """
+        usage = {"grid": object_bytes(self) + array_bytes(self.grid) + self.column_views_bytes()}
+        usage["grid"] += sys.getsizeof(self.cells) + len(self.cells) * sys.getsizeof((self.x, self.y))
+        merge(usage, self.blank.memory_usage())
+        for store in self.cells.values():
+            merge(usage, store.memory_usage())
+        self.usage = {self.draw_style: usage}
+        self.context.usage = usage
+
+    def clear(self) -> None:
+        """
+        Description: Empty the grid. Painted cells are dropped, so only the blank store is kept.
+
+        Time complexity:
+        Best = Worst case: O(1), ignoring the release of the dropped stores
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.context.special_count = 0
+        self.mark_all_dirty()
+        self.cells = {}
+        self.blank.clear()
+        self.count_usage()
+
+    def reinitialise(self, draw_style: str) -> None:
+        """
+        Description: Empty the grid and switch it to a draw style
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        """
+        if draw_style != self.draw_style:
+            self.draw_style = draw_style
+            self.blank = self.new_store()
+        self.clear()
+
+    def special(self):
+        """
+        Description: Activate the special affect on all grid squares.
+
+        Time complexity:
+        Best case: O(1), if draw style set to Set or Additive Layer store, see Grid.special
+        Worst case: O(n*special), where n is the number of painted cells. Untouched cells
+        share the blank store, so they are handled by a single call.
+        """
+        self.mark_all_dirty()
+        if self.special_is_shared():
+            self.context.special_count += 1
+            return
+        self.blank.special()
+        for store in self.cells.values():
+            store.special()
+        self.count_usage()
+
+
+class SparseCell(LayerStore):
+    """
+    Unpainted cell of a SparseGrid. Reads come from the grid's blank store and the first
+    write creates the cell's own store.
+    """
+
+    __slots__ = ("grid", "x", "y")
+
+    def __init__(self, grid: SparseGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        return self.grid.materialise(self.x, self.y).add(layer)
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        store = self.grid.cells.get((self.x, self.y), self.grid.blank)
+        return store.get_color(start, timestamp, x, y)
+
+    def erase(self, layer: Layer) -> bool:
+        store = self.grid.cells.get((self.x, self.y))
+        if store is None:
+            return False  # an empty store has nothing to erase
+        return store.erase(layer)
+
+    def layer_indices(self) -> list[int]:
+        return self.grid.cells.get((self.x, self.y), self.grid.blank).layer_indices()
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        return self.grid.cells.get((self.x, self.y), self.grid.blank).compute_color(start, timestamp, x, y)
+
+    def special(self):
+        self.grid.materialise(self.x, self.y).special()
+
+    def copy(self) -> LayerStore:
+        return self.grid.cells.get((self.x, self.y), self.grid.blank).copy()
 
+    def clear(self) -> None:
+        store = self.grid.cells.get((self.x, self.y))
+        if store is not None:
+            store.clear()
 
+    def memory_usage(self) -> dict[str, int]:
+        # the cell's store is counted by the grid
+        return {"views": sys.getsizeof(self)}
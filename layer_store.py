@@ -1,18 +1,47 @@
 from __future__ import annotations
+import sys
 from abc import ABC, abstractmethod
-from layer_util import Layer
-from data_structures.queue_adt import CircularQueue
-from data_structures.stack_adt import ArrayStack
+from layer_util import IDENTITY_TABLES, Layer, LAYERS, apply_tables, compose_tables
+from layers import RAINBOW_RESOLUTION
+from memory import array_bytes, object_bytes
+from data_structures.queue_adt import GrowableCircularQueue
 from data_structures.bset import BSet
 from data_structures.array_sorted_list import ArraySortedList
 from data_structures.sorted_list_adt import ListItem
 
 
 
-class LayerStore(ABC):
+class GridContext:
+    """
+    State shared by every store of a grid (or of a tile of one).
+    Grid-wide specials only increment special_count, and SET and ADD stores apply the
+    parity of it when they are read or written, so Grid.special is O(1) for those styles.
+    """
+
+    __slots__ = ("special_count", "usage")
 
     def __init__(self) -> None:
-        pass
+        self.special_count = 0
+
+        # running memory_usage of the stores, kept by the grid, or None if it is not counted.
+        # Stores add the bytes they allocate while being read to it, see LayerStore.count_bytes.
+        self.usage = None
+
+    def is_special(self) -> bool:
+        """
+        Returns true if an odd number of grid-wide specials has been applied.
+        """
+        return self.special_count % 2 == 1
+
+
+class LayerStore(ABC):
+
+    __slots__ = ("context", "version", "cache")
+
+    def __init__(self, context: GridContext|None = None) -> None:
+        self.context = context
+        self.version = 0  # incremented every time the layers or the special state of the store change
+        self.cache = None  # last computed colour, see cached_color
 
     @abstractmethod
     def add(self, layer: Layer) -> bool:
@@ -44,17 +73,152 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def layer_indices(self) -> list[int]:
+        """
+        Returns the registry indices of the layers applied by the store, in no particular order.
+        """
+        pass
+
+    @abstractmethod
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Applies the layers of the store to start, without using the colour cache.
+        """
+        pass
+
+    def cached_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Returns compute_color(start, timestamp, x, y), reusing the last colour while the store, the
+        grid-wide specials and the arguments are unchanged. The timestamp and the rainbow resolution
+        (see layers.rainbow_resolution) are only compared when the store holds a time dependent layer,
+        so a static store is only computed once per change.
+        """
+        special_count = 0 if self.context is None else self.context.special_count
+        cache = self.cache  # (version, special count, x, y, start, timestamp or None, resolution, colour)
+        if (
+            cache is not None and cache[0] == self.version and cache[1] == special_count and
+            cache[2] == x and cache[3] == y and cache[4] == start and
+            (cache[5] is None or (cache[5] == timestamp and cache[6] is RAINBOW_RESOLUTION.get()))
+        ):
+            return cache[7]
+
+        if cache is not None and cache[0] == self.version:
+            time_dependent = cache[5] is not None  # the layers have not changed since the last colour
+        else:
+            time_dependent = any(LAYERS[index].time_dependent for index in self.layer_indices())
+
+        color = self.compute_color(start, timestamp, x, y)
+        if time_dependent:
+            self.cache = (self.version, special_count, x, y, start[:], timestamp, RAINBOW_RESOLUTION.get(), color)
+        else:
+            self.cache = (self.version, special_count, x, y, start[:], None, None, color)
+        if cache is None:
+            # later caches replace this one with a tuple of the same size
+            self.count_bytes("color_cache", 0, self.cache_memory_usage())
+        return color
+
+    def count_bytes(self, category: str, before: int, after: int) -> None:
+        """
+        Adds a change in the bytes of a category of the store, made while reading it, to the running
+        memory usage of its grid, if it has one (see GridContext.usage). Changes made by add, erase,
+        special and clear are counted by the grid itself.
+        """
+        usage = None if self.context is None else self.context.usage
+        if usage is not None:
+            usage[category] = usage.get(category, 0) + after - before
+
+    @staticmethod
+    def extend_program(program: list, layer: Layer) -> None:
+        """
+        Appends a layer to a program, a simplified list of the layers a store applies in order.
+        Operations are either the index of a layer to apply, or the lookup tables of consecutive
+        pointwise layers (see Layer.channel_tables), composed into one and dropped if they do nothing.
+        A constant layer discards the operations before it.
+        """
+        if layer.constant:
+            program.clear()
+        if not layer.pointwise:
+            program.append(layer.index)
+            return
+        tables = layer.channel_tables()
+        if program and not isinstance(program[-1], int):
+            tables = compose_tables(program[-1], tables)
+            program.pop()
+        if tables is not IDENTITY_TABLES:
+            program.append(tables)
+
+    @staticmethod
+    def run_program(program: list, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Applies a program (see extend_program) to start.
+        """
+        color = start
+        for operation in program:
+            if isinstance(operation, int):
+                color = LAYERS[operation].apply(color, timestamp, x, y)
+            else:
+                color = apply_tables(operation, color)
+        return color
+
+    @staticmethod
+    def program_memory_usage(program: tuple|None) -> int:
+        """
+        Returns the approximate bytes used by a (key, operations) program, or 0 for None.
+        The lookup tables are shared, so they are not counted.
+        """
+        if program is None:
+            return 0
+        return sys.getsizeof(program) + sys.getsizeof(program[1])
+
+    def cache_memory_usage(self) -> int:
+        """
+        Returns the approximate bytes used by the colour cache.
+        """
+        if self.cache is None:
+            return 0
+        return sys.getsizeof(self.cache) + sys.getsizeof(self.cache[4])
+
+    @abstractmethod
+    def copy(self) -> LayerStore:
+        """
+        Returns an independent store holding the same layers.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every layer and special effect, leaving the store as if it was just created.
+        """
+        pass
+
+    @abstractmethod
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Returns the approximate bytes used by the store, by category. See memory.py.
+        """
+        pass
+
 
 class SetLayerStore(LayerStore):
     """
     Complexity of class methods are O(1), unless otherwise specified
     """
 
-    def __init__(self):
+    __slots__ = ("layer", "is_special")
+
+    EMPTY = -1  # layer index stored when there is no layer
+
+    def __init__(self, context: GridContext|None = None):
         """
         Description: Initialise layer store layer and special boolean
+
+        Args:
+        - context: context of the grid owning the store, None for a standalone store
         """
-        self.layer = None
+        LayerStore.__init__(self, context)
+        self.layer = SetLayerStore.EMPTY  # index of the stored layer in the LAYERS registry
         self.is_special = False  # special() not called
 
     def add(self, layer: Layer) -> bool:
@@ -67,13 +231,25 @@ class SetLayerStore(LayerStore):
         Returns:
         - True if LayerStore was actually changed
         """
-        if self.layer != layer:
-            self.layer = layer  # setting new layer
+        if self.layer != layer.index:
+            self.layer = layer.index  # setting new layer
+            self.version += 1
             return True
         else:
             return False  # layer added is same
 
     def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: colour this square should show, given the current layers, reusing the last colour
+        while it is still valid (see LayerStore.cached_color)
+
+        Complexity:
+        - Best case: O(1), when the cached colour is reused
+        - Worst case: O(compute_color)
+        """
+        return self.cached_color(start, timestamp, x, y)
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
         """
         Description: applies layer stored in grid cell/pixel to the color of that pixel (and applies special if called)
          to get resulting color
@@ -91,13 +267,13 @@ class SetLayerStore(LayerStore):
         - Best case: O(1), when no layer applied, so return start, which takes constant time
         - Worst case: O(apply), other elementary operations/assignments/returns are constant time.
         """
-        if self.layer == None:  # no layer stored
+        if self.layer == SetLayerStore.EMPTY:  # no layer stored
             color = start  # color is white
         else:
-            color = self.layer.apply(start, timestamp, x, y)  # apply layer to input to retrieve resulting color
+            color = LAYERS[self.layer].apply(start, timestamp, x, y)  # apply layer to input to retrieve resulting color
 
-        # special inverts after layer applied
-        if self.is_special:
+        # special inverts after layer applied, a grid-wide special inverts again
+        if self.is_special != (self.context is not None and self.context.is_special()):
             color = (255-color[0], 255-color[1], 255-color[2])
 
         return color
@@ -112,8 +288,9 @@ class SetLayerStore(LayerStore):
         Returns:
         - True if LayerStore was actually changed
         """
-        if self.layer != None:
-            self.layer = None  # removes layer
+        if self.layer != SetLayerStore.EMPTY:
+            self.layer = SetLayerStore.EMPTY  # removes layer
+            self.version += 1
             return True
         else:
             return False  # already no layer
@@ -123,6 +300,36 @@ class SetLayerStore(LayerStore):
         Description: Allows get_color to invert the colour output
         """
         self.is_special = not self.is_special  # special() called so switches to True
+        self.version += 1
+
+    def layer_indices(self) -> list[int]:
+        """
+        Description: Returns the index of the stored layer, if there is one
+        """
+        return [] if self.layer == SetLayerStore.EMPTY else [self.layer]
+
+    def copy(self) -> SetLayerStore:
+        """
+        Description: Returns an independent store with the same layer and special flag
+        """
+        store = SetLayerStore(self.context)
+        store.layer = self.layer
+        store.is_special = self.is_special
+        return store
+
+    def clear(self) -> None:
+        """
+        Description: Remove the layer and the special effect
+        """
+        self.layer = SetLayerStore.EMPTY
+        self.is_special = False
+        self.version += 1
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by the store. The layer itself is shared, so it is not counted.
+        """
+        return {"stores": sys.getsizeof(self), "color_cache": self.cache_memory_usage()}
 
 
 class AdditiveLayerStore(LayerStore):
@@ -130,15 +337,37 @@ class AdditiveLayerStore(LayerStore):
     Complexity of class methods are O(1), unless otherwise specified
     """
 
+    __slots__ = ("store", "reversed", "program")
+
     CAPACITY = 2000  # assuming max 20 layers*100 = 2000
+    INITIAL_CAPACITY = 4  # queue array starts at this size and doubles up to CAPACITY
 
-    def __init__(self) -> None:
+    def __init__(self, context: GridContext|None = None) -> None:
+        """
+        Description: Initialise queue that stores the indices of layers in the LAYERS registry
+
+        Args:
+        - context: context of the grid owning the store, None for a standalone store
+        """
+        LayerStore.__init__(self, context)
+
+        # Worst case time complexity: O(1), since INITIAL_CAPACITY is a fixed integer class variable,
+        # so we know INITIAL_CAPACITY is not asymptotic
+        self.store = GrowableCircularQueue(AdditiveLayerStore.INITIAL_CAPACITY, AdditiveLayerStore.CAPACITY)
+
+        # True if the layers should be read from the rear of the queue to its front
+        self.reversed = False
+
+        # (is_reversed, operations) giving the same colour as the queue, see effective_program.
+        # None when it has to be rebuilt.
+        self.program = None
+
+    def is_reversed(self) -> bool:
         """
-        Description: Initialise queue that stores layers
+        Description: Whether the oldest layer is at the rear of the queue, after the store's own
+        specials and the grid-wide specials are combined
         """
-        # Worst case time complexity: O(1), since CAPACITY is a fixed integer class variable,
-        # so we know CAPACITY is not asymptotic
-        self.store = CircularQueue(AdditiveLayerStore.CAPACITY)
+        return self.reversed != (self.context is not None and self.context.is_special())
 
     def add(self, layer: Layer) -> bool:
         """
@@ -150,13 +379,55 @@ class AdditiveLayerStore(LayerStore):
         Returns:
         - True, since layer is always added when called
         """
-        self.store.append(layer)
+        if self.is_reversed():
+            self.store.append_front(layer.index)
+        else:
+            self.store.append(layer.index)
+        self.version += 1
+        if self.program is not None:
+            if self.program[0] == self.is_reversed():
+                # the new layer is the newest in either direction, so it goes at the end of the program
+                LayerStore.extend_program(self.program[1], layer)
+            else:
+                # built for the other direction, and would look valid again after another special
+                self.program = None
         return True
 
+    def effective_program(self) -> list:
+        """
+        Description: Returns the layers of the queue in the order they are applied, simplified by
+        LayerStore.extend_program. The program is kept up to date by add, and rebuilt after any other change.
+
+        Time complexity:
+        Best case: O(1), when the program is up to date
+        Worst case: O(n), where n is the len(store)
+        """
+        backwards = self.is_reversed()
+        if self.program is None or self.program[0] != backwards:
+            program = []
+            n = len(self.store)
+            for i in (range(n-1, -1, -1) if backwards else range(n)):
+                LayerStore.extend_program(program, LAYERS[self.store[i]])
+            before = LayerStore.program_memory_usage(self.program)
+            self.program = (backwards, program)
+            self.count_bytes("programs", before, LayerStore.program_memory_usage(self.program))
+        return self.program[1]
+
     def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: colour this square should show, given the current layers, reusing the last colour
+        while it is still valid (see LayerStore.cached_color)
+
+        Complexity:
+        - Best case: O(1), when the cached colour is reused
+        - Worst case: O(compute_color)
+        """
+        return self.cached_color(start, timestamp, x, y)
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
         """
         Description: applies store layers in order of queue (FIFO) stored in grid cell/pixel to
-        the color of that pixel to get resulting color
+        the color of that pixel to get resulting color, running the simplified effective_program
 
         Args:
         - start: initial color of pixel
@@ -168,20 +439,12 @@ class AdditiveLayerStore(LayerStore):
         - colour this square should show, given the current layers
 
         Complexity:
-        - Best case: O(1), if queue is empty, then starting color is returned, which takes constant time
-        - Worst case: O(n*apply), where n is the length of the queue. Have to apply each layer, which means number of
-         iterations depends on this input size n.
+        - Best case: O(p*apply), where p is the length of the program, e.g. O(1) when the newest layer is constant
+         or every layer is pointwise, as they are applied as one table lookup per channel
+        - Worst case: O(n*apply), where n is the length of the queue, when the program has to be rebuilt
+         or no layers can be simplified
         """
-        # check if queue empty, return white layer (start)
-        color = start
-        if self.store.is_empty():
-            pass
-        else:
-            for i in range(len(self.store)):
-                oldest_layer = self.store.serve()  # oldest layer is deleted from queue
-                color = oldest_layer.apply(color, timestamp, x, y)  # deleted layer is applied first
-                self.store.append(oldest_layer)
-        return color
+        return LayerStore.run_program(self.effective_program(), start, timestamp, x, y)
 
     def erase(self, layer: Layer) -> bool:
         """
@@ -195,47 +458,91 @@ class AdditiveLayerStore(LayerStore):
         """
         if self.store.is_empty():
             return False
+        elif self.is_reversed():
+            self.store.serve_rear()
         else:
             self.store.serve()
-            return True
+        self.version += 1
+        self.program = None  # the oldest layer may have been merged into the first operation
+        return True
 
     def special(self):
         """
         Description: Reverse the order of current layers (first becomes last, etc.)
+        The queue is left as it is, and is read from the other end from now on.
+        """
+        self.reversed = not self.reversed
+        self.program = None
+        self.version += 1
+
+    def layer_indices(self) -> list[int]:
+        """
+        Description: Returns the indices of the queued layers
 
         Time complexity:
-        Best case: O(1), when the store queue is empty, the stack and new store queue will remain empty too
-        Worst case: O(n), where n is the len(store), as it will take len(store) iterations to move all layers
-        in store queue to the stack. The same number of iterations is required to move the stack layers
-         to new store queue
+        Best = Worst case: O(n), where n is the len(store)
         """
-        # Worst case time complexity: O(1), since CAPACITY is a fixed integer class variable,
-        # so we know CAPACITY is not asymptotic
-        stack = ArrayStack(AdditiveLayerStore.CAPACITY)
-        new_store = CircularQueue(AdditiveLayerStore.CAPACITY)
+        return [self.store[i] for i in range(len(self.store))]
 
-        # Worst case time complexity: O(len(store))
-        for i in range(self.store.length):
-            stack.push(self.store.serve())  # serve oldest layer and push to temporary stack
+    def copy(self) -> AdditiveLayerStore:
+        """
+        Description: Returns an independent store with the same layers in the same order
 
-        # Worst case time complexity: O(len(store))
-        while not stack.is_empty():
-            new_store.append(stack.pop())  # pop top of stack, which was self.store's newest layer and append to new
+        Time complexity:
+        Best = Worst case: O(n), where n is the len(store)
+        """
+        store = AdditiveLayerStore(self.context)
+        for i in range(len(self.store)):
+            store.store.append(self.store[i])
+        store.reversed = self.reversed
+        return store
 
-        self.store = new_store  # new becomes self.store
+    def clear(self) -> None:
+        """
+        Description: Remove every layer, keeping the queue object
+
+        Time complexity:
+        Best = Worst case: O(INITIAL_CAPACITY), if the queue had grown a new small array is made
+        """
+        self.store.clear()
+        self.reversed = False
+        self.program = None
+        self.version += 1
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by the store, with the queue and its slots counted apart
+        """
+        return {
+            "stores": sys.getsizeof(self),
+            "queue_slots": object_bytes(self.store) + array_bytes(self.store.array),
+            "color_cache": self.cache_memory_usage(),
+            "programs": LayerStore.program_memory_usage(self.program),
+        }
 
 
 class SequenceLayerStore(LayerStore):
     """
     Complexity of class methods are O(1), unless otherwise specified
     """
+
+    __slots__ = ("store_applied", "store_layers", "program")
+
     NUM_LAYERS = 9
 
-    def __init__(self) -> None:
+    # bytes of a list item. Measured once, as the size of an instance dictionary depends on when it was made.
+    ITEM_BYTES = object_bytes(ListItem(0, ""))
+
+    def __init__(self, context: GridContext|None = None) -> None:
+        LayerStore.__init__(self, context)
         self.store_applied = BSet()
 
+        # (version, operations) giving the same colour as the applying layers, see LayerStore.extend_program
+        self.program = None
+
         # Worst case time complexity: O(1), since NUM_LAYERS is a fixed integer class variable,
         # so we know NUM_LAYERS is not asymptotic
+        # items hold the index of the layer in the LAYERS registry, keyed by the layer's name
         self.store_layers = ArraySortedList(SequenceLayerStore.NUM_LAYERS)
 
     def add(self, layer: Layer) -> bool:
@@ -265,13 +572,25 @@ class SequenceLayerStore(LayerStore):
             # O(1)
             self.store_applied.add(item)  # layer is 'applying'
 
-            layer_item = ListItem(layer, layer.name)  # add name as key, to sort in lexicographical order
+            layer_item = ListItem(layer.index, layer.name)  # add name as key, to sort in lexicographical order
 
             # Worst case time complexity: O(add), requires shuffling, so run time depends on this
             self.store_layers.add(layer_item)  # layer will be added to 'applying' layers list
+            self.version += 1
             return True
 
     def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: colour this square should show, given the current layers, reusing the last colour
+        while it is still valid (see LayerStore.cached_color)
+
+        Complexity:
+        - Best case: O(1), when the cached colour is reused
+        - Worst case: O(compute_color)
+        """
+        return self.cached_color(start, timestamp, x, y)
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
         """
         Description: Based on applying layers and their lexicographical order, layers are applied to the grid cell
         to return resulting color
@@ -286,34 +605,34 @@ class SequenceLayerStore(LayerStore):
         - colour this square should show, given the current layers
 
         Time Complexity:
-        - Best case: O(1), when no layers are applying, start is returned, which takes constant time
+        - Best case: O(len(program)*apply), when the program is up to date since the last change, e.g. O(1) when
+        no layers are applying or they are all pointwise
         - Worst case: O(len(store_layers)*apply), will need to apply each layer stored in the array sorted list,
         so time complexity depends on the time complexity of apply, and how many times it runs depends
         on len(store_layers)
         """
-        color = start
-        if self.store_applied.is_empty():  # check if no layers 'applying'
-            pass
-        else:
-
-            # Worst = best case: O(1), as NUM_LAYERS is a constant integer, so iterations does not depend on
-            # any input size, but on this constant
-            for i in range(SequenceLayerStore.NUM_LAYERS):  # iterate through all layer indices in order
-                item = i+1  # layer item is layer.index+1
+        if self.program is None or self.program[0] != self.version:
+            program = []
+            if not self.store_applied.is_empty():  # check if any layers 'applying'
 
-                if item in self.store_applied:  # check if layer 'applying'
+                # Worst = best case: O(1), as NUM_LAYERS is a constant integer, so iterations does not depend on
+                # any input size, but on this constant
+                for i in range(SequenceLayerStore.NUM_LAYERS):  # iterate through all layer indices in order
+                    item = i+1  # layer item is layer.index+1
 
-                    # Worst case: O(len(store_layers)), number of iterations depends on this input size of number of
-                    # layers in the store layers list
-                    for j in range(len(self.store_layers)):  # iterate 'applying' layers
-                        current_layer = self.store_layers[j]
+                    if item in self.store_applied:  # check if layer 'applying'
 
-                        if current_layer.value.index == i:  # check if 'applying' layer matches layer.index
+                        # Worst case: O(len(store_layers)), number of iterations depends on this input size of
+                        # number of layers in the store layers list
+                        for j in range(len(self.store_layers)):  # iterate 'applying' layers
+                            if self.store_layers[j].value == i:  # check if 'applying' layer matches layer.index
+                                LayerStore.extend_program(program, LAYERS[i])
+            before = LayerStore.program_memory_usage(self.program)
+            self.program = (self.version, program)
+            self.count_bytes("programs", before, LayerStore.program_memory_usage(self.program))
 
-                            # O(apply)
-                            color = current_layer.value.apply(color, timestamp, x, y)
-
-        return color
+        # O(len(program)*apply), consecutive pointwise layers are applied as one table lookup
+        return LayerStore.run_program(self.program[1], start, timestamp, x, y)
 
     def erase(self, layer: Layer) -> bool:
         """
@@ -346,11 +665,12 @@ class SequenceLayerStore(LayerStore):
             # layers in the store layers list
             for i in range(len(self.store_layers)):
                 current_layer = self.store_layers[i]
-                if current_layer.value.index == item-1:
+                if current_layer.value == item-1:
 
                     # O(delete_at_index)
                     self.store_layers.delete_at_index(i)
 
+            self.version += 1
             return True
         else:
             return False
@@ -381,5 +701,57 @@ class SequenceLayerStore(LayerStore):
                 median_index = int((len(self.store_layers) / 2)-1)  # -1 from indices to pick smaller median name
 
             self.store_layers.delete_at_index(median_index)  # removes median name
+            self.version += 1
+
+    def layer_indices(self) -> list[int]:
+        """
+        Description: Returns the indices of the layers get_color applies: applying and still listed
+
+        Time complexity:
+        Best = Worst case: O(len(store_layers))
+        """
+        return [
+            self.store_layers[i].value
+            for i in range(len(self.store_layers))
+            if self.store_layers[i].value+1 in self.store_applied
+        ]
+
+    def copy(self) -> SequenceLayerStore:
+        """
+        Description: Returns an independent store with the same applying layers
+
+        Time complexity:
+        Best = Worst case: O(len(store_layers)*add)
+        """
+        store = SequenceLayerStore(self.context)
+        store.store_applied.elems = self.store_applied.elems
+        for i in range(len(self.store_layers)):
+            store.store_layers.add(self.store_layers[i])
+        return store
+
+    def clear(self) -> None:
+        """
+        Description: Make every layer 'not applying'
+        """
+        self.store_applied.clear()
+        self.store_layers.clear()
+        self.version += 1
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by the store, with the bitset and the sorted list counted apart
+
+        Time complexity:
+        Best = Worst case: O(1), the list items all have the same size
+        """
+        sorted_list = object_bytes(self.store_layers) + array_bytes(self.store_layers.array)
+        sorted_list += len(self.store_layers) * SequenceLayerStore.ITEM_BYTES
+        return {
+            "stores": sys.getsizeof(self),
+            "bitsets": object_bytes(self.store_applied) + sys.getsizeof(self.store_applied.elems),
+            "sorted_lists": sorted_list,
+            "color_cache": self.cache_memory_usage(),
+            "programs": LayerStore.program_memory_usage(self.program),
+        }
 
 
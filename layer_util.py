@@ -6,12 +6,13 @@ No need to edit unless adding new features.
 
 from __future__ import annotations
 from dataclasses import dataclass, field
+import numpy as np
 from data_structures.referential_array import ArrayR
 
 LAYERS: ArrayR[Layer] = ArrayR(20)
 cur_layer_index = 0
 
-@dataclass
+@dataclass(slots=True)
 class Layer:
 
     index: int
@@ -19,11 +20,62 @@ class Layer:
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
 
+    # Traits, see the traits decorator. Undeclared layers get the safe defaults.
+    time_dependent: bool = field(init=False, default=True)
+    position_dependent: bool = field(init=False, default=True)
+    constant: bool = field(init=False, default=False)
+    pointwise: bool = field(init=False, default=False)
+
+    # Batched form of apply, see the vectorized decorator and apply_array
+    kernel: function | None = field(init=False, default=None)
+
+    # Lookup table of each channel for pointwise layers, see channel_tables
+    tables: tuple[bytes, bytes, bytes] | None = field(init=False, default=None)
+
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
+        if hasattr(self.apply, "__traits__"):
+            self.set_traits(**self.apply.__traits__)
+        if hasattr(self.apply, "__kernel__"):
+            self.kernel = self.apply.__kernel__
         self.name = self.apply.__name__
 
+    def apply_array(self, colors: np.ndarray, timestamp: float, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Applies the layer to many cells at once, giving exactly the colours apply would.
+
+        colors is an integer array of shape (..., 3), and xs and ys integer arrays of the
+        matching shape (...), e.g. a whole grid as (x, y, 3), (x, y) and (x, y).
+        Returns a new int64 array of shape (..., 3).
+        Layers without a kernel call apply once per cell.
+        """
+        colors = np.asarray(colors, dtype=np.int64)
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        if self.kernel is not None:
+            return self.kernel(colors, timestamp, xs, ys)
+        result = np.empty(colors.shape, dtype=np.int64)
+        for index in np.ndindex(xs.shape):
+            result[index] = self.apply(tuple(int(c) for c in colors[index]), timestamp, int(xs[index]), int(ys[index]))
+        return result
+
+    def channel_tables(self) -> tuple[bytes, bytes, bytes]:
+        """
+        Returns a 256 entry lookup table per channel giving apply, for pointwise layers.
+        Computed on first use, from the colours (v, v, v) for every v in [0, 255].
+        """
+        if self.tables is None:
+            colors = [self.apply((v, v, v), 0, 0, 0) for v in range(256)]
+            self.tables = tuple(bytes(color[c] for color in colors) for c in range(3))
+        return self.tables
+
+    def set_traits(self, time_dependent: bool, position_dependent: bool, constant: bool, pointwise: bool) -> None:
+        self.time_dependent = time_dependent
+        self.position_dependent = position_dependent
+        self.constant = constant
+        self.pointwise = pointwise
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,6 +95,90 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
+class traits(object):
+    """Decorator declaring how a layer uses its inputs, so that renderers and stores can
+    cache, skip or precompute layers safely.
+
+    - time: the result depends on the timestamp
+    - position: the result depends on x and y
+    - constant: the result does not depend on the input colour
+    - pointwise: each channel of the result only depends on the same channel of the input
+      colour (and not on the timestamp or position), e.g. lighten
+
+    Layers without declared traits are treated as time and position dependent.
+
+    Usage:  @register
+            @traits(time=False, position=False, constant=False, pointwise=True)
+            def my_special_layer(...):
+    """
+    def __init__(self, time: bool, position: bool, constant: bool = False, pointwise: bool = False):
+        self.val = {
+            "time_dependent": time,
+            "position_dependent": position,
+            "constant": constant,
+            "pointwise": pointwise,
+        }
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.set_traits(**self.val)
+        else:
+            func = layer
+        func.__traits__ = self.val
+        return layer
+
+class vectorized(object):
+    """Decorator attaching a batched kernel to a layer, see Layer.apply_array.
+    The kernel takes an int64 array of colours of shape (..., 3), a timestamp and integer arrays of
+    x and y of shape (...), and must return exactly what apply would for every cell.
+
+    Usage:  @register
+            @vectorized(my_special_layer_array)
+            def my_special_layer(...):
+    """
+    def __init__(self, kernel):
+        self.kernel = kernel
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.kernel = self.kernel
+        else:
+            func = layer
+        func.__kernel__ = self.kernel
+        return layer
+
+IDENTITY_TABLES = (bytes(range(256)),) * 3
+
+# composed lookup tables, shared by every store applying the same layers, see compose_tables
+COMPOSED_TABLES: dict = {}
+COMPOSED_TABLES_LIMIT = 4096
+
+def compose_tables(first: tuple[bytes, bytes, bytes], second: tuple[bytes, bytes, bytes]) -> tuple[bytes, bytes, bytes]:
+    """
+    Returns the lookup tables (see Layer.channel_tables) applying first, then second.
+    Results are cached, so stacks of the same layers share their tables.
+    """
+    key = (first, second)
+    tables = COMPOSED_TABLES.get(key)
+    if tables is None:
+        if len(COMPOSED_TABLES) >= COMPOSED_TABLES_LIMIT:
+            COMPOSED_TABLES.clear()
+        tables = tuple(f.translate(s) for f, s in zip(first, second))
+        if tables == IDENTITY_TABLES:
+            tables = IDENTITY_TABLES
+        COMPOSED_TABLES[key] = tables
+    return tables
+
+def apply_tables(tables: tuple[bytes, bytes, bytes], color) -> tuple[int, int, int]:
+    """
+    Applies lookup tables (see Layer.channel_tables) to a colour.
+    """
+    return (tables[0][color[0]], tables[1][color[1]], tables[2][color[2]])
+
 def register(func):
     """
     Layer register function.
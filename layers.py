@@ -1,24 +1,110 @@
 """
 All layers are defined here.
+
+Each layer has a batched kernel, attached with @vectorized, taking an int64 array of colours of
+shape (..., 3), a timestamp and integer arrays of x and y of shape (...). Kernels must give
+exactly the same results as the layer itself.
 """
 
 import colorsys
-from layer_util import background, register
+import contextlib
+import contextvars
+import functools
+import numpy as np
+from layer_util import background, register, traits, vectorized
+
+def hls_to_rgb_array(h: np.ndarray, l: float, s: float) -> np.ndarray:
+    """colorsys.hls_to_rgb over an array of hues, with the same float operations. Returns shape (..., 3)."""
+    if s == 0.0:
+        return np.full(h.shape + (3,), l)
+    if l <= 0.5:
+        m2 = l * (1.0+s)
+    else:
+        m2 = l+s-(l*s)
+    m1 = 2.0*l - m2
+
+    def v(hue):
+        hue = hue % 1.0
+        return np.where(
+            hue < colorsys.ONE_SIXTH, m1 + (m2-m1)*hue*6.0, np.where(
+                hue < 0.5, m2, np.where(
+                    hue < colorsys.TWO_THIRD, m1 + (m2-m1)*(colorsys.TWO_THIRD-hue)*6.0, m1,
+                ),
+            ),
+        )
+    return np.stack((v(h+colorsys.ONE_THIRD), v(h), v(h-colorsys.ONE_THIRD)), axis=-1)
+
+def constant_array(colors, value):
+    """Kernel result for layers returning the same colour everywhere."""
+    return np.broadcast_to(np.array(value, dtype=np.int64), colors.shape).copy()
+
+@functools.lru_cache(maxsize=4)
+def rainbow_table(steps: int) -> tuple[list, np.ndarray]:
+    """
+    Colours of the rainbow at the hues i/steps, as a list of tuples and as an int64 array of shape (steps, 3).
+    steps must be a multiple of 20, so that moving one cell moves a whole number of steps.
+    """
+    if steps <= 0 or steps % 20 != 0:
+        raise ValueError("steps must be a positive multiple of 20")
+    table = [tuple(int(255*c) for c in colorsys.hls_to_rgb(i/steps, 0.6, 0.6)) for i in range(steps)]
+    return table, np.array(table, dtype=np.int64)
+
+# (steps, table, array) of the quantized hues rainbow uses in the current context, see rainbow_resolution.
+# None computes every hue exactly.
+RAINBOW_RESOLUTION = contextvars.ContextVar("RAINBOW_RESOLUTION", default=None)
+
+@contextlib.contextmanager
+def rainbow_resolution(steps: int|None):
+    """
+    Within the block, and only in the current thread, rainbow looks its colours up in a table of steps
+    hues, rounding hues down, or computes them exactly if steps is None (the default, which tests rely on).
+    Renderers use it for their own resolution, see CellRenderer.
+    """
+    token = RAINBOW_RESOLUTION.set(None if steps is None else (steps,) + rainbow_table(steps))
+    try:
+        yield
+    finally:
+        RAINBOW_RESOLUTION.reset(token)
+
+def rainbow_array(colors, timestamp, xs, ys):
+    resolution = RAINBOW_RESOLUTION.get()
+    if resolution is not None:
+        # same index as rainbow, for every cell at once
+        steps, _, table = resolution
+        return table[(int((timestamp/20)%1 * steps) + (xs+ys) * (steps//20)) % steps]
+    return (255*hls_to_rgb_array((timestamp/20 + xs/20 + ys/20)%1, 0.6, 0.6)).astype(np.int64)
 
 @register
+@traits(time=True, position=True, constant=True)
+@vectorized(rainbow_array)
 @background(200, 0, 120)
 def rainbow(color, timestamp, x, y):
+    resolution = RAINBOW_RESOLUTION.get()
+    if resolution is not None:
+        # the hue is (timestamp + x + y)/20, and each cell of x + y is exactly steps//20 steps
+        steps, table, _ = resolution
+        return table[(int((timestamp/20)%1 * steps) + (x+y) * (steps//20)) % steps]
     return tuple(
         int(255*x)
         for x in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6)
     )
 
+def black_array(colors, timestamp, xs, ys):
+    return constant_array(colors, (0, 0, 0))
+
 @register
+@traits(time=False, position=False, constant=True, pointwise=True)
+@vectorized(black_array)
 @background(170, 170, 170)
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
+def lighten_array(colors, timestamp, xs, ys):
+    return np.minimum(255, colors + 40)
+
 @register
+@traits(time=False, position=False, pointwise=True)
+@vectorized(lighten_array)
 @background(240, 240, 240)
 def lighten(color, timestamp, x, y):
     return tuple(
@@ -26,7 +112,12 @@ def lighten(color, timestamp, x, y):
         for x in color
     )
 
+def invert_array(colors, timestamp, xs, ys):
+    return 255 - colors
+
 @register
+@traits(time=False, position=False, pointwise=True)
+@vectorized(invert_array)
 @background(0, 255, 255)
 def invert(color, timestamp, x, y):
     return tuple(
@@ -34,38 +125,92 @@ def invert(color, timestamp, x, y):
         for c in color
     )
 
+def red_array(colors, timestamp, xs, ys):
+    return constant_array(colors, (255, 0, 0))
+
 @register
+@traits(time=False, position=False, constant=True, pointwise=True)
+@vectorized(red_array)
 @background(255, 0, 0)
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
+def green_array(colors, timestamp, xs, ys):
+    return constant_array(colors, (0, 255, 0))
+
 @register
+@traits(time=False, position=False, constant=True, pointwise=True)
+@vectorized(green_array)
 @background(0, 255, 0)
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
+def blue_array(colors, timestamp, xs, ys):
+    return constant_array(colors, (0, 0, 255))
+
 @register
+@traits(time=False, position=False, constant=True, pointwise=True)
+@vectorized(blue_array)
 @background(0, 0, 255)
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
+LCG_MULTIPLIER = 1103515245
+LCG_INCREMENT = 12345
+LCG_MODULUS = 1 << 31
+
+def lcg_jumps(count: int) -> tuple[list[int], list[int]]:
+    """
+    Jump-ahead coefficients of the sparkle LCG: running it n times from any other gives
+    (multipliers[n] * other + increments[n]) % LCG_MODULUS, for 1 <= n < count.
+    """
+    multipliers, increments = [1], [0]
+    for _ in range(1, count):
+        # one more step after n steps: a*(A*x + C) + c
+        multipliers.append(LCG_MULTIPLIER * multipliers[-1] % LCG_MODULUS)
+        increments.append((LCG_MULTIPLIER * increments[-1] + LCG_INCREMENT) % LCG_MODULUS)
+    return multipliers, increments
+
+# sparkle runs the LCG 10 + (ts*31 % 17) times, so between 10 and 26
+LCG_MULTIPLIERS, LCG_INCREMENTS = lcg_jumps(27)
+LCG_MULTIPLIERS_ARRAY = np.array(LCG_MULTIPLIERS, dtype=np.int64)
+LCG_INCREMENTS_ARRAY = np.array(LCG_INCREMENTS, dtype=np.int64)
+
+def lcg_array(other, steps):
+    """Runs the sparkle LCG steps times on every cell, as one jump each. Steps must be in [1, 27)."""
+    # both factors are below 2**31, so the product fits in int64
+    return (LCG_MULTIPLIERS_ARRAY[steps] * other.astype(np.int64) + LCG_INCREMENTS_ARRAY[steps]) % LCG_MODULUS
+
+def sparkle_array(colors, timestamp, xs, ys):
+    ts = np.trunc((timestamp + xs/3 + ys/5) * 3).astype(np.int64)
+    steps = 10 + (ts * 31 % 17)
+    other = lcg_array(xs, steps)
+    other = lcg_array(other + ys, steps)
+    other = (other & ((1 << 31)-1)) >> 16
+    return np.where((other/(1 << 15) < 0.1)[..., np.newaxis], lighten_array(colors, timestamp, xs, ys), darken_array(colors, timestamp, xs, ys))
+
 @register
+@traits(time=True, position=True)
+@vectorized(sparkle_array)
 @background(100, 170, 255)
 def sparkle(color, timestamp, x, y):
     ts = int((timestamp + x/3 + y/5) * 3)
-    other = x
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    other += y
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    ts = int((timestamp + x/10 + y/20) * 3)
+    # running the LCG 10 + (ts*31 % 17) times on x, then on the result plus y, as one jump each
+    steps = 10 + (ts * 31 % 17)
+    multiplier, increment = LCG_MULTIPLIERS[steps], LCG_INCREMENTS[steps]
+    other = (multiplier * x + increment) % LCG_MODULUS
+    other = (multiplier * (other + y) + increment) % LCG_MODULUS
     other = (other & ((1 << 31)-1)) >> 16
     if other/(1 << 15) < 0.1:
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
+def darken_array(colors, timestamp, xs, ys):
+    return np.maximum(0, colors - 40)
+
 @register
+@traits(time=False, position=False, pointwise=True)
+@vectorized(darken_array)
 @background(30, 30, 30)
 def darken(color, timestamp, x, y):
     return tuple(
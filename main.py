@@ -1,12 +1,26 @@
 import arcade
 import arcade.key as keys
+import contextlib
+import functools
 import math
 from grid import Grid
 from layer_util import get_layers, Layer
-from layers import lighten
 from undo import UndoTracker
-from action import PaintAction, PaintStep
+from action import PaintAction, PaintSteps
 from replay import ReplayTracker
+from renderer import GridRenderer
+from sidebar import Sidebar
+from frame_buffer import FrameWorker
+from viewport import Viewport
+from mipmap import Mipmap
+
+def with_grid_lock(method):
+    """Run a method changing the grid while holding the grid lock, see MyWindow.grid_lock."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.grid_lock():
+            return method(self, *args, **kwargs)
+    return locked
 
 class MyWindow(arcade.Window):
     """
@@ -25,6 +39,14 @@ class MyWindow(arcade.Window):
 
     GRID_SIZE_X = 32
     GRID_SIZE_Y = 32
+    # Grid class used for the canvas, e.g. SparseGrid to only allocate painted cells.
+    # Draw styles it can't hold (see Grid.DRAW_STYLE_OPTIONS) use a Grid instead.
+    GRID_TYPE = Grid
+    # Compute the grid's colours on a background thread, see FrameWorker
+    BACKGROUND_WORKER = False
+    # Hues of the rainbow layer looked up from a table when drawing, None to compute them exactly.
+    # Passed to the mipmap or the frame worker, see CellRenderer.
+    RAINBOW_HUE_STEPS = 3600
 
     BG = [255, 255, 255]
 
@@ -43,17 +65,19 @@ class MyWindow(arcade.Window):
         self.y_timer = 0
         self.enable_ui = True
         self.replay_timer = 0
+        self.worker: FrameWorker = None
         self.on_init()
 
     def reset(self) -> None:
         """Reset the screen."""
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.reset_grid()
         self.timestamp = 0
 
         self.selected_layer_index = -1
         self.dragging = None
         self.prev_drawn = None
         self.prev_pos = None
+        self.panning = False
         self.draw_size = 2
 
         # Visual calculations
@@ -61,6 +85,21 @@ class MyWindow(arcade.Window):
         self.GRID_SQ_WIDTH = self.DRAW_PANEL / self.GRID_SIZE_X
         self.GRID_SQ_HEIGHT = self.SCREEN_HEIGHT / self.GRID_SIZE_Y
         self.LAYER_BUTTON_SIZE = self.SIDEBAR_WIDTH / 2
+        # part of the grid shown in the drawing panel, zoomed out grids are drawn from the mipmap's levels
+        self.viewport = Viewport(
+            self.GRID_SIZE_X, self.GRID_SIZE_Y, self.DRAW_PANEL, self.SCREEN_HEIGHT, lod=not self.BACKGROUND_WORKER,
+        )
+        self.renderer = GridRenderer(self.GRID_SIZE_X, self.GRID_SIZE_Y, self.GRID_SQ_WIDTH, self.GRID_SQ_HEIGHT)
+        self.sidebar = Sidebar(self.DRAW_PANEL, self.SCREEN_HEIGHT, self.LAYER_BUTTON_SIZE, self.BG)
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.mipmap = None
+        if self.BACKGROUND_WORKER:
+            self.worker = FrameWorker(self.grid, self.BG, self.RAINBOW_HUE_STEPS)
+            self.worker.start()
+        else:
+            self.mipmap = Mipmap(self.GRID_SIZE_X, self.GRID_SIZE_Y, self.RAINBOW_HUE_STEPS)
         # Action button sprites
         self.action_buttons = arcade.SpriteList()
         self.draw_mode_button = arcade.Sprite(
@@ -110,33 +149,39 @@ class MyWindow(arcade.Window):
     def on_draw(self) -> None:
         """Draw everything"""
         self.clear()
-        # UI - Layers
-        for i, layer in enumerate(get_layers()):
-            if layer is None: break
-            xstart = (i % 2) * self.LAYER_BUTTON_SIZE + self.DRAW_PANEL
-            xend = ((i % 2)+1) * self.LAYER_BUTTON_SIZE + self.DRAW_PANEL
-            ystart = self.SCREEN_HEIGHT - (i//2) * self.LAYER_BUTTON_SIZE
-            yend = self.SCREEN_HEIGHT - (i//2+1) * self.LAYER_BUTTON_SIZE
-            bg = lighten.apply(layer.bg or self.BG[:], 0, 0, 0) if self.selected_layer_index == i else (layer.bg or self.BG[:])
-            if not self.enable_ui:
-                bg = lighten.apply(bg, 0, 0, 0)
-            arcade.draw_lrtb_rectangle_filled(xstart, xend, ystart, yend, bg)
-            arcade.draw_lrtb_rectangle_outline(
-                xstart, xend, ystart, yend, (0, 0, 0), border_width=1,
-            )
-            arcade.draw_text(str(i), xstart, (ystart+yend)/2, (0, 0, 0), 18, width=xend-xstart, align="center", bold=True, anchor_y="center")
+        # UI - Layers, only recoloured when the selection or enable_ui changes
+        self.sidebar.update(self.selected_layer_index, self.enable_ui)
+        self.sidebar.draw()
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
-        # Grid
-        for x in range(self.GRID_SIZE_X):
-            for y in range(self.GRID_SIZE_Y):
-                arcade.draw_lrtb_rectangle_filled(
-                    self.GRID_SQ_WIDTH * x,
-                    self.GRID_SQ_WIDTH * (x+1),
-                    self.GRID_SQ_HEIGHT * (y+1),
-                    self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y),
-                )
+        # Grid, in a single draw call, one sprite per visible cell or block of cells when zoomed out
+        level = self.viewport.level()
+        region = self.viewport.visible_cells(level)
+        left, bottom = self.viewport.cell_to_screen(region[0] * 2**level, region[1] * 2**level)
+        width, height = self.viewport.cell_size()
+        self.renderer.set_view(region, width * 2**level, height * 2**level, left, bottom)
+        if self.worker is None:
+            # only dirty cells and the visible outdated or live blocks of the drawn level are evaluated
+            self.mipmap.set_region(*region, level)
+            self.mipmap.update(self.grid, self.timestamp, self.BG)
+            self.mipmap.present(self.renderer, level)
+        else:
+            # show the last frame the worker finished, and ask for the next one
+            self.worker.present(self.renderer)
+            self.worker.request(self.timestamp, region)
+        # cells cut by the edge of the panel must not cover the sidebar
+        self.ctx.scissor = (0, 0, int(self.DRAW_PANEL), self.SCREEN_HEIGHT)
+        self.renderer.draw()
+        self.ctx.scissor = None
+
+    def grid_lock(self):
+        """
+        Lock to hold while changing the grid, so the background worker never copies it half changed.
+        Only held around the changes themselves, the worker computes colours without it.
+        """
+        if self.worker is None:
+            return contextlib.nullcontext()
+        return self.worker.lock
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
@@ -144,15 +189,9 @@ class MyWindow(arcade.Window):
             if not self.enable_ui:
                 return
             # Buttons
-            for i, layer in enumerate(get_layers()):
-                if layer is None: break
-                xstart = (i % 2) * self.LAYER_BUTTON_SIZE + self.DRAW_PANEL
-                xend = ((i % 2)+1) * self.LAYER_BUTTON_SIZE + self.DRAW_PANEL
-                ystart = self.SCREEN_HEIGHT - (i//2) * self.LAYER_BUTTON_SIZE
-                yend = self.SCREEN_HEIGHT - (i//2+1) * self.LAYER_BUTTON_SIZE
-                if xstart <= x < xend and yend <= y < ystart:
-                    self.selected_layer_index = i
-                    break
+            layer_index = self.sidebar.layer_at(x, y)
+            if layer_index != -1:
+                self.selected_layer_index = layer_index
             # Actions
             xstart = self.DRAW_PANEL
             xend = self.LAYER_BUTTON_SIZE + self.DRAW_PANEL
@@ -183,7 +222,10 @@ class MyWindow(arcade.Window):
             ystart = 3 * self.LAYER_BUTTON_SIZE
             yend = 2 * self.LAYER_BUTTON_SIZE
             if xstart <= x < xend and yend <= y < ystart:
-                self.on_special()
+                with self.grid_lock():
+                    self.on_special()
+        elif button == arcade.MOUSE_BUTTON_RIGHT:
+            self.panning = True
         else:
             self.dragging = True
             self.try_draw(x, y)
@@ -191,11 +233,15 @@ class MyWindow(arcade.Window):
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
         """Called when the mouse buttons are released."""
         self.dragging = False
+        self.panning = False
         self.prev_drawn = None
         self.prev_pos = None
 
     def on_mouse_motion(self, x, y, dx, dy) -> None:
         """Called when the mouse moves."""
+        if self.panning:
+            self.viewport.pan(dx, dy)
+            return
         if not self.dragging:
             return
         if not(0 <= self.selected_layer_index < len(get_layers())):
@@ -204,6 +250,11 @@ class MyWindow(arcade.Window):
             return
         self.try_draw(x, y)
 
+    def on_mouse_scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
+        """Called when the mouse wheel is scrolled, zooming the grid around the cursor."""
+        if x < self.DRAW_PANEL:
+            self.viewport.zoom_at(1.1 ** scroll_y, x, y)
+
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
         if not self.enable_ui:
@@ -211,10 +262,12 @@ class MyWindow(arcade.Window):
         self.z_pressed = keys.Z == symbol and (modifiers & keys.MOD_CTRL)
         self.y_pressed = keys.Y == symbol and (modifiers & keys.MOD_CTRL)
         if self.z_pressed:
-            self.on_undo()
+            with self.grid_lock():
+                self.on_undo()
             self.z_timer = 0.5
         if self.y_pressed:
-            self.on_redo()
+            with self.grid_lock():
+                self.on_redo()
             self.y_timer = 0.5
 
     def on_key_release(self, symbol: int, modifiers: int) -> None:
@@ -222,6 +275,7 @@ class MyWindow(arcade.Window):
         self.z_pressed = False
         self.y_pressed = False
 
+    @with_grid_lock
     def try_draw(self, x, y) -> None:
         """Attempt to draw at a position, but safely fail if an invalid square."""
         if self.selected_layer_index == -1:
@@ -236,14 +290,10 @@ class MyWindow(arcade.Window):
                 distance = min(d * increment / mhat_dist, 1)
                 nx = distance * (x - self.prev_pos[0]) + self.prev_pos[0]
                 ny = distance * (y - self.prev_pos[1]) + self.prev_pos[1]
-                nx_pos = int(nx // self.GRID_SQ_WIDTH)
-                ny_pos = int(ny // self.GRID_SQ_HEIGHT)
-                points_to_draw.append((nx_pos, ny_pos))
+                points_to_draw.append(self.cell_at(nx, ny))
         else:
-            x_pos = int(x // self.GRID_SQ_WIDTH)
-            y_pos = int(y // self.GRID_SQ_HEIGHT)
             points_to_draw = [
-                (x_pos, y_pos)
+                self.cell_at(x, y)
             ]
         for px, py in points_to_draw:
             if self.prev_drawn is None or (px, py) != self.prev_drawn:
@@ -252,10 +302,31 @@ class MyWindow(arcade.Window):
                     self.prev_drawn = (px, py)
         self.prev_pos = (x, y)
 
+    def cell_at(self, x: float, y: float) -> tuple[int, int]:
+        """Returns the grid square under a position in the drawing panel, see Viewport.screen_to_cell."""
+        cell_x, cell_y = self.viewport.screen_to_cell(x, y)
+        return (math.floor(cell_x), math.floor(cell_y))
+
+    @with_grid_lock
+    def reset_grid(self) -> None:
+        """
+        Empty the grid for the current draw style, reusing its storage if it has the right type and size.
+        The grid is a GRID_TYPE, or a Grid if GRID_TYPE can't hold the draw style (e.g. ArraySetGrid in ADD mode).
+        """
+        grid_type = self.GRID_TYPE if self.draw_style in self.GRID_TYPE.DRAW_STYLE_OPTIONS else Grid
+        if (
+            type(self.grid) is grid_type and
+            self.grid.x == self.GRID_SIZE_X and
+            self.grid.y == self.GRID_SIZE_Y
+        ):
+            self.grid.reinitialise(self.draw_style)
+        else:
+            self.grid = grid_type(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+
     def start_replay(self) -> None:
         """Begin the replay mode."""
         self.enable_ui = False
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.reset_grid()
         self.replay_timer = self.REPLAY_TIMER_DELTA
         self.on_replay_start()
 
@@ -265,18 +336,21 @@ class MyWindow(arcade.Window):
         if self.z_pressed:
             self.z_timer -= delta_time
             if self.z_timer <= 0:
-                self.on_undo()
+                with self.grid_lock():
+                    self.on_undo()
                 self.z_timer += 0.05
         if self.y_pressed:
             self.y_timer -= delta_time
             if self.y_timer <= 0:
-                self.on_redo()
+                with self.grid_lock():
+                    self.on_redo()
                 self.y_timer += 0.05
         if not self.enable_ui:
             self.replay_timer -= delta_time
             if self.replay_timer <= 0:
                 self.replay_timer += self.REPLAY_TIMER_DELTA
-                finished = self.on_replay_next_step()
+                with self.grid_lock():
+                    finished = self.on_replay_next_step()
                 if finished:
                     self.enable_ui = True
 
@@ -302,7 +376,11 @@ class MyWindow(arcade.Window):
 
     def on_reset(self):
         """Called when a window reset is requested."""
-        pass
+        """
+        Description: start a new cache of shared paint steps, dropping the steps of the previous canvas.
+        Actions still held by the trackers keep the steps they hold.
+        """
+        self.paint_steps = PaintSteps()
 
     def on_paint(self, layer: Layer, px: int, py: int):
         """
@@ -343,14 +421,18 @@ class MyWindow(arcade.Window):
 
                 manhattan_d = abs(px-x_cell)+abs(py-y_cell)  # calculate manhattan distance
 
+                # O(1), because integer comparison
+                if not (0 <= x_cell < self.grid.x and 0 <= y_cell < self.grid.y):
+                    continue  # outside of the grid, safely ignored
+
                 # O(1), because integer comparison
                 if manhattan_d <= self.grid.brush_size:  # check if distance is no more than brush size
 
                     # O(add), depends on the draw_style's add method
-                    is_changed = self.grid[x_cell][y_cell].add(layer)  # paint cell
+                    is_changed = self.grid.paint_cell(x_cell, y_cell, layer)  # paint cell, marking it dirty
 
                     if is_changed:
-                        paint_step = PaintStep((x_cell, y_cell), layer)  # create each paint step
+                        paint_step = self.paint_steps.of((x_cell, y_cell), layer)  # shared step for this cell and layer
 
                         # O(add_step)
                         paint_action.add_step(paint_step)  # add step to paint action
@@ -384,11 +466,8 @@ class MyWindow(arcade.Window):
         """Called when the special action is requested."""
         """
         Time complexity:
-        Best case: O(x*y), and draw style is set to Set Layer store. Special() would take constant time
-        Worst case: 
-        O(x*y*delete_at_index) if draw style set to Sequence Layer store.
-        O(x*y*len(store)) if draw style set to Additive Layer store. 
-        Therefore, overall worst case is O({x*y*delete_at_index,x*y*len(store)})
+        Best case: O(1), if draw style set to Set or Additive Layer store, see Grid.special
+        Worst case: O(x*y*delete_at_index) if draw style set to Sequence Layer store.
         """
         self.grid.special()
 
@@ -417,6 +496,25 @@ class MyWindow(arcade.Window):
         """Called when a decrease to the brush size is requested."""
         self.grid.decrease_brush_size()
 
+    def memory_usage(self) -> dict[str, dict]:
+        """
+        Description: Approximate bytes used by the canvas and its history, cheap enough to check every frame
+        against a memory budget. memory.total_bytes sums it.
+
+        Returns:
+        - the memory_usage of the grid (by draw style), the undo and replay trackers, and the shared paint steps
+
+        Time complexity:
+        Best = Worst case: O(memory_usage of the grid), which is O(1) for every GRID_TYPE but TiledGrid, where it is
+        O(tiles), see Grid.memory_usage and TiledGrid.memory_usage. The trackers and steps are O(1).
+        """
+        return {
+            "grid": self.grid.memory_usage(),
+            "undo": self.undo_tracker.memory_usage(),
+            "replay": self.replay_tracker.memory_usage(),
+            "steps": self.paint_steps.memory_usage(),
+        }
+
 def main():
     """ Main function """
     window = MyWindow()
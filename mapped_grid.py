@@ -0,0 +1,517 @@
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import numpy as np
+from data_structures.referential_array import ArrayR
+from data_structures.sorted_list_adt import ListItem
+from grid import Grid, GridColumn
+from layer_store import AdditiveLayerStore, GridContext, LayerStore, SequenceLayerStore, SetLayerStore
+from layer_util import Layer, get_layers
+from memory import array_bytes, object_bytes
+
+class MappedGrid(Grid):
+    """
+    Grid whose cells live in a memory-mapped file as fixed-width records, so canvases larger than
+    RAM can be painted: only the pages holding touched cells are ever loaded.
+
+    The file starts with a HEADER_SIZE byte header holding the number of grid-wide specials.
+    Record formats, with layers stored as layer.index+1 so that 0 means empty:
+    - SET: layer (1 byte), special flag (1 byte)
+    - ADD: front (2 bytes), length (2 bytes), reversed flag (1 byte), ADD_CAPACITY layer slots of 1 byte,
+      used as a circular queue
+    - SEQUENCE: applying layers bitset (2 bytes), listed layers bitset (2 bytes)
+
+    An ADD record that is full when a layer is added spills: its layers move to the spill table, held in
+    memory with one byte per layer, and its length is set to SPILLED. A spilled cell holds up to
+    AdditiveLayerStore.CAPACITY layers, like the cells of Grid, and stays spilled until it is cleared.
+    flush saves the spill table next to the file, at path + SPILL_SUFFIX.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    HEADER_SIZE = 64
+    ADD_CAPACITY = 59  # 64 byte records
+    SPILLED = 0xFFFF  # length of an ADD record whose layers are in the spill table
+    SPILL_SUFFIX = ".spill"
+
+    RECORD_TYPES = {
+        Grid.DRAW_STYLE_SET: np.dtype([("layer", "u1"), ("special", "u1")]),
+        Grid.DRAW_STYLE_ADD: np.dtype([("front", "<u2"), ("length", "<u2"), ("reversed", "u1"), ("slots", "u1", (ADD_CAPACITY,))]),
+        Grid.DRAW_STYLE_SEQUENCE: np.dtype([("applied", "<u2"), ("listed", "<u2")]),
+    }
+
+    def __init__(self, draw_style: str, x: int, y: int, path: str|None = None, mode: str = "w+") -> None:
+        """
+        Description: Initialise the memory-mapped grid object.
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        - x: x dimension of the grid
+        - y: y dimension of the grid
+        - path: file holding the records, a temporary file is used if None
+        - mode: "w+" to create a new canvas, "r+" to reopen a canvas saved at path
+
+        Raises:
+        - ValueError: if draw_style is not one of DRAW_STYLE_OPTIONS
+
+        Time complexity:
+        Best = Worst case: O(x), the file is created sparse and no record is read
+        """
+        self.x = x
+        self.y = y
+        self.path = path
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.open(draw_style, mode)
+
+        # O(x)
+        self.grid = ArrayR(x)
+        for i in range(len(self.grid)):
+            self.grid[i] = GridColumn(self, i)
+
+    def open(self, draw_style: str, mode: str) -> None:
+        """
+        Description: Map the grid's file with the record format of a draw style
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        - mode: "w+" to start from an empty file, "r+" to keep the records in path
+
+        Raises:
+        - ValueError: if draw_style is not one of DRAW_STYLE_OPTIONS
+        """
+        if draw_style not in MappedGrid.RECORD_TYPES:
+            raise ValueError(f"Unknown draw style {draw_style}")
+        self.draw_style = draw_style
+
+        # drop the old mapping before the file is truncated
+        self.records = None
+        self.header = None
+
+        self.file = tempfile.TemporaryFile() if self.path is None else self.path
+        self.records = np.memmap(
+            self.file, dtype=MappedGrid.RECORD_TYPES[draw_style], mode=mode, shape=(self.x, self.y),
+            offset=MappedGrid.HEADER_SIZE,
+        )
+        self.header = np.memmap(self.file, dtype="<u4", mode="r+", shape=(1,))
+
+        # grid-wide specials are counted in the header, so SET and ADD records apply them when next used
+        self.context = GridContext()
+        self.context.special_count = int(self.header[0])
+
+        # layers of the spilled ADD records, keyed by (x, y), in the order of the record's queue
+        self.spill = {}
+        if mode == "r+" and self.path is not None and os.path.exists(self.path + MappedGrid.SPILL_SUFFIX):
+            self.spill = MappedGrid.load_spill(self.path + MappedGrid.SPILL_SUFFIX)
+        # running bytes of the spilled layers, kept up to date by the cells, see count_spill
+        self.spill_bytes = 0
+        for items in self.spill.values():
+            self.spill_bytes += sys.getsizeof(items)
+
+        # every record may differ from the previous mapping, see take_dirty
+        self.mark_all_dirty()
+
+    def memory_usage(self) -> dict[str, dict[str, int]]:
+        """
+        Description: Approximate bytes used by the grid, keyed by draw style and split by category.
+        "mapped_file" is the size of the mapping, of which only the touched pages are in memory.
+
+        Time complexity:
+        Best = Worst case: O(1), the column views all have the same size and the spilled layers are counted
+        as they change
+        """
+        usage = {
+            "grid": object_bytes(self) + array_bytes(self.grid) + self.column_views_bytes(),
+            "mapped_file": self.header.nbytes + self.records.nbytes,
+        }
+        if self.spill:
+            usage["spill"] = sys.getsizeof(self.spill) + self.spill_bytes
+        return {self.draw_style: usage}
+
+    def count_spill(self, before: int, after: int) -> None:
+        """
+        Description: Adds a change in the bytes of the spilled layers of a record to spill_bytes
+        """
+        self.spill_bytes += after - before
+
+    def clear(self) -> None:
+        """
+        Description: Empty the grid by starting a new sparse file, rather than writing every record
+
+        Time complexity:
+        Best = Worst case: O(1), ignoring the file system
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.open(self.draw_style, "w+")
+
+    def reinitialise(self, draw_style: str) -> None:
+        """
+        Description: Empty the grid and switch it to a draw style
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.open(draw_style, "w+")
+
+    def cell(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return a store view of a single record
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - store view reading and writing the record at (x, y)
+        """
+        if self.draw_style == Grid.DRAW_STYLE_SET:
+            return MappedSetCell(self, x, y)
+        elif self.draw_style == Grid.DRAW_STYLE_ADD:
+            return MappedAdditiveCell(self, x, y)
+        return MappedSequenceCell(self, x, y)
+
+    def flush(self) -> None:
+        """
+        Description: write changed records and the header back to the file, and the spill table next to it
+
+        Time complexity:
+        Best case: O(1), ignoring the file system, when no record has spilled
+        Worst case: O(s*CAPACITY), where s is the number of spilled records, see AdditiveLayerStore.CAPACITY
+        """
+        self.header[0] = self.context.special_count
+        self.records.flush()
+        self.header.flush()
+        if self.path is not None:
+            spill_path = self.path + MappedGrid.SPILL_SUFFIX
+            if self.spill:
+                MappedGrid.save_spill(spill_path, self.spill)
+            elif os.path.exists(spill_path):
+                os.remove(spill_path)
+
+    @staticmethod
+    def save_spill(path: str, spill: dict[tuple[int, int], bytearray]) -> None:
+        """
+        Description: Write a spill table to a file, as the coordinates and lengths of the spilled records
+        followed by their layers
+
+        Time complexity:
+        Best = Worst case: O(s*CAPACITY), where s is the number of spilled records
+        """
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                keys=np.array(list(spill), dtype="<u4").reshape(-1, 2),
+                lengths=np.array([len(items) for items in spill.values()], dtype="<u2"),
+                items=np.frombuffer(b"".join(spill.values()), dtype="u1"),
+            )
+
+    @staticmethod
+    def load_spill(path: str) -> dict[tuple[int, int], bytearray]:
+        """
+        Description: Read a spill table written by save_spill
+
+        Time complexity:
+        Best = Worst case: O(s*CAPACITY), where s is the number of spilled records
+        """
+        spill = {}
+        with np.load(path) as data:
+            items = data["items"].tobytes()
+            start = 0
+            for (x, y), length in zip(data["keys"].tolist(), data["lengths"].tolist()):
+                spill[(x, y)] = bytearray(items[start:start+length])
+                start += length
+        return spill
+
+    def special(self):
+        """
+        Description: Activate the special affect on all grid squares.
+
+        Time complexity:
+        Best case: O(1), for SET and ADD, only the special count in the header changes
+        Worst case: O(n*special), for SEQUENCE, where n is the number of records with listed layers
+        """
+        self.mark_all_dirty()
+        if self.special_is_shared():
+            self.context.special_count += 1
+            return
+        for x, y in zip(*np.nonzero(self.records["listed"])):
+            self.cell(int(x), int(y)).special()
+
+
+class MappedCell(LayerStore):
+    """
+    Store view of one record of a MappedGrid.
+    """
+
+    __slots__ = ("grid", "x", "y")
+
+    def __init__(self, grid: MappedGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def read(self, field: str) -> int:
+        return int(self.grid.records[field][self.x, self.y])
+
+    def write(self, field: str, value: int) -> None:
+        self.grid.records[field][self.x, self.y] = value
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        # records have no colour cache
+        return self.get_color(start, timestamp, x, y)
+
+    def clear(self) -> None:
+        self.grid.records[self.x, self.y] = np.zeros((), dtype=self.grid.records.dtype)
+        items = self.grid.spill.pop((self.x, self.y), None)
+        if items is not None:
+            self.grid.count_spill(sys.getsizeof(items), 0)
+
+    def memory_usage(self) -> dict[str, int]:
+        # the record is counted by the grid, as part of the mapped file
+        return {"views": sys.getsizeof(self)}
+
+
+class MappedSetCell(MappedCell):
+    """
+    SetLayerStore semantics over a SET record.
+    """
+
+    __slots__ = ()
+
+    def add(self, layer: Layer) -> bool:
+        if self.read("layer") != layer.index+1:
+            self.write("layer", layer.index+1)
+            return True
+        return False
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        item = self.read("layer")
+        color = start if item == 0 else get_layers()[item-1].apply(start, timestamp, x, y)
+        if self.read("special") != self.grid.context.is_special():
+            color = (255-color[0], 255-color[1], 255-color[2])
+        return color
+
+    def erase(self, layer: Layer) -> bool:
+        if self.read("layer") != 0:
+            self.write("layer", 0)
+            return True
+        return False
+
+    def layer_indices(self) -> list[int]:
+        item = self.read("layer")
+        return [] if item == 0 else [item-1]
+
+    def special(self):
+        self.write("special", 1 - self.read("special"))
+
+    def copy(self) -> SetLayerStore:
+        """
+        Description: Returns a standalone SetLayerStore with the record's layer, grid-wide specials included
+        """
+        store = SetLayerStore()
+        store.layer = self.read("layer") - 1
+        store.is_special = self.read("special") != self.grid.context.is_special()
+        return store
+
+
+class MappedAdditiveCell(MappedCell):
+    """
+    AdditiveLayerStore semantics over an ADD record. Records holding more than ADD_CAPACITY layers
+    spill into the grid's spill table, see MappedGrid.
+    """
+
+    __slots__ = ()
+
+    def slots(self) -> np.ndarray:
+        return self.grid.records["slots"][self.x, self.y]
+
+    def is_reversed(self) -> bool:
+        return self.read("reversed") != self.grid.context.is_special()
+
+    def items(self) -> list[int]|bytearray:
+        """
+        Description: Returns the stored items (layer.index+1) from the front of the queue to its rear
+
+        Time complexity:
+        Best = Worst case: O(n), where n is the number of layers, except for a spilled record, which is O(1)
+        """
+        length = self.read("length")
+        if length == MappedGrid.SPILLED:
+            return self.grid.spill[(self.x, self.y)]
+        front = self.read("front")
+        slots = self.slots()
+        return [int(slots[(front + i) % MappedGrid.ADD_CAPACITY]) for i in range(length)]
+
+    def spill(self) -> bytearray:
+        """
+        Description: Move the layers of the record to the spill table
+
+        Time complexity:
+        Best = Worst case: O(ADD_CAPACITY)
+        """
+        items = bytearray(self.items())
+        self.grid.spill[(self.x, self.y)] = items
+        self.grid.count_spill(0, sys.getsizeof(items))
+        self.write("front", 0)
+        self.write("length", MappedGrid.SPILLED)
+        return items
+
+    def add(self, layer: Layer) -> bool:
+        """
+        Complexity:
+        - Best case: O(1)
+        - Worst case: O(CAPACITY), when the record spills, or a layer is added to the front of a spilled record
+
+        Raises:
+        - Exception: if the cell already holds AdditiveLayerStore.CAPACITY layers
+        """
+        length = self.read("length")
+        if length == MappedGrid.ADD_CAPACITY:
+            self.spill()
+            length = MappedGrid.SPILLED
+        if length == MappedGrid.SPILLED:
+            items = self.grid.spill[(self.x, self.y)]
+            if len(items) == AdditiveLayerStore.CAPACITY:
+                raise Exception("Queue is full")
+            before = sys.getsizeof(items)
+            if self.is_reversed():
+                items.insert(0, layer.index+1)
+            else:
+                items.append(layer.index+1)
+            self.grid.count_spill(before, sys.getsizeof(items))
+            return True
+        front = self.read("front")
+        if self.is_reversed():
+            front = (front - 1) % MappedGrid.ADD_CAPACITY
+            self.slots()[front] = layer.index+1
+            self.write("front", front)
+        else:
+            self.slots()[(front + length) % MappedGrid.ADD_CAPACITY] = layer.index+1
+        self.write("length", length+1)
+        return True
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Complexity:
+        - Best case: O(1), when the record is empty
+        - Worst case: O(n*apply), where n is the number of layers in the record
+        """
+        color = start
+        items = self.items()
+        if len(items) > 0:
+            layers = get_layers()
+            for item in (reversed(items) if self.is_reversed() else items):
+                color = layers[item-1].apply(color, timestamp, x, y)
+        return color
+
+    def erase(self, layer: Layer) -> bool:
+        length = self.read("length")
+        if length == MappedGrid.SPILLED:
+            items = self.grid.spill[(self.x, self.y)]
+            if len(items) == 0:
+                return False
+            # the oldest layer is at the front, or at the rear when reversed
+            before = sys.getsizeof(items)
+            del items[-1 if self.is_reversed() else 0]
+            self.grid.count_spill(before, sys.getsizeof(items))
+            return True
+        if length == 0:
+            return False
+        if not self.is_reversed():
+            self.write("front", (self.read("front") + 1) % MappedGrid.ADD_CAPACITY)
+        self.write("length", length-1)
+        return True
+
+    def layer_indices(self) -> list[int]:
+        return [item-1 for item in self.items()]
+
+    def special(self):
+        self.write("reversed", 1 - self.read("reversed"))
+
+    def copy(self) -> AdditiveLayerStore:
+        """
+        Description: Returns a standalone AdditiveLayerStore with the record's layers in the order they apply
+        """
+        store = AdditiveLayerStore()
+        layers = get_layers()
+        indices = self.layer_indices()
+        for index in (reversed(indices) if self.is_reversed() else indices):
+            store.add(layers[index])
+        return store
+
+
+class MappedSequenceCell(MappedCell):
+    """
+    SequenceLayerStore semantics over a SEQUENCE record. A layer stays applying after special
+    removes it from the listed layers, as it does in SequenceLayerStore.
+    """
+
+    __slots__ = ()
+
+    def add(self, layer: Layer) -> bool:
+        bit = 1 << layer.index
+        applied = self.read("applied")
+        if applied & bit:
+            return False
+        self.write("applied", applied | bit)
+        self.write("listed", self.read("listed") | bit)
+        return True
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Complexity:
+        - Best case: O(1), when no layers are listed
+        - Worst case: O(NUM_LAYERS*apply)
+        """
+        color = start
+        listed = self.read("listed")
+        if listed:
+            layers = get_layers()
+            for i in range(SequenceLayerStore.NUM_LAYERS):
+                if listed & (1 << i):
+                    color = layers[i].apply(color, timestamp, x, y)
+        return color
+
+    def erase(self, layer: Layer) -> bool:
+        bit = 1 << layer.index
+        applied = self.read("applied")
+        if not applied & bit:
+            return False
+        self.write("applied", applied & ~bit)
+        self.write("listed", self.read("listed") & ~bit)
+        return True
+
+    def layer_indices(self) -> list[int]:
+        listed = self.read("listed")
+        return [i for i in range(SequenceLayerStore.NUM_LAYERS) if listed & (1 << i)]
+
+    def special(self):
+        """
+        Description: Removes median name of listed layers
+
+        Complexity:
+        - Best = Worst case: O(NUM_LAYERS*log(NUM_LAYERS)), for sorting the listed layers by name
+        """
+        listed = self.read("listed")
+        if not listed:
+            return
+        layers = get_layers()
+        names = sorted(
+            (layers[i].name, i)
+            for i in range(SequenceLayerStore.NUM_LAYERS)
+            if listed & (1 << i)
+        )
+        median_index = (len(names) - 1) // 2  # smaller median name when even
+        self.write("listed", listed & ~(1 << names[median_index][1]))
+
+    def copy(self) -> SequenceLayerStore:
+        """
+        Description: Returns a standalone SequenceLayerStore with the record's applying and listed layers
+        """
+        store = SequenceLayerStore()
+        store.store_applied.elems = self.read("applied")
+        layers = get_layers()
+        for i in self.layer_indices():
+            store.store_layers.add(ListItem(i, layers[i].name))
+        return store
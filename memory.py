@@ -0,0 +1,58 @@
+"""
+Helpers for the approximate memory accounting of grids, layer stores and trackers.
+
+Every memory_usage() method returns a dictionary from a category name
+(e.g. "stores", "queue_slots", "history") to a number of bytes.
+Shared objects such as the registered layers are not counted.
+"""
+
+from __future__ import annotations
+import ctypes
+import sys
+from data_structures.referential_array import ArrayR
+
+def object_bytes(obj: object) -> int:
+    """
+    Bytes used by an object and its instance dictionary, if it has one.
+    :complexity: O(1)
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def array_bytes(array: ArrayR) -> int:
+    """
+    Bytes used by an ArrayR: the wrapper, the ctypes array and its slots.
+    :complexity: O(1)
+    """
+    return object_bytes(array) + sys.getsizeof(array.array) + ctypes.sizeof(array.array)
+
+def merge(total: dict[str, int], usage: dict[str, int]) -> dict[str, int]:
+    """
+    Adds every category of usage into total, and returns total.
+    :complexity: O(categories)
+    """
+    for category, size in usage.items():
+        total[category] = total.get(category, 0) + size
+    return total
+
+def change(total: dict[str, int], before: dict[str, int], after: dict[str, int]) -> dict[str, int]:
+    """
+    Adds the difference between two usages of the same object (after minus before) into total, and returns total.
+    :complexity: O(categories)
+    """
+    merge(total, after)
+    for category, size in before.items():
+        total[category] = total.get(category, 0) - size
+    return total
+
+def total_bytes(usage: dict) -> int:
+    """
+    Sum of a usage dictionary, which may be nested (e.g. Grid.memory_usage, keyed by draw style).
+    :complexity: O(categories)
+    """
+    total = 0
+    for size in usage.values():
+        total += total_bytes(size) if isinstance(size, dict) else size
+    return total
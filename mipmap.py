@@ -0,0 +1,228 @@
+from __future__ import annotations
+import numpy as np
+from frame_buffer import CellRenderer
+from layer_util import get_layers
+from layers import rainbow_resolution
+
+class Mipmap(CellRenderer):
+    """
+    Pyramid of cached colours of a grid, for drawing it zoomed out. Level 0 holds the colour of every
+    cell, and each cell of level l+1 is the average colour of a block of 2 by 2 cells of level l, so a
+    cell of level l covers 2**l by 2**l cells of the grid (fewer along the top and right edges).
+
+    The region is given in blocks of the level being drawn, and only those blocks are recomputed, so
+    the cost of a frame depends on the size of the panel rather than the grid:
+    - Cells the grid reports as dirty are recomputed wherever they are, as they are few, and the change
+      is propagated up one block per level.
+    - Blocks whose cells are not all up to date (e.g. after a grid-wide special) are outdated. They are
+      only recomputed when drawn, at the level drawn, and an outdated block of a level above 0 is drawn
+      from one sample, the colour of its centre cell.
+    - Blocks holding cells with time dependent layers are live, and are recomputed once per frame at
+      the level drawn, from one sample as well above level 0.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, x: int, y: int, hue_steps: int|None = None) -> None:
+        """
+        Description: Initialise an outdated pyramid for a grid of x by y cells, see CellRenderer for hue_steps
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        CellRenderer.__init__(self, x, y, hue_steps)
+
+        # levels[l][i, j] is the colour of the block of cells (i*2**l, j*2**l) to ((i+1)*2**l, (j+1)*2**l).
+        # Level 0 holds exact colours, higher levels averages, in float32 to keep large grids small.
+        self.levels = [np.zeros((x, y, 3), dtype=np.uint8)]
+        # counts[l][i, j] is the number of grid cells in that block
+        self.counts = [np.ones((x, y), dtype=np.float32)]
+        while self.levels[-1].shape[0] > 1 or self.levels[-1].shape[1] > 1:
+            self.counts.append(Mipmap.pool(self.counts[-1][..., np.newaxis])[..., 0])
+            self.levels.append(np.zeros(self.counts[-1].shape + (3,), dtype=np.float32))
+
+        # blocks whose colour may be out of date, recomputed when they are drawn
+        self.outdated = [np.ones(counts.shape, dtype=bool) for counts in self.counts]
+        # number of cells known to hold time dependent layers in each block
+        self.live_counts = [np.zeros(counts.shape, dtype=np.int32) for counts in self.counts]
+        # blocks last drawn from a sample of a time dependent cell
+        self.sampled_live = [np.zeros(counts.shape, dtype=bool) for counts in self.counts]
+
+        # level the region is given in
+        self.level = 0
+
+        # blocks of each level whose colour changed since the last present
+        self.changed = [set() for _ in self.levels]
+
+    @staticmethod
+    def pool(values: np.ndarray) -> np.ndarray:
+        """
+        Description: Returns the sums of the blocks of 2 by 2 values of an (x, y, c) array, as if it was
+        padded with zeros to even dimensions
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        x, y, c = values.shape
+        padded = np.zeros((x + x % 2, y + y % 2, c), dtype=np.float32)
+        padded[:x, :y] = values
+        return padded.reshape((x + x % 2) // 2, 2, (y + y % 2) // 2, 2, c).sum(axis=(1, 3))
+
+    def set_region(self, x0: int, y0: int, x1: int, y1: int, level: int = 0) -> None:
+        """
+        Description: Only recompute the blocks x0 <= x < x1, y0 <= y < y1 of a level from now on
+        """
+        self.region = (x0, y0, x1, y1)
+        self.level = level
+
+    def refresh(self, x: int, y: int, color: tuple[int, int, int]) -> bool:
+        """
+        Description: Write the colour of a cell into level 0, if it changed
+        """
+        pixel = self.levels[0][x, y]
+        if pixel[0] == color[0] and pixel[1] == color[1] and pixel[2] == color[2]:
+            return False
+        pixel[:] = color
+        self.changed[0].add((x, y))
+        return True
+
+    def evaluate(self, grid, timestamp: float, bg: tuple[int, int, int], x: int, y: int) -> bool:
+        """
+        Description: Recompute the colour of a cell into level 0, and whether it is live
+
+        Returns:
+        - True if the colour of the cell changed
+
+        Time complexity:
+        Best = Worst case: O(get_color+layer_indices+L), where L is the number of levels
+        """
+        store = grid[x][y]
+        live = any(get_layers()[index].time_dependent for index in store.layer_indices())
+        if live != bool(self.live_counts[0][x, y]):
+            for level, live_counts in enumerate(self.live_counts):
+                live_counts[x >> level, y >> level] += 1 if live else -1
+        self.outdated[0][x, y] = False
+        return self.refresh(x, y, store.get_color(bg[:], timestamp, x, y))
+
+    def sample(self, grid, timestamp: float, bg: tuple[int, int, int], level: int, x: int, y: int) -> bool:
+        """
+        Description: Recompute a block of a level above 0 as the colour of its centre cell
+
+        Returns:
+        - True if the colour of the block changed
+
+        Time complexity:
+        Best = Worst case: O(get_color+layer_indices)
+        """
+        size = 2**level
+        i, j = min(x * size + size // 2, self.x - 1), min(y * size + size // 2, self.y - 1)
+        store = grid[i][j]
+        self.sampled_live[level][x, y] = any(get_layers()[index].time_dependent for index in store.layer_indices())
+        self.outdated[level][x, y] = False
+        color = store.get_color(bg[:], timestamp, i, j)
+        block = self.levels[level][x, y]
+        if block[0] == color[0] and block[1] == color[1] and block[2] == color[2]:
+            return False
+        block[:] = color
+        self.changed[level].add((x, y))
+        return True
+
+    def propagate(self, level: int, blocks: set[tuple[int, int]]) -> None:
+        """
+        Description: Recompute the blocks above recomputed blocks of a level, as the average of their 2 by 2
+        blocks, or mark them outdated if one of those is
+
+        Time complexity:
+        Best = Worst case: O(b*L), where b is the number of blocks and L is the number of levels
+        """
+        for level in range(level + 1, len(self.levels)):
+            below, weights, outdated = self.levels[level-1], self.counts[level-1], self.outdated[level-1]
+            blocks = {(i // 2, j // 2) for i, j in blocks}
+            for i, j in blocks:
+                if outdated[2*i:2*i+2, 2*j:2*j+2].any():
+                    self.outdated[level][i, j] = True
+                    continue
+                total = (below[2*i:2*i+2, 2*j:2*j+2] * weights[2*i:2*i+2, 2*j:2*j+2, np.newaxis]).sum(axis=(0, 1))
+                self.levels[level][i, j] = total / self.counts[level][i, j]
+                self.outdated[level][i, j] = False
+                self.sampled_live[level][i, j] = False
+                self.changed[level].add((i, j))
+
+    def update(self, grid, timestamp: float, bg: tuple[int, int, int]) -> int:
+        """
+        Description: Recompute the dirty cells, then the outdated and live blocks of the region, and the
+        blocks above them on every level
+
+        Returns:
+        - number of cells or blocks whose colour changed
+
+        Time complexity:
+        Best case: O(1), when no cell is dirty and no block of the region is outdated or live
+        Worst case: O((d+r)*(get_color+layer_indices+L)), where d is the number of dirty cells, r the number of
+        blocks in the region and L the number of levels. After a grid-wide change, every level is marked
+        outdated, as O(x*y) numpy fills, and only the region is recomputed.
+        """
+        dirty = grid.take_dirty()
+        level = self.level
+        x0, y0, x1, y1 = self.region
+        changed = 0
+        with rainbow_resolution(self.hue_steps):
+            if dirty is None:
+                for outdated, live_counts, sampled_live in zip(self.outdated, self.live_counts, self.sampled_live):
+                    outdated.fill(True)
+                    live_counts.fill(0)
+                    sampled_live.fill(False)
+                dirty = ()
+            cells = set(dirty)
+            for i, j in cells:
+                changed += self.evaluate(grid, timestamp, bg, i, j)
+
+            drawn = (
+                self.outdated[level][x0:x1, y0:y1] | (self.live_counts[level][x0:x1, y0:y1] > 0) |
+                self.sampled_live[level][x0:x1, y0:y1]
+            )
+            blocks = {(x0 + int(i), y0 + int(j)) for i, j in zip(*np.nonzero(drawn))}
+            if level == 0:
+                for i, j in blocks - cells:
+                    changed += self.evaluate(grid, timestamp, bg, i, j)
+                self.propagate(0, cells | blocks)
+            else:
+                self.propagate(0, cells)
+                for i, j in blocks:
+                    changed += self.sample(grid, timestamp, bg, level, i, j)
+                self.propagate(level, blocks)
+        return changed
+
+    def color(self, level: int, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Description: Returns the colour of a block of a level, rounded to integers
+        """
+        color = self.levels[level][x, y]
+        return (int(color[0] + 0.5), int(color[1] + 0.5), int(color[2] + 0.5))
+
+    def present(self, renderer: CellRenderer, level: int) -> int:
+        """
+        Description: Refresh renderer with the blocks of a level that changed since the last call, or with
+        every block of its region if its region changed. The region of renderer is in blocks of the level.
+
+        Returns:
+        - number of blocks refreshed
+
+        Time complexity:
+        Best case: O(c), where c is the number of changed blocks
+        Worst case: O(r), when the region of renderer changed, where r is the number of blocks in it
+        """
+        x0, y0, x1, y1 = renderer.region
+        if renderer.stale:
+            renderer.stale = False
+            blocks = ((i, j) for i in range(x0, x1) for j in range(y0, y1))
+        else:
+            blocks = (
+                (i, j) for i, j in self.changed[level] if x0 <= i < x1 and y0 <= j < y1
+            )
+        count = 0
+        for i, j in blocks:
+            renderer.refresh(i, j, self.color(level, i, j))
+            count += 1
+        self.changed = [set() for _ in self.levels]
+        return count
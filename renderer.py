@@ -0,0 +1,105 @@
+from __future__ import annotations
+import arcade
+from data_structures.referential_array import ArrayR
+from frame_buffer import CellRenderer
+
+class GridRenderer(CellRenderer):
+    """
+    Draws a grid in a single call. Every cell is a white sprite in one SpriteList, tinted with the
+    cell's colour, so only the sprites whose colour changed are updated on the GPU and a frame costs
+    one draw call whatever the size of the grid. See CellRenderer for which cells are recomputed.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, x: int, y: int, square_width: float, square_height: float) -> None:
+        """
+        Description: Initialise one sprite per cell, showing the whole grid from the bottom left corner
+
+        Args:
+        - x: x dimension of the grid
+        - y: y dimension of the grid
+        - square_width: width of a cell on screen
+        - square_height: height of a cell on screen
+
+        Time complexity:
+        Best = Worst case: O(x*y)
+        """
+        CellRenderer.__init__(self, x, y)
+
+        # lazy, so the sprites can be built (and tested) before there is an OpenGL context
+        self.sprites = arcade.SpriteList(lazy=True)
+
+        # colour shown by each sprite, None until it is first drawn. Cells are stored column by column.
+        self.colors = None
+
+        # (region, square_width, square_height, left, bottom) the sprites are laid out for
+        self.view = None
+        self.set_view((0, 0, x, y), square_width, square_height, 0, 0)
+
+    def set_view(
+        self, region: tuple[int, int, int, int], square_width: float, square_height: float, left: float, bottom: float,
+    ) -> None:
+        """
+        Description: Only show the cells of a region, e.g. the visible part of a Viewport.
+        There is one sprite per cell of the region, so the cost of a frame depends on the region, not the grid.
+
+        Args:
+        - region: (x0, y0, x1, y1), the cells x0 <= x < x1, y0 <= y < y1
+        - square_width: width of a cell on screen
+        - square_height: height of a cell on screen
+        - left: screen x of the left of cell x0
+        - bottom: screen y of the bottom of cell y0
+
+        Time complexity:
+        Best case: O(1), when the view is unchanged
+        Worst case: O(r), where r is the number of cells in the region
+        """
+        view = (region, square_width, square_height, left, bottom)
+        if view == self.view:
+            return
+        self.view = view
+        x0, y0, x1, y1 = region
+        count = (x1-x0) * (y1-y0)
+        if self.colors is None or len(self.colors) != count:
+            self.sprites = arcade.SpriteList(lazy=True, capacity=count)
+            for _ in range(count):
+                self.sprites.append(arcade.SpriteSolidColor(
+                    max(1, round(square_width)), max(1, round(square_height)), arcade.color.WHITE,
+                ))
+            self.colors = ArrayR(count)
+
+        # O(r)
+        for i in range(x1-x0):
+            for j in range(y1-y0):
+                sprite = self.sprites[i*(y1-y0) + j]
+                sprite.width = square_width
+                sprite.height = square_height
+                sprite.center_x = left + square_width * (i+0.5)
+                sprite.center_y = bottom + square_height * (j+0.5)
+                self.colors[i*(y1-y0) + j] = None
+        self.set_region(x0, y0, x1, y1)
+
+    def refresh(self, x: int, y: int, color: tuple[int, int, int]) -> bool:
+        """
+        Description: Tint the sprite of a cell, if its colour changed. Cells outside the region are ignored.
+
+        Returns:
+        - True if the sprite was updated
+        """
+        x0, y0, x1, y1 = self.region
+        if not (x0 <= x < x1 and y0 <= y < y1):
+            return False
+        index = (x-x0)*(y1-y0) + (y-y0)
+        color = tuple(color)
+        if self.colors[index] == color:
+            return False
+        self.colors[index] = color
+        self.sprites[index].color = color
+        return True
+
+    def draw(self) -> None:
+        """
+        Description: Draw every cell with one draw call
+        """
+        self.sprites.draw()
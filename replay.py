@@ -1,7 +1,9 @@
 from __future__ import annotations
+import sys
 from action import PaintAction
 from grid import Grid
 from data_structures.queue_adt import CircularQueue
+from memory import array_bytes, object_bytes
 
 
 class ReplayTracker:
@@ -22,6 +24,9 @@ class ReplayTracker:
 
         self.replay_on = False
 
+        # running memory_usage, see memory_usage
+        self.usage = {"history_slots": object_bytes(self.replay_queue) + array_bytes(self.replay_queue.array)}
+
     def start_replay(self) -> None:
         """
         Description: Called whenever we should stop taking actions, and start playing them back.
@@ -38,7 +43,9 @@ class ReplayTracker:
         Special, Redo, and Draw all have this is False.
         """
         if not self.replay_on:
-            self.replay_queue.append((action, is_undo))
+            entry = (action, is_undo)
+            self.replay_queue.append(entry)
+            self.count(entry, 1)
 
     def play_next_action(self, grid: Grid) -> bool:
         """
@@ -60,7 +67,9 @@ class ReplayTracker:
             self.replay_on = False
             return True
         else:
-            action, is_undo = self.replay_queue.serve()
+            entry = self.replay_queue.serve()
+            self.count(entry, -1)
+            action, is_undo = entry
             if is_undo:
 
                 # O(undo_apply)
@@ -71,6 +80,28 @@ class ReplayTracker:
                 action.redo_apply(grid)
             return False
 
+    def count(self, entry: tuple[PaintAction, bool], sign: int) -> None:
+        """
+        Description: Add (sign 1) or remove (sign -1) the bytes of a queued entry and its action from the
+        running memory usage
+        """
+        self.usage["history_slots"] += sign * sys.getsizeof(entry)
+        if entry[0] is not None:
+            self.usage["history"] = self.usage.get("history", 0) + sign * entry[0].nbytes()
+            if self.usage["history"] == 0:
+                del self.usage["history"]
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by the replay queue and its actions, kept up to date by
+        add_action and play_next_action. An action queued more than once, or also held by the UndoTracker,
+        is counted every time.
+
+        Returns:
+        - bytes by category, see memory.py
+        """
+        return dict(self.usage)
+
 
 if __name__ == "__main__":
     action1 = PaintAction([], is_special=True)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import arcade
+from layer_util import Layer, get_layers
+from layers import lighten
+
+class Sidebar:
+    """
+    Layer buttons of the window, built once and drawn from a SpriteList and cached text labels.
+    Button colours are only recomputed when the selected layer or enable_ui changes.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    def __init__(self, left: float, top: float, button_size: float, bg: tuple[int, int, int]) -> None:
+        """
+        Description: Initialise a button for every registered layer, two per row
+
+        Args:
+        - left: x coordinate of the left of the sidebar
+        - top: y coordinate of the top of the sidebar
+        - button_size: width and height of a button
+        - bg: background colour of layers without one
+
+        Time complexity:
+        Best = Worst case: O(layers)
+        """
+        self.left = left
+        self.top = top
+        self.button_size = button_size
+        self.bg = bg
+
+        self.layers = [layer for layer in get_layers() if layer is not None]
+
+        # a black square per button with the button's colour drawn 1 pixel inside it, as its outline
+        self.buttons = arcade.SpriteList(lazy=True, capacity=2*len(self.layers))
+        self.fills = []
+        for i in range(len(self.layers)):
+            xstart, xend, ystart, yend = self.bounds(i)
+            outline = arcade.SpriteSolidColor(max(1, round(button_size)), max(1, round(button_size)), arcade.color.WHITE)
+            outline.color = (0, 0, 0)
+            fill = arcade.SpriteSolidColor(max(1, round(button_size)-2), max(1, round(button_size)-2), arcade.color.WHITE)
+            for sprite in (outline, fill):
+                sprite.center_x = (xstart+xend) / 2
+                sprite.center_y = (ystart+yend) / 2
+                self.buttons.append(sprite)
+            self.fills.append(fill)
+
+        # made on the first draw, as text needs a window
+        self.labels = None
+
+        # (selected layer index, enable_ui) the buttons are coloured for
+        self.state = None
+
+    def bounds(self, index: int) -> tuple[float, float, float, float]:
+        """
+        Description: Returns xstart, xend, ystart, yend of the button of a layer, ystart being its top
+        """
+        xstart = (index % 2) * self.button_size + self.left
+        xend = ((index % 2)+1) * self.button_size + self.left
+        ystart = self.top - (index//2) * self.button_size
+        yend = self.top - (index//2+1) * self.button_size
+        return xstart, xend, ystart, yend
+
+    def button_color(self, layer: Layer, selected: bool, enable_ui: bool) -> tuple[int, int, int]:
+        """
+        Description: Returns the colour of a layer's button, lighter if selected and again if the UI is disabled
+        """
+        bg = lighten.apply(layer.bg or self.bg[:], 0, 0, 0) if selected else (layer.bg or self.bg[:])
+        if not enable_ui:
+            bg = lighten.apply(bg, 0, 0, 0)
+        return tuple(bg)
+
+    def update(self, selected_layer_index: int, enable_ui: bool) -> bool:
+        """
+        Description: Recolour the buttons if the selected layer or enable_ui changed
+
+        Returns:
+        - True if the buttons were recoloured
+
+        Time complexity:
+        Best case: O(1), when nothing changed
+        Worst case: O(layers)
+        """
+        state = (selected_layer_index, enable_ui)
+        if state == self.state:
+            return False
+        self.state = state
+        for i, layer in enumerate(self.layers):
+            self.fills[i].color = self.button_color(layer, selected_layer_index == i, enable_ui)
+        return True
+
+    def draw(self) -> None:
+        """
+        Description: Draw the buttons and their numbers
+        """
+        if self.labels is None:
+            self.labels = []
+            for i in range(len(self.layers)):
+                xstart, xend, ystart, yend = self.bounds(i)
+                self.labels.append(arcade.Text(
+                    str(i), xstart, (ystart+yend)/2, (0, 0, 0), 18, width=int(xend-xstart), align="center",
+                    bold=True, anchor_y="center", multiline=True,
+                ))
+        self.buttons.draw()
+        for label in self.labels:
+            label.draw()
+
+    def layer_at(self, x: float, y: float) -> int:
+        """
+        Description: Returns the index of the layer whose button is at a position, or -1 if there is none
+
+        Time complexity:
+        Best = Worst case: O(layers)
+        """
+        for i in range(len(self.layers)):
+            xstart, xend, ystart, yend = self.bounds(i)
+            if xstart <= x < xend and yend <= y < ystart:
+                return i
+        return -1
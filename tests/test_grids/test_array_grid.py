@@ -0,0 +1,44 @@
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import ArraySetGrid
+from grid import Grid
+from layers import black, lighten, rainbow, invert
+
+class TestArraySetGrid(unittest.TestCase):
+
+    @number("8.1")
+    def test_cell(self):
+        grid = ArraySetGrid(Grid.DRAW_STYLE_SET, 4, 4)
+        self.assertEqual(grid[1][2].get_color((20, 20, 20), 0, 1, 2), (20, 20, 20))
+        self.assertFalse(grid[1][2].erase(black))
+        self.assertTrue(grid[1][2].add(black))
+        self.assertFalse(grid[1][2].add(black))
+        self.assertEqual(grid.layers[1, 2], black.index)
+        self.assertEqual(grid[1][2].get_color((20, 20, 20), 0, 1, 2), (0, 0, 0))
+        grid[1][2].special()
+        self.assertEqual(grid[1][2].get_color((20, 20, 20), 0, 1, 2), (255, 255, 255))
+        self.assertTrue(grid[1][2].erase(lighten))
+        self.assertEqual(grid[1][2].get_color((20, 20, 20), 0, 1, 2), (235, 235, 235))
+
+    @number("8.2")
+    def test_matches_dense(self):
+        grid = ArraySetGrid(Grid.DRAW_STYLE_SET, 5, 5)
+        control_grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        for g in (grid, control_grid):
+            g[0][0].add(rainbow)
+            g[1][3].add(lighten)
+            g.special()
+            g[4][4].add(invert)
+            g[1][3].special()
+        for x in range(5):
+            for y in range(5):
+                self.assertEqual(
+                    grid[x][y].get_color((100, 100, 100), 7, x, y),
+                    control_grid[x][y].get_color((100, 100, 100), 7, x, y),
+                )
+
+    @number("8.3")
+    def test_other_styles(self):
+        with self.assertRaises(ValueError):
+            ArraySetGrid(Grid.DRAW_STYLE_ADD, 4, 4)
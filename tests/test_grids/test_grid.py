@@ -0,0 +1,169 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from array_grid import ArraySetGrid
+from grid import Grid, SparseGrid
+from layer_store import AdditiveLayerStore, LayerStore, SetLayerStore
+from layers import black, lighten, rainbow, invert
+from mapped_grid import MappedGrid
+from tiled_grid import TiledGrid
+from memory import total_bytes
+
+class TestGrid(unittest.TestCase):
+
+    @number("11.1")
+    def test_shared_special(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 3, 3)
+        control = AdditiveLayerStore()
+        for store in (grid[1][1], control):
+            store.add(lighten)
+            store.add(rainbow)
+            store.add(black)
+        grid.special()
+        control.special()
+        # Only the grid context changed, the stores are read from the other end.
+        self.assertFalse(grid[1][1].reversed)
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 7, 0, 0), control.get_color((100, 100, 100), 7, 0, 0))
+        for store in (grid[1][1], control):
+            store.erase(invert)
+            store.add(invert)
+            store.special()
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 7, 0, 0), control.get_color((100, 100, 100), 7, 0, 0))
+
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 3)
+        control = SetLayerStore()
+        grid[0][2].add(lighten)
+        control.add(lighten)
+        grid.special()
+        control.special()
+        self.assertEqual(grid[0][2].get_color((100, 100, 100), 0, 0, 2), control.get_color((100, 100, 100), 0, 0, 2))
+        self.assertEqual(grid[2][2].get_color((100, 100, 100), 0, 2, 2), (155, 155, 155))
+
+    @number("11.2")
+    def test_reinitialise(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 4)
+        store = grid[2][3]
+        grid[2][3].add(black)
+        grid.special()
+        grid.increase_brush_size()
+        grid.clear()
+        self.assertIs(grid[2][3], store)
+        self.assertEqual(grid.brush_size, Grid.DEFAULT_BRUSH_SIZE)
+        self.assertEqual(grid[2][3].get_color((100, 100, 100), 0, 2, 3), (100, 100, 100))
+
+        grid[2][3].add(black)
+        grid.reinitialise(Grid.DRAW_STYLE_ADD)
+        self.assertIsInstance(grid[2][3], AdditiveLayerStore)
+        grid[2][3].add(lighten)
+        grid.special()
+        grid.reinitialise(Grid.DRAW_STYLE_SET)
+        # The SET stores are reused, emptied.
+        self.assertIs(grid[2][3], store)
+        self.assertEqual(grid[2][3].get_color((100, 100, 100), 0, 2, 3), (100, 100, 100))
+        grid.reinitialise(Grid.DRAW_STYLE_ADD)
+        self.assertEqual(grid[2][3].get_color((100, 100, 100), 0, 2, 3), (100, 100, 100))
+        self.assertEqual(len(grid[2][3].store), 0)
+
+    @number("11.3")
+    def test_memory_usage(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4)
+        usage = grid.memory_usage()
+        self.assertEqual(list(usage), [Grid.DRAW_STYLE_ADD])
+        slots = usage[Grid.DRAW_STYLE_ADD]["queue_slots"]
+        for _ in range(100):
+            grid.paint_cell(0, 0, lighten)
+        self.assertGreater(grid.memory_usage()[Grid.DRAW_STYLE_ADD]["queue_slots"], slots + 100 * 8)
+
+        grid.reinitialise(Grid.DRAW_STYLE_SEQUENCE)
+        usage = grid.memory_usage()
+        self.assertEqual(set(usage), {Grid.DRAW_STYLE_ADD, Grid.DRAW_STYLE_SEQUENCE})
+        self.assertIn("bitsets", usage[Grid.DRAW_STYLE_SEQUENCE])
+        self.assertIn("sorted_lists", usage[Grid.DRAW_STYLE_SEQUENCE])
+        self.assertGreater(total_bytes(usage), total_bytes({Grid.DRAW_STYLE_ADD: usage[Grid.DRAW_STYLE_ADD]}))
+
+        # The running counts match counting every store again, after painting, erasing, reading and specials.
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 3, 3)
+            for layer in (lighten, rainbow, black, lighten):
+                grid.paint_cell(1, 2, layer)
+                grid.paint_cell(0, 0, layer)
+            grid.erase_cell(1, 2, black)
+            grid.render(0)
+            grid.special()
+            grid.render(1)
+            grid.paint_cell(2, 2, black)
+            usage = grid.memory_usage()
+            grid.count_usage()
+            self.assertEqual(usage, grid.memory_usage(), draw_style)
+
+    @number("11.4")
+    def test_layer_indices(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 2, 2)
+        grid[0][0].add(rainbow)
+        self.assertEqual(grid[0][0].layer, rainbow.index)
+        self.assertFalse(grid[0][0].add(rainbow))
+        self.assertTrue(grid[0][0].erase(rainbow))
+        self.assertEqual(grid[0][0].layer, SetLayerStore.EMPTY)
+
+        grid.reinitialise(Grid.DRAW_STYLE_ADD)
+        grid[1][1].add(black)
+        grid[1][1].add(lighten)
+        self.assertEqual([grid[1][1].store[i] for i in range(2)], [black.index, lighten.index])
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 0, 1, 1), lighten.apply((0, 0, 0), 0, 1, 1))
+
+    @number("11.5")
+    def test_render(self):
+        for grid_type in (Grid, SparseGrid):
+            grid = grid_type(Grid.DRAW_STYLE_ADD, 3, 2)
+            grid[2][0].add(black)
+            grid[0][1].add(rainbow)
+            grid[0][1].add(lighten)
+            image = grid.render(7)
+            self.assertEqual(image.shape, (2, 3, 3))
+            self.assertEqual(image.dtype, np.uint8)
+            # y = 0 is the bottom row, as in the window.
+            self.assertEqual(tuple(image[1, 2]), (0, 0, 0))
+            self.assertEqual(tuple(image[0, 0]), lighten.apply(rainbow.apply((255, 255, 255), 7, 0, 1), 7, 0, 1))
+            self.assertEqual(tuple(image[1, 0]), (255, 255, 255))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "canvas.png")
+            big = grid.render(7, cell_size=4, path=path)
+            self.assertEqual(big.shape, (8, 12, 3))
+            np.testing.assert_array_equal(big[::4, ::4], image)
+            from PIL import Image
+            with Image.open(path) as saved:
+                np.testing.assert_array_equal(np.asarray(saved.convert("RGB")), big)
+
+    @number("11.6")
+    def test_cell_views(self):
+        # Every store must implement the whole interface, views included.
+        class Partial(LayerStore):
+            def add(self, layer): return False
+            def get_color(self, start, timestamp, x, y): return start
+            def erase(self, layer): return False
+            def special(self): pass
+        with self.assertRaises(TypeError):
+            Partial()
+
+        grids = [ArraySetGrid(Grid.DRAW_STYLE_SET, 3, 3)]
+        for grid_type in (Grid, SparseGrid, TiledGrid, MappedGrid):
+            grids += [grid_type(style, 3, 3) for style in Grid.DRAW_STYLE_OPTIONS]
+        for grid in grids:
+            name = f"{type(grid).__name__} {grid.draw_style}"
+            for layer in (rainbow, invert, lighten):
+                grid.paint_cell(1, 1, layer)
+            grid[1][1].special()
+            grid.special()
+            color = grid[1][1].get_color((10, 20, 30), 3, 1, 1)
+            self.assertEqual(grid[1][1].compute_color((10, 20, 30), 3, 1, 1), color, name)
+            # Copies are independent of the cell.
+            copy = grid[1][1].copy()
+            self.assertEqual(copy.get_color((10, 20, 30), 3, 1, 1), color, name)
+            grid[1][1].clear()
+            self.assertEqual(grid[1][1].layer_indices(), [], name)
+            self.assertEqual(copy.get_color((10, 20, 30), 3, 1, 1), color, name)
+            self.assertGreater(total_bytes(grid[1][1].memory_usage()), 0, name)
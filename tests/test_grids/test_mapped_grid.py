@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layer_store import AdditiveLayerStore
+from mapped_grid import MappedGrid
+from layers import black, lighten, invert, rainbow, red, sparkle
+
+class TestMappedGrid(unittest.TestCase):
+
+    @number("10.1")
+    def test_matches_dense(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = MappedGrid(style, 6, 6)
+            control_grid = Grid(style, 6, 6)
+            for g in (grid, control_grid):
+                g[1][1].add(lighten)
+                g[1][1].add(red)
+                g[1][1].add(rainbow)
+                g[1][1].add(sparkle)
+                g[2][3].add(invert)
+                g.special()
+                g[4][4].add(lighten)
+                g[4][4].add(black)
+                g[2][3].erase(invert)
+                g[1][1].special()
+                g[1][1].erase(red)
+                g[5][0].special()
+                g[0][5].add(black)
+            for x in range(6):
+                for y in range(6):
+                    self.assertEqual(
+                        grid[x][y].get_color((100, 100, 100), 7, x, y),
+                        control_grid[x][y].get_color((100, 100, 100), 7, x, y),
+                    )
+
+    @number("10.2")
+    def test_reopen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "canvas.bin")
+            grid = MappedGrid(Grid.DRAW_STYLE_ADD, 100, 100, path)
+            grid[99][50].add(black)
+            grid[99][50].add(lighten)
+            grid[0][0].add(black)
+            grid.special()
+            grid.flush()
+            self.assertEqual(os.path.getsize(path), MappedGrid.HEADER_SIZE + 100 * 100 * 64)
+            del grid
+
+            reopened = MappedGrid(Grid.DRAW_STYLE_ADD, 100, 100, path, mode="r+")
+            self.assertEqual(reopened[99][50].get_color((100, 100, 100), 0, 99, 50), (0, 0, 0))
+            reopened.special()
+            self.assertEqual(reopened[99][50].get_color((100, 100, 100), 0, 99, 50), (40, 40, 40))
+            self.assertEqual(reopened[0][1].get_color((100, 100, 100), 0, 0, 1), (100, 100, 100))
+            del reopened
+
+    @number("10.3")
+    def test_full_record(self):
+        # A full record spills into the spill table, and keeps behaving like a dense cell.
+        grid = MappedGrid(Grid.DRAW_STYLE_ADD, 2, 2)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 2, 2)
+        for g in (grid, control_grid):
+            g[0][0].add(black)
+            for _ in range(MappedGrid.ADD_CAPACITY + 10):
+                g[0][0].add(lighten)
+            g[0][0].add(invert)
+            g[0][0].erase(black)
+            g.special()
+            g[0][0].add(black)
+            g[0][0].erase(lighten)
+        self.assertEqual(grid.records["length"][0, 0], MappedGrid.SPILLED)
+        self.assertEqual(grid[0][0].layer_indices(), control_grid[0][0].layer_indices())
+        for start in ((100, 100, 100), (0, 0, 0)):
+            self.assertEqual(
+                grid[0][0].get_color(start, 0, 0, 0), control_grid[0][0].get_color(start, 0, 0, 0),
+            )
+        self.assertIn("spill", grid.memory_usage()[Grid.DRAW_STYLE_ADD])
+
+        # Spilled cells hold as many layers as AdditiveLayerStore.
+        while len(grid[1][1].layer_indices()) < AdditiveLayerStore.CAPACITY:
+            grid[1][1].add(lighten)
+        self.assertRaises(Exception, grid[1][1].add, lighten)
+        grid[1][1].clear()
+        self.assertNotIn((1, 1), grid.spill)
+        # The spilled layers are counted as they change.
+        self.assertEqual(grid.spill_bytes, sum(sys.getsizeof(items) for items in grid.spill.values()))
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 0, 1, 1), (100, 100, 100))
+
+        # The spill table is saved with the file.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "canvas.bin")
+            grid = MappedGrid(Grid.DRAW_STYLE_ADD, 2, 2, path)
+            for _ in range(MappedGrid.ADD_CAPACITY + 2):
+                grid[1][0].add(invert)
+            grid.flush()
+            del grid
+            reopened = MappedGrid(Grid.DRAW_STYLE_ADD, 2, 2, path, mode="r+")
+            self.assertEqual(reopened[1][0].get_color((100, 100, 100), 0, 1, 0), (155, 155, 155))
+            reopened.clear()
+            reopened.flush()
+            self.assertFalse(os.path.exists(path + MappedGrid.SPILL_SUFFIX))
+            del reopened
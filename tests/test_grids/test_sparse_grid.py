@@ -0,0 +1,69 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid, SparseGrid
+from layers import black, lighten, invert, rainbow, red
+
+class TestSparseGrid(unittest.TestCase):
+
+    @number("7.1")
+    def test_lazy_cells(self):
+        grid = SparseGrid(Grid.DRAW_STYLE_SET, 1024, 1024)
+        self.assertEqual(len(grid.cells), 0)
+        self.assertEqual(grid[500][700].get_color((10, 20, 30), 0, 500, 700), (10, 20, 30))
+        self.assertFalse(grid[500][700].erase(black))
+        self.assertEqual(len(grid.cells), 0)
+        self.assertTrue(grid[500][700].add(black))
+        self.assertFalse(grid[500][700].add(black))
+        self.assertEqual(len(grid.cells), 1)
+        self.assertEqual(grid[500][700].get_color((10, 20, 30), 0, 500, 700), (0, 0, 0))
+        with self.assertRaises(IndexError):
+            grid[0][1024]
+
+    @number("7.2")
+    def test_matches_dense(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = SparseGrid(style, 6, 6)
+            control_grid = Grid(style, 6, 6)
+            for g in (grid, control_grid):
+                g[1][1].add(lighten)
+                g[1][1].add(red)
+                g[2][3].add(invert)
+                g.special()
+                g[4][4].add(lighten)
+                g[2][3].erase(invert)
+                g[5][0].special()
+                g.special()
+                g[0][5].add(black)
+            self.assertGridEqual(grid, control_grid)
+
+    @number("7.3")
+    def test_memory_usage(self):
+        # The running counts match counting every store again, after painting, erasing, reading and specials.
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = SparseGrid(style, 40, 40)
+            for layer in (lighten, rainbow, black, lighten):
+                grid.paint_cell(1, 2, layer)
+                grid.paint_cell(30, 0, layer)
+            for i in range(20):
+                grid.paint_cell(i, i, red)
+            grid.erase_cell(1, 2, black)
+            grid.erase_cell(39, 39, black)
+            grid.render(0)
+            grid.special()
+            grid.render(1)
+            grid.paint_cell(2, 2, black)
+            usage = grid.memory_usage()
+            grid.count_usage()
+            self.assertEqual(usage, grid.memory_usage(), style)
+
+    def assertGridEqual(self, grid1: Grid, grid2: Grid):
+        for x in range(len(grid1.grid)):
+            for y in range(len(grid1[x])):
+                sq1 = grid1[x][y]
+                sq2 = grid2[x][y]
+                self.assertEqual(
+                    sq1.get_color((100, 100, 100), 0, x, y),
+                    sq2.get_color((100, 100, 100), 0, x, y),
+                    "Grid not the same after apply has been made."
+                )
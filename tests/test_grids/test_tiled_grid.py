@@ -0,0 +1,118 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from tiled_grid import TiledGrid
+from layers import black, lighten, invert, rainbow
+
+class TestTiledGrid(unittest.TestCase):
+
+    @number("9.1")
+    def test_lazy_tiles(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_ADD, 70, 40)
+        self.assertEqual(len(grid.tiles), 0)
+        self.assertFalse(grid[69][39].erase(black))
+        self.assertEqual(grid[69][39].get_color((10, 10, 10), 0, 69, 39), (10, 10, 10))
+        grid[69][39].add(lighten)
+        self.assertEqual(list(grid.tiles), [(2, 1)])
+        self.assertEqual(grid[69][39].get_color((10, 10, 10), 0, 69, 39), (50, 50, 50))
+
+    @number("9.2")
+    def test_copy_on_write(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_SET, 70, 40)
+        grid[1][1].add(black)
+        grid[40][1].add(lighten)
+        fork = grid.fork()
+        self.assertEqual(fork.changed_tiles(grid), [])
+
+        fork[1][2].add(invert)
+        self.assertEqual(fork.changed_tiles(grid), [(0, 0)])
+        self.assertEqual(grid[1][2].get_color((10, 10, 10), 0, 1, 2), (10, 10, 10))
+        self.assertEqual(fork[1][2].get_color((10, 10, 10), 0, 1, 2), (245, 245, 245))
+        self.assertEqual(fork[1][1].get_color((10, 10, 10), 0, 1, 1), (0, 0, 0))
+
+        grid.special()
+        self.assertEqual(grid[40][1].get_color((10, 10, 10), 0, 40, 1), (205, 205, 205))
+        self.assertEqual(fork[40][1].get_color((10, 10, 10), 0, 40, 1), (50, 50, 50))
+
+        # Swap the inverted tile of the original into the fork.
+        fork.set_tile((0, 0), grid.get_tile((0, 0)))
+        self.assertEqual(fork[1][1].get_color((10, 10, 10), 0, 1, 1), (255, 255, 255))
+        grid[1][1].add(rainbow)
+        self.assertEqual(fork[1][1].get_color((10, 10, 10), 0, 1, 1), (255, 255, 255))
+
+    @number("9.3")
+    def test_matches_dense(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = TiledGrid(style, 40, 6)
+            control_grid = Grid(style, 40, 6)
+            for g in (grid, control_grid):
+                g[1][1].add(lighten)
+                g[33][1].add(rainbow)
+                g.special()
+                g[35][4].add(lighten)
+                g[1][1].erase(lighten)
+                g[2][0].special()
+                g[0][5].add(black)
+            for x in range(40):
+                for y in range(6):
+                    self.assertEqual(
+                        grid[x][y].get_color((100, 100, 100), 3, x, y),
+                        control_grid[x][y].get_color((100, 100, 100), 3, x, y),
+                    )
+
+    @number("9.4")
+    def test_special_keeps_tiles_shared(self):
+        for style in (Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_ADD):
+            grid = TiledGrid(style, 70, 40)
+            grid[1][1].add(lighten)
+            grid[40][1].add(black)
+            fork = grid.fork()
+            fork.special()
+            for key in grid.tiles:
+                self.assertIs(fork.tiles[key], grid.tiles[key])
+            self.assertEqual(sorted(fork.changed_tiles(grid)), [(0, 0), (1, 0)])
+
+            control_grid = Grid(style, 70, 40)
+            control_grid[1][1].add(lighten)
+            control_grid[40][1].add(black)
+            control_grid.special()
+            for x, y in ((1, 1), (40, 1), (2, 2), (69, 39)):
+                self.assertEqual(fork[x][y].get_color((10, 10, 10), 0, x, y), control_grid[x][y].get_color((10, 10, 10), 0, x, y))
+                self.assertEqual(fork[x][y].copy().get_color((10, 10, 10), 0, x, y), control_grid[x][y].get_color((10, 10, 10), 0, x, y))
+            self.assertEqual(grid[1][1].get_color((10, 10, 10), 0, 1, 1), (50, 50, 50))
+
+            # Writing to the tile folds the fork's specials into its copy.
+            fork[2][2].add(lighten)
+            control_grid[2][2].add(lighten)
+            self.assertIsNot(fork.tiles[(0, 0)], grid.tiles[(0, 0)])
+            self.assertEqual(fork.shared_contexts.keys(), {(1, 0)})
+            for x, y in ((1, 1), (2, 2)):
+                self.assertEqual(fork[x][y].get_color((10, 10, 10), 0, x, y), control_grid[x][y].get_color((10, 10, 10), 0, x, y))
+            # So does handing the tile to another grid.
+            grid.set_tile((1, 0), fork.get_tile((1, 0)))
+            self.assertEqual(grid[40][1].get_color((10, 10, 10), 0, 40, 1), control_grid[40][1].get_color((10, 10, 10), 0, 40, 1))
+
+    @number("9.5")
+    def test_memory_usage(self):
+        # The running counts of the tiles match counting them again, after painting, erasing, reading,
+        # forking and specials.
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = TiledGrid(style, 70, 40)
+            for layer in (lighten, rainbow, black, lighten):
+                grid.paint_cell(1, 2, layer)
+                grid.paint_cell(40, 0, layer)
+            grid.erase_cell(1, 2, black)
+            grid.erase_cell(69, 39, black)
+            fork = grid.fork()
+            fork.special()
+            for g in (grid, fork):
+                g.render(0)
+                g.special()
+                g.render(1)
+            fork.paint_cell(2, 2, black)
+            for g in (grid, fork):
+                usage = g.memory_usage()
+                for tile in g.tiles.values():
+                    tile.count_usage()
+                self.assertEqual(usage, g.memory_usage(), style)
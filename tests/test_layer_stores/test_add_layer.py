@@ -1,8 +1,11 @@
 import unittest
 from ed_utils.decorators import number
 
-from layer_store import AdditiveLayerStore
-from layers import black, lighten, rainbow, invert
+import random
+from grid import Grid
+from layer_store import AdditiveLayerStore, GridContext
+from layer_util import get_layers
+from layers import black, darken, lighten, rainbow, invert, red, sparkle
 
 class TestAddLayer(unittest.TestCase):
 
@@ -62,3 +65,112 @@ class TestAddLayer(unittest.TestCase):
         s.erase(black)
         s.add(invert)
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (255-91, 255-214, 255-104))
+
+    @number("2.6")
+    def test_growing_store(self):
+        s = AdditiveLayerStore()
+        self.assertEqual(len(s.store.array), AdditiveLayerStore.INITIAL_CAPACITY)
+        for _ in range(100):
+            s.add(lighten)
+        s.add(invert)
+        self.assertEqual(s.get_color((0, 0, 0), 0, 0, 0), (0, 0, 0))
+        s.special()
+        self.assertEqual(s.get_color((0, 0, 0), 0, 0, 0), (255, 255, 255))
+        # invert is now at the front, so it is erased first.
+        for _ in range(100):
+            self.assertTrue(s.erase(lighten))
+        self.assertEqual(s.get_color((0, 0, 0), 0, 0, 0), (40, 40, 40))
+        self.assertLessEqual(len(s.store.array), 2 * AdditiveLayerStore.INITIAL_CAPACITY)
+
+    @number("2.7")
+    def test_color_cache(self):
+        s = AdditiveLayerStore()
+        s.add(lighten)
+        s.add(black)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 1, 1), (0, 0, 0))
+        # Nothing depends on time, so the colour is reused for any timestamp.
+        self.assertEqual(s.cache[5], None)
+        cache = s.cache
+        self.assertEqual(s.get_color((100, 100, 100), 9, 1, 1), (0, 0, 0))
+        self.assertIs(s.cache, cache)
+
+        # Mutations invalidate the colour.
+        s.erase(lighten)
+        s.add(lighten)
+        self.assertEqual(s.get_color((100, 100, 100), 9, 1, 1), (40, 40, 40))
+        s.special()
+        self.assertEqual(s.get_color((100, 100, 100), 9, 1, 1), (0, 0, 0))
+
+        # A time dependent layer makes the timestamp part of the key.
+        s.add(rainbow)
+        self.assertEqual(s.get_color((100, 100, 100), 9, 1, 1), s.compute_color((100, 100, 100), 9, 1, 1))
+        self.assertEqual(s.get_color((100, 100, 100), 13, 1, 1), s.compute_color((100, 100, 100), 13, 1, 1))
+        self.assertNotEqual(s.get_color((100, 100, 100), 9, 1, 1), s.get_color((100, 100, 100), 13, 1, 1))
+
+    @number("2.8")
+    def test_effective_program(self):
+        s = AdditiveLayerStore()
+        for layer in [rainbow, lighten, lighten, darken, invert, invert]:
+            s.add(layer)
+        # lighten, lighten and darken compose into one map, and the inverts cancel out.
+        self.assertEqual(len(s.effective_program()), 2)
+        s.add(red)
+        self.assertEqual(len(s.effective_program()), 1)
+        self.assertEqual(s.get_color((1, 2, 3), 0, 0, 0), (255, 0, 0))
+        # Reversing rebuilds the program, rainbow now comes last and discards the rest.
+        s.special()
+        self.assertEqual(s.effective_program(), [rainbow.index])
+        # Erasing still follows the queue.
+        s.erase(red)
+        s.special()
+        self.assertEqual(len(s.effective_program()), 2)
+        color = rainbow.apply((1, 2, 3), 5, 2, 3)
+        for layer in [lighten, lighten, darken]:
+            color = layer.apply(color, 5, 2, 3)
+        self.assertEqual(s.get_color((1, 2, 3), 5, 2, 3), color)
+
+        # Same colours as applying every layer in order.
+        layers = [layer for layer in get_layers() if layer is not None]
+        rng = random.Random(7)
+        context = GridContext()
+        s = AdditiveLayerStore(context)
+        applied = []
+        for step in range(400):
+            action = rng.random()
+            if action < 0.6:
+                layer = rng.choice(layers)
+                s.add(layer)
+                applied.append(layer)
+            elif action < 0.8:
+                if s.erase(sparkle):
+                    applied.pop(0)
+            else:
+                if action < 0.9:
+                    s.special()
+                else:
+                    context.special_count += 1
+                applied.reverse()
+            color = (100, 150, 200)
+            for layer in applied:
+                color = layer.apply(color, step, 4, 5)
+            self.assertEqual(tuple(s.get_color((100, 150, 200), step, 4, 5)), tuple(color))
+
+    @number("2.9")
+    def test_program_after_specials(self):
+        # A layer added between two grid-wide specials must not be lost from the program.
+        grid = Grid(Grid.DRAW_STYLE_ADD, 2, 2)
+        grid.paint_cell(0, 0, lighten)
+        self.assertEqual(grid[0][0].get_color((0, 0, 0), 0, 0, 0), (40, 40, 40))
+        grid.special()
+        grid.paint_cell(0, 0, red)
+        grid.special()
+        self.assertEqual(grid[0][0].get_color((0, 0, 0), 0, 0, 0), (255, 40, 40))
+
+        # Same with the store's own special.
+        s = AdditiveLayerStore()
+        s.add(lighten)
+        s.get_color((0, 0, 0), 0, 0, 0)
+        s.special()
+        s.add(red)
+        s.special()
+        self.assertEqual(s.get_color((0, 0, 0), 0, 0, 0), (255, 40, 40))
@@ -2,7 +2,7 @@ import unittest
 from ed_utils.decorators import number
 
 from layer_store import SequenceLayerStore
-from layers import black, lighten, rainbow, invert
+from layers import black, darken, lighten, rainbow, invert, sparkle
 
 class TestSeqLayer(unittest.TestCase):
 
@@ -69,3 +69,24 @@ class TestSeqLayer(unittest.TestCase):
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (0, 0, 0))
         s.erase(black)
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (91, 214, 104))
+
+    @number("3.6")
+    def test_program(self):
+        s = SequenceLayerStore()
+        for layer in [sparkle, lighten, invert, darken]:
+            s.add(layer)
+        # Applied in index order: lighten and invert as one table lookup, then sparkle, then darken.
+        color = (100, 100, 100)
+        for layer in [lighten, invert, sparkle, darken]:
+            color = layer.apply(color, 3, 4, 5)
+        self.assertEqual(s.get_color((100, 100, 100), 3, 4, 5), color)
+        self.assertEqual(len(s.program[1]), 3)
+        self.assertEqual(s.program[1][1], sparkle.index)
+
+        # The program is rebuilt when the layers change.
+        s.erase(sparkle)
+        color = (100, 100, 100)
+        for layer in [lighten, invert, darken]:
+            color = layer.apply(color, 3, 4, 5)
+        self.assertEqual(s.get_color((100, 100, 100), 3, 4, 5), color)
+        self.assertEqual(len(s.program[1]), 1)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from action import PaintAction, PaintSteps
+from export import ReplayExporter
+from grid import Grid
+from layers import black, red, green
+from replay import ReplayTracker
+
+class TestExport(unittest.TestCase):
+
+    def make_replay(self) -> tuple[ReplayTracker, Grid]:
+        tracker = ReplayTracker()
+        control = Grid(Grid.DRAW_STYLE_SET, 4, 3)
+        steps = PaintSteps()
+        actions = []
+        for i, layer in enumerate((black, red, green, red, black)):
+            actions.append(PaintAction([steps.of((i % 4, i % 3), layer), steps.of((3, 2), layer)]))
+        for action in actions:
+            tracker.add_action(action)
+            action.redo_apply(control)
+        tracker.add_action(actions[-1], True)
+        actions[-1].undo_apply(control)
+        return tracker, control
+
+    @number("15.1")
+    def test_frames(self):
+        tracker, control = self.make_replay()
+        frames = list(ReplayExporter(actions_per_frame=4, cell_size=2).frames(tracker, Grid(Grid.DRAW_STYLE_SET, 4, 3)))
+        # 6 actions, 4 per frame
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[-1].shape, (6, 8, 3))
+        np.testing.assert_array_equal(frames[-1], control.render(0, cell_size=2))
+        self.assertTrue(tracker.replay_queue.is_empty())
+
+    @number("15.2")
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tracker, control = self.make_replay()
+            count = ReplayExporter().export_png(tracker, Grid(Grid.DRAW_STYLE_SET, 4, 3), directory)
+            self.assertEqual(count, 6)
+            self.assertEqual(sorted(os.listdir(directory))[-1], "frame000005.png")
+
+            tracker, control = self.make_replay()
+            path = os.path.join(directory, "replay.gif")
+            count = ReplayExporter(actions_per_frame=2).export_gif(tracker, Grid(Grid.DRAW_STYLE_SET, 4, 3), path)
+            self.assertEqual(count, 3)
+            from PIL import Image
+            with Image.open(path) as gif:
+                self.assertEqual(gif.n_frames, 3)
+                gif.seek(2)
+                np.testing.assert_array_equal(np.asarray(gif.convert("RGB")), control.render(0))
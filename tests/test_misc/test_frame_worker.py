@@ -0,0 +1,102 @@
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from frame_buffer import FrameBuffer, FrameWorker, GridSnapshot
+from grid import Grid
+from layers import black, invert, rainbow, sparkle
+
+class FakeRenderer:
+    def __init__(self):
+        self.colors = {}
+
+    def refresh(self, x, y, color):
+        self.colors[(x, y)] = color
+        return True
+
+class TestFrameWorker(unittest.TestCase):
+
+    @number("17.1")
+    def test_frames(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 5, 4)
+        worker = FrameWorker(grid, [255, 255, 255])
+        renderer = FakeRenderer()
+        # Nothing is shown before the first frame is computed.
+        self.assertEqual(worker.present(renderer), 0)
+        worker.start()
+        try:
+            with worker.lock:
+                grid.paint_cell(1, 1, black)
+                grid.paint_cell(4, 3, sparkle)
+            worker.request(3)
+            self.assertTrue(worker.wait(10))
+            np.testing.assert_array_equal(worker.frame(), grid.render(3))
+            self.assertEqual(worker.present(renderer), 20)
+            self.assertEqual(renderer.colors[(1, 1)], (0, 0, 0))
+
+            with worker.lock:
+                grid.erase_cell(1, 1, black)
+            worker.request(3)
+            self.assertTrue(worker.wait(10))
+            self.assertEqual(worker.present(renderer), 1)
+            self.assertEqual(renderer.colors[(1, 1)], (255, 255, 255))
+            self.assertEqual(worker.present(renderer), 0)
+        finally:
+            worker.stop()
+        worker.thread.join(10)
+        self.assertFalse(worker.thread.is_alive())
+
+    @number("17.2")
+    def test_snapshot(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4)
+        grid.paint_cell(1, 1, black)
+        snapshot = GridSnapshot(4, 4)
+        snapshot.capture(grid, (0, 0, 4, 4), False)
+        self.assertIsNone(snapshot.take_dirty())
+        self.assertEqual(snapshot.take_dirty(), set())
+        # Changes to the grid after the capture, even grid-wide ones, don't reach the copies.
+        grid.paint_cell(2, 2, invert)
+        grid.special()
+        self.assertEqual(snapshot[1][1].get_color((255, 255, 255), 0, 1, 1), (0, 0, 0))
+        self.assertEqual(snapshot[2][2].get_color((255, 255, 255), 0, 2, 2), (255, 255, 255))
+
+        # Grid-wide changes copy every cell again, otherwise only the dirty cells of the region.
+        snapshot.capture(grid, (0, 0, 2, 4), False)
+        self.assertIsNone(snapshot.take_dirty())
+        self.assertEqual(snapshot[1][1].get_color((255, 255, 255), 0, 1, 1), (0, 0, 0))
+        self.assertEqual(snapshot[1][1].context.special_count, 1)
+        grid.paint_cell(0, 3, black)
+        grid.paint_cell(3, 3, black)
+        old = snapshot[1][1]
+        snapshot.capture(grid, (0, 0, 2, 4), False)
+        self.assertEqual(snapshot.take_dirty(), {(0, 3), (3, 3)})
+        self.assertIs(snapshot[1][1], old)
+        self.assertEqual(snapshot[0][3].get_color((255, 255, 255), 0, 0, 3), (0, 0, 0))
+        self.assertNotIn(3, snapshot.columns)
+
+    @number("17.3")
+    def test_hue_steps(self):
+        self.assertRaises(ValueError, FrameBuffer, 4, 4, 30)
+        frames = []
+        for hue_steps in (None, 20):
+            grid = Grid(Grid.DRAW_STYLE_SET, 4, 4)
+            grid.paint_cell(1, 2, rainbow)
+            frame = FrameBuffer(4, 4, hue_steps)
+            frame.update(grid, 0.4, [255, 255, 255])
+            frames.append(frame.image.copy())
+        # Each renderer draws the rainbow at its own resolution, leaving the layer exact elsewhere.
+        self.assertNotEqual(frames[0][1, 1].tolist(), frames[1][1, 1].tolist())
+        self.assertEqual(tuple(frames[0][1, 1]), rainbow.apply((255, 255, 255), 0.4, 1, 2))
+
+        # The colour cached by a quantized renderer is not reused by an exact render of the same store.
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 4)
+        grid.paint_cell(0, 0, rainbow)
+        exact = Grid(Grid.DRAW_STYLE_SET, 4, 4)
+        exact.paint_cell(0, 0, rainbow)
+        expected = exact.render(0.01)
+        frame = FrameBuffer(4, 4, 20)
+        frame.update(grid, 0.01, [255, 255, 255])
+        self.assertNotEqual(frame.image[3, 0].tolist(), expected[3, 0].tolist())
+        np.testing.assert_array_equal(grid.render(0.01), expected)
+        frame.update(grid, 0.01, [255, 255, 255])
+        self.assertNotEqual(frame.image[3, 0].tolist(), expected[3, 0].tolist())
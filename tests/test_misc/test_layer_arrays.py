@@ -0,0 +1,77 @@
+import threading
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from layer_util import Layer, get_layers
+from layers import LCG_INCREMENTS, LCG_MULTIPLIERS, lcg_array, rainbow, rainbow_resolution
+
+class TestLayerArrays(unittest.TestCase):
+
+    @number("14.1")
+    def test_matches_apply(self):
+        rng = np.random.default_rng(2023)
+        xs, ys = np.meshgrid(np.arange(40), np.arange(35), indexing="ij")
+        colors = rng.integers(0, 256, size=xs.shape + (3,))
+        for layer in get_layers():
+            if layer is None:
+                break
+            self.assertIsNotNone(layer.kernel, layer.name)
+            for timestamp in (0, 0.37, 5.05, 19.999, 123.4):
+                result = layer.apply_array(colors, timestamp, xs, ys)
+                self.assertEqual(result.shape, colors.shape)
+                expected = [
+                    [layer.apply(tuple(int(c) for c in colors[x, y]), timestamp, x, y) for y in range(xs.shape[1])]
+                    for x in range(xs.shape[0])
+                ]
+                np.testing.assert_array_equal(result, np.array(expected), err_msg=f"{layer.name} at {timestamp}")
+
+    @number("14.2")
+    def test_fallback(self):
+        def swap(color, timestamp, x, y):
+            return (color[2], color[1] + x, color[0] + y)
+        layer = Layer(19, swap)
+        result = layer.apply_array([[1, 2, 3], [4, 5, 6]], 0, [10, 20], [100, 200])
+        np.testing.assert_array_equal(result, [[3, 12, 101], [6, 25, 204]])
+
+    @number("14.3")
+    def test_lcg_jumps(self):
+        # One jump gives the same value as running the sparkle LCG step by step.
+        starts = [0, 1, 31, 12345, (1 << 31) - 1, (1 << 31) + 40]
+        for start in starts:
+            other = start
+            for steps in range(1, len(LCG_MULTIPLIERS)):
+                other = (1103515245 * other + 12345) % (1 << 31)
+                self.assertEqual((LCG_MULTIPLIERS[steps] * start + LCG_INCREMENTS[steps]) % (1 << 31), other)
+        steps = np.array([10, 26, 17, 1, 10, 11])
+        expected = []
+        for start, count in zip(starts, steps):
+            for _ in range(count):
+                start = (1103515245 * start + 12345) % (1 << 31)
+            expected.append(start)
+        self.assertEqual(lcg_array(np.array(starts), steps).tolist(), expected)
+
+    @number("14.4")
+    def test_rainbow_table(self):
+        xs, ys = np.meshgrid(np.arange(30), np.arange(25), indexing="ij")
+        colors = np.zeros((30, 25, 3), dtype=np.int64)
+        exact = {t: rainbow.apply_array(colors, t, xs, ys) for t in [0, 0.4, 13.37]}
+        with self.assertRaises(ValueError):
+            with rainbow_resolution(1000 + 1):
+                pass
+        with rainbow_resolution(3600):
+            for t, expected in exact.items():
+                result = rainbow.apply_array(colors, t, xs, ys)
+                # Hues are rounded down to 1/3600, which moves a channel by at most one.
+                self.assertLessEqual(np.abs(result - expected).max(), 1)
+                for x, y in [(0, 0), (7, 3), (29, 24)]:
+                    self.assertEqual(rainbow.apply((0, 0, 0), t, x, y), tuple(result[x, y]))
+        # Only the block looks hues up, other threads never do.
+        self.assertEqual(rainbow.apply_array(colors, 0.4, xs, ys).tolist(), exact[0.4].tolist())
+        results = []
+        with rainbow_resolution(20):
+            thread = threading.Thread(target=lambda: results.append(rainbow.apply((0, 0, 0), 0.4, 0, 0)))
+            thread.start()
+            thread.join()
+            self.assertNotEqual(rainbow.apply((0, 0, 0), 0.4, 0, 0), results[0])
+        self.assertEqual(results[0], tuple(exact[0.4][0, 0]))
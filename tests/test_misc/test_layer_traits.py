@@ -0,0 +1,65 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_util import IDENTITY_TABLES, Layer, apply_tables, compose_tables, get_layers, traits
+from layers import darken, invert, lighten
+
+class TestLayerTraits(unittest.TestCase):
+
+    @number("13.1")
+    def test_declared_traits(self):
+        layers = {layer.name: layer for layer in get_layers() if layer is not None}
+        self.assertEqual({name for name, layer in layers.items() if layer.time_dependent}, {"rainbow", "sparkle"})
+        self.assertEqual(
+            {name for name, layer in layers.items() if layer.constant},
+            {"rainbow", "black", "red", "green", "blue"},
+        )
+
+        # Check the declarations against the layers themselves.
+        colors = [(0, 0, 0), (10, 200, 30), (255, 255, 255)]
+        points = [(0, 0, 0), (3.5, 7, 2), (11, 31, 29)]
+        for layer in layers.values():
+            results = {layer.apply(c, t, x, y) for c in colors for t, x, y in points}
+            if layer.constant and not layer.time_dependent and not layer.position_dependent:
+                self.assertEqual(len(results), 1, layer.name)
+            if not layer.time_dependent and not layer.position_dependent:
+                for c in colors:
+                    self.assertEqual(len({layer.apply(c, t, x, y) for t, x, y in points}), 1, layer.name)
+            if layer.pointwise and not layer.constant:
+                for channel in range(3):
+                    outputs = {}
+                    for c in colors + [(c[1], c[2], c[0]) for c in colors]:
+                        outputs.setdefault(c[channel], set()).add(layer.apply(c, 0, 0, 0)[channel])
+                    self.assertTrue(all(len(out) == 1 for out in outputs.values()), layer.name)
+
+    @number("13.2")
+    def test_default_and_late_traits(self):
+        def custom(color, timestamp, x, y):
+            return color
+        layer = Layer(19, custom)
+        # Undeclared layers are assumed to depend on everything.
+        self.assertTrue(layer.time_dependent)
+        self.assertTrue(layer.position_dependent)
+        self.assertFalse(layer.constant)
+        self.assertFalse(layer.pointwise)
+
+        self.assertIs(traits(time=False, position=False, pointwise=True)(layer), layer)
+        self.assertFalse(layer.time_dependent)
+        self.assertTrue(layer.pointwise)
+        self.assertTrue(Layer(19, custom).pointwise)
+
+    @number("13.3")
+    def test_channel_tables(self):
+        for layer in get_layers():
+            if layer is None or not layer.pointwise:
+                continue
+            tables = layer.channel_tables()
+            self.assertIs(layer.channel_tables(), tables)
+            for color in [(0, 0, 0), (10, 200, 30), (255, 255, 255), (39, 40, 216)]:
+                self.assertEqual(apply_tables(tables, color), tuple(layer.apply(color, 0, 0, 0)), layer.name)
+
+        # Composed tables are shared, and inverting twice does nothing.
+        both = compose_tables(lighten.channel_tables(), darken.channel_tables())
+        self.assertIs(compose_tables(lighten.channel_tables(), darken.channel_tables()), both)
+        self.assertEqual(apply_tables(both, (0, 100, 250)), (0, 100, 215))
+        self.assertIs(compose_tables(invert.channel_tables(), invert.channel_tables()), IDENTITY_TABLES)
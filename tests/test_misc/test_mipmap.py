@@ -0,0 +1,114 @@
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import black, rainbow
+from mipmap import Mipmap
+
+class FakeRenderer:
+    def __init__(self, region):
+        self.region = region
+        self.stale = True
+        self.colors = {}
+
+    def refresh(self, x, y, color):
+        self.colors[(x, y)] = color
+        return True
+
+class CountingGrid:
+    """Counts the cells the mipmap evaluates."""
+    def __init__(self, grid):
+        self.grid = grid
+        self.reads = 0
+
+    def __getitem__(self, x):
+        self.reads += 1
+        return self.grid[x]
+
+    def take_dirty(self):
+        return self.grid.take_dirty()
+
+class TestMipmap(unittest.TestCase):
+
+    @number("19.1")
+    def test_levels(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 3)
+        mipmap = Mipmap(5, 3)
+        self.assertEqual([level.shape[:2] for level in mipmap.levels], [(5, 3), (3, 2), (2, 1), (1, 1)])
+        grid.paint_cell(0, 0, black)
+        mipmap.update(grid, 0, [255, 255, 255])
+        self.assertEqual(mipmap.color(0, 0, 0), (0, 0, 0))
+        self.assertEqual(mipmap.color(1, 0, 0), (191, 191, 191))
+        # The block along the right edge only covers 2 cells.
+        self.assertEqual(mipmap.color(1, 2, 0), (255, 255, 255))
+        self.assertEqual(mipmap.color(3, 0, 0), (238, 238, 238))
+
+        # Dirty cells propagate up one block per level, the rest is untouched.
+        grid.paint_cell(4, 2, black)
+        mipmap.changed = [set() for _ in mipmap.levels]
+        self.assertEqual(mipmap.update(grid, 1, [255, 255, 255]), 1)
+        self.assertEqual(mipmap.changed, [{(4, 2)}, {(2, 1)}, {(1, 0)}, {(0, 0)}])
+        self.assertEqual(mipmap.color(1, 2, 1), (0, 0, 0))
+        self.assertEqual(mipmap.color(3, 0, 0), (221, 221, 221))
+        # Same result as rebuilding every level.
+        incremental = [level.copy() for level in mipmap.levels]
+        grid.special()
+        grid.special()
+        mipmap.update(grid, 1, [255, 255, 255])
+        for level, expected in zip(mipmap.levels, incremental):
+            np.testing.assert_allclose(level, expected, rtol=1e-6)
+
+    @number("19.2")
+    def test_present(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 8, 8)
+        mipmap = Mipmap(8, 8)
+        grid.paint_cell(1, 1, rainbow)
+        grid.paint_cell(6, 6, rainbow)
+        mipmap.update(grid, 0, [255, 255, 255])
+        renderer = FakeRenderer((0, 0, 2, 2))
+        # Every block of the region is shown first, then only the changed ones.
+        self.assertEqual(mipmap.present(renderer, 2), 4)
+        self.assertEqual(renderer.colors[(1, 1)], mipmap.color(2, 1, 1))
+
+        # Live cells are only recomputed inside the region.
+        mipmap.set_region(0, 0, 4, 4)
+        self.assertEqual(mipmap.update(grid, 5, [255, 255, 255]), 1)
+        self.assertEqual(mipmap.present(renderer, 2), 1)
+        self.assertEqual(mipmap.color(0, 1, 1), rainbow.apply((255, 255, 255), 5, 1, 1))
+        self.assertEqual(mipmap.color(0, 6, 6), rainbow.apply((255, 255, 255), 0, 6, 6))
+
+    @number("19.3")
+    def test_drawn_level(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 64, 64)
+        for i in range(64):
+            grid.paint_cell(i, i, rainbow)
+        counting = CountingGrid(grid)
+        mipmap = Mipmap(64, 64)
+        # Zoomed out to blocks of 16 by 16 cells, only the 2 by 2 visible blocks are evaluated, once each.
+        mipmap.set_region(0, 0, 2, 2, 4)
+        mipmap.update(counting, 0, [255, 255, 255])
+        self.assertEqual(counting.reads, 4)
+        # The live blocks on the diagonal are sampled again every frame, the others are up to date.
+        counting.reads = 0
+        mipmap.update(counting, 1, [255, 255, 255])
+        self.assertEqual(counting.reads, 2)
+        self.assertEqual(mipmap.color(4, 0, 0), rainbow.apply((255, 255, 255), 1, 8, 8))
+        self.assertTrue(mipmap.outdated[4][3, 3])
+
+        # A dirty cell is recomputed exactly, its outdated blocks above are left for when they are drawn.
+        counting.reads = 0
+        grid.paint_cell(40, 2, black)
+        mipmap.set_region(2, 0, 4, 1, 4)
+        mipmap.update(counting, 1, [255, 255, 255])
+        self.assertEqual(counting.reads, 1 + 2)
+        self.assertEqual(mipmap.color(0, 40, 2), (0, 0, 0))
+        self.assertFalse(mipmap.outdated[4][2, 0])
+
+        # After a grid-wide change, only the region is recomputed.
+        grid.special()
+        counting.reads = 0
+        mipmap.update(counting, 1, [255, 255, 255])
+        self.assertEqual(counting.reads, 2)
+        self.assertTrue(mipmap.outdated[0].all())
+        self.assertTrue(mipmap.outdated[4][:2].all())
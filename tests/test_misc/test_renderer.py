@@ -0,0 +1,55 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import black, rainbow, red
+from renderer import GridRenderer
+
+class TestRenderer(unittest.TestCase):
+
+    @number("12.1")
+    def test_changed_cells(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 3)
+        renderer = GridRenderer(4, 3, 10, 20)
+        self.assertEqual(len(renderer.sprites), 12)
+        self.assertEqual(renderer.sprites[1*3 + 2].center_x, 15)
+        self.assertEqual(renderer.sprites[1*3 + 2].center_y, 50)
+
+        # Every cell is tinted on the first frame, then only the cells whose colour changed.
+        self.assertEqual(renderer.update(grid, 0, [255, 255, 255]), 12)
+        self.assertEqual(renderer.update(grid, 1, [255, 255, 255]), 0)
+        grid.paint_cell(1, 2, black)
+        grid.paint_cell(3, 0, red)
+        self.assertEqual(renderer.update(grid, 2, [255, 255, 255]), 2)
+        self.assertEqual(renderer.sprites[1*3 + 2].color, tuple(black.apply((255, 255, 255), 2, 1, 2)))
+        self.assertEqual(renderer.sprites[0].color, (255, 255, 255))
+
+    @number("12.2")
+    def test_dirty_and_live_cells(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 3, 3)
+        renderer = GridRenderer(3, 3, 10, 10)
+        renderer.update(grid, 0, [255, 255, 255])
+        self.assertEqual(grid.take_dirty(), set())
+
+        grid.paint_cell(0, 1, rainbow)
+        self.assertEqual(grid.dirty, {(0, 1)})
+        store = grid[0][1]
+        version = store.version
+        self.assertEqual(renderer.update(grid, 0, [255, 255, 255]), 1)
+        self.assertEqual(renderer.live, {(0, 1)})
+        # The painted cell is recomputed every frame, even though nothing was marked dirty.
+        self.assertEqual(renderer.update(grid, 5, [255, 255, 255]), 1)
+        self.assertEqual(renderer.sprites[1].color, rainbow.apply((255, 255, 255), 5, 0, 1))
+
+        grid.erase_cell(0, 1, rainbow)
+        self.assertGreater(store.version, version)
+        renderer.update(grid, 6, [255, 255, 255])
+        self.assertEqual(renderer.live, set())
+        self.assertEqual(renderer.sprites[1].color, (255, 255, 255))
+
+        # Layers that don't depend on time are only recomputed when their cell is dirty.
+        grid.paint_cell(2, 2, black)
+        self.assertEqual(renderer.update(grid, 7, [255, 255, 255]), 1)
+        self.assertEqual(renderer.live, set())
+        grid.special()
+        self.assertIsNone(grid.take_dirty())
@@ -0,0 +1,29 @@
+import unittest
+from ed_utils.decorators import number
+
+from layers import black, lighten, rainbow
+from sidebar import Sidebar
+
+class TestSidebar(unittest.TestCase):
+
+    @number("16.1")
+    def test_cached_buttons(self):
+        sidebar = Sidebar(700, 700, 50, [255, 255, 255])
+        self.assertEqual(len(sidebar.buttons), 2 * len(sidebar.layers))
+        self.assertTrue(sidebar.update(-1, True))
+        self.assertEqual(sidebar.fills[rainbow.index].color, rainbow.bg)
+        # Nothing changed, so the buttons are not recoloured.
+        self.assertFalse(sidebar.update(-1, True))
+
+        self.assertTrue(sidebar.update(black.index, True))
+        self.assertEqual(sidebar.fills[black.index].color, lighten.apply(black.bg, 0, 0, 0))
+        self.assertTrue(sidebar.update(black.index, False))
+        self.assertEqual(sidebar.fills[rainbow.index].color, lighten.apply(rainbow.bg, 0, 0, 0))
+
+    @number("16.2")
+    def test_layer_at(self):
+        sidebar = Sidebar(700, 700, 50, [255, 255, 255])
+        self.assertEqual(sidebar.layer_at(710, 690), 0)
+        self.assertEqual(sidebar.layer_at(760, 640), 3)
+        self.assertEqual(sidebar.layer_at(650, 690), -1)
+        self.assertEqual(sidebar.bounds(3), (750, 800, 650, 600))
@@ -1,8 +1,10 @@
+import sys
 import unittest
 from ed_utils.decorators import number
 
-from action import PaintAction, PaintStep
+from action import PaintAction, PaintStep, PaintSteps
 from undo import UndoTracker
+from replay import ReplayTracker
 from layers import green, red, blue
 from grid import Grid
 
@@ -65,6 +67,36 @@ class TestUndo(unittest.TestCase):
         action = undo.undo(grid)
         self.assertEqual(action, None)
 
+    @number("4.2")
+    def test_memory_usage(self):
+        undo = UndoTracker()
+        replay = ReplayTracker()
+        empty = undo.memory_usage()
+        empty_replay = replay.memory_usage()
+        steps = PaintSteps()
+        action = PaintAction([steps.of((1, 1), red), steps.of((1, 2), red)])
+        undo.add_action(action)
+        replay.add_action(action)
+        self.assertGreater(undo.memory_usage()["history"], 0)
+        self.assertEqual(undo.memory_usage()["history_slots"], empty["history_slots"])
+        self.assertEqual(replay.memory_usage()["history"], undo.memory_usage()["history"])
+        self.assertIs(steps.of((1, 1), red), action.steps[0])
+        self.assertEqual(steps.memory_usage()["shared_steps"], sys.getsizeof(steps.steps) + 2 * (
+            sys.getsizeof(action.steps[0]) + sys.getsizeof(action.steps[0].affected_grid_square)
+        ))
+        # Steps are only shared within a cache, which the window starts again on reset.
+        self.assertIsNot(PaintSteps().of((1, 1), red), action.steps[0])
+
+        # The running counts follow the actions from stack to stack, and out of the trackers.
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        undo.undo(grid)
+        self.assertEqual(undo.memory_usage()["history"], action.nbytes())
+        undo.add_action(PaintAction([]))
+        self.assertEqual(undo.memory_usage()["history"], PaintAction([]).nbytes())
+        replay.start_replay()
+        replay.play_next_action(grid)
+        self.assertEqual(replay.memory_usage(), empty_replay)
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
@@ -75,4 +107,3 @@ class TestUndo(unittest.TestCase):
                     sq2.get_color((0, 0, 0), 0, x, y),
                     "Grid not the same after apply has been made."
                 )
-
@@ -0,0 +1,78 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import black
+from renderer import GridRenderer
+from viewport import Viewport
+
+class TestViewport(unittest.TestCase):
+
+    @number("18.1")
+    def test_pan_and_zoom(self):
+        # A small grid fits the panel, as before.
+        viewport = Viewport(32, 32, 700, 700)
+        self.assertEqual(viewport.zoom, 1)
+        self.assertEqual(viewport.visible_cells(), (0, 0, 32, 32))
+        self.assertEqual(viewport.screen_to_cell(700/32 * 3.5, 700/32 * 5), (3.5, 5))
+        # Panning can't move the grid off the panel.
+        viewport.pan(100, -100)
+        self.assertEqual((viewport.left, viewport.bottom), (0, 0))
+
+        # Without levels of detail, a large grid starts zoomed in, only showing the cells of the bottom left corner.
+        viewport = Viewport(1000, 1000, 700, 700, lod=False)
+        self.assertEqual(viewport.cell_size(), (4, 4))
+        self.assertEqual(viewport.visible_cells(), (0, 0, 175, 175))
+        viewport.pan(-40, -80)
+        self.assertEqual((viewport.left, viewport.bottom), (10, 20))
+        self.assertEqual(viewport.visible_cells(), (10, 20, 185, 195))
+        self.assertEqual(viewport.cell_to_screen(10, 20), (0, 0))
+
+        # Zooming keeps the cell under the cursor in place.
+        before = viewport.screen_to_cell(300, 200)
+        viewport.zoom_at(2, 300, 200)
+        self.assertEqual(viewport.cell_size(), (8, 8))
+        after = viewport.screen_to_cell(300, 200)
+        self.assertAlmostEqual(before[0], after[0])
+        self.assertAlmostEqual(before[1], after[1])
+        # Zooming out past the minimum is clamped.
+        viewport.zoom_at(0.01, 300, 200)
+        self.assertEqual(viewport.cell_size(), (4, 4))
+        viewport.pan(-10**6, -10**6)
+        self.assertEqual(viewport.visible_cells(), (825, 825, 1000, 1000))
+
+    @number("18.3")
+    def test_level_of_detail(self):
+        # A large grid fits the panel, drawn in blocks of at least 4 pixels.
+        viewport = Viewport(1024, 1024, 512, 512)
+        self.assertEqual(viewport.cell_size(), (0.5, 0.5))
+        self.assertEqual(viewport.level(), 3)
+        self.assertEqual(viewport.visible_cells(3), (0, 0, 128, 128))
+        viewport.zoom_at(4, 0, 0)
+        self.assertEqual(viewport.level(), 1)
+        self.assertEqual(viewport.visible_cells(1), (0, 0, 128, 128))
+        viewport.zoom_at(2, 0, 0)
+        self.assertEqual(viewport.level(), 0)
+        self.assertEqual(viewport.visible_cells(0), (0, 0, 128, 128))
+
+    @number("18.2")
+    def test_renderer_region(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10)
+        renderer = GridRenderer(10, 10, 10, 10)
+        renderer.set_view((4, 5, 7, 7), 20, 20, -5, 0)
+        self.assertEqual(len(renderer.sprites), 6)
+        self.assertEqual(renderer.sprites[0].center_x, 5)
+        self.assertEqual(renderer.sprites[0].center_y, 10)
+        # Only the cells of the region are evaluated.
+        self.assertEqual(renderer.update(grid, 0, [255, 255, 255]), 6)
+
+        grid.paint_cell(0, 0, black)
+        grid.paint_cell(5, 6, black)
+        self.assertEqual(renderer.update(grid, 1, [255, 255, 255]), 1)
+        self.assertEqual(renderer.sprites[1*2 + 1].color, (0, 0, 0))
+        self.assertFalse(renderer.refresh(0, 0, (0, 0, 0)))
+
+        # Moving the view shows the cells that were outside of it.
+        renderer.set_view((0, 0, 2, 2), 20, 20, 0, 0)
+        self.assertEqual(renderer.update(grid, 2, [255, 255, 255]), 4)
+        self.assertEqual(renderer.sprites[0].color, (0, 0, 0))
@@ -2,6 +2,7 @@ import unittest
 from ed_utils.decorators import number
 
 from layers import green, red, blue
+from array_grid import ArraySetGrid
 from grid import Grid
 from main import MyWindow
 
@@ -14,6 +15,8 @@ FakeWindow.on_reset = MyWindow.on_reset
 FakeWindow.on_paint = MyWindow.on_paint
 FakeWindow.on_increase_brush_size = MyWindow.on_increase_brush_size
 FakeWindow.on_decrease_brush_size = MyWindow.on_decrease_brush_size
+FakeWindow.grid_lock = MyWindow.grid_lock
+FakeWindow.reset_grid = MyWindow.reset_grid
 
 class TestGrid(unittest.TestCase):
 
@@ -83,6 +86,25 @@ class TestGrid(unittest.TestCase):
 
         self.assertGridEqual(grid, control_grid)
 
+    @number("6.3")
+    def test_reset_grid_type(self):
+        # A GRID_TYPE that can't hold the draw style is replaced by a Grid until the style comes back.
+        fw = FakeWindow(None)
+        fw.GRID_TYPE = ArraySetGrid
+        fw.GRID_SIZE_X = fw.GRID_SIZE_Y = 5
+        fw.worker = None
+        grids = []
+        for draw_style in (Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_ADD, Grid.DRAW_STYLE_SEQUENCE, Grid.DRAW_STYLE_SET):
+            fw.draw_style = draw_style
+            fw.reset_grid()
+            self.assertEqual(fw.grid.draw_style, draw_style)
+            grids.append(type(fw.grid))
+        self.assertEqual(grids, [ArraySetGrid, Grid, Grid, ArraySetGrid])
+
+        fw.grid[2][2].add(red)
+        fw.reset_grid()
+        self.assertEqual(fw.grid[2][2].get_color((0, 0, 0), 0, 2, 2), (0, 0, 0))
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
@@ -0,0 +1,499 @@
+from __future__ import annotations
+import sys
+from data_structures.referential_array import ArrayR
+from grid import Grid, GridColumn
+from layer_store import GridContext, LayerStore
+from layer_util import Layer
+from memory import array_bytes, change, merge, object_bytes
+
+class Tile:
+    """
+    Square block of layer stores. A tile may be shared by several grids; only the grid set as its
+    owner may change it in place, every other grid copies it first (copy-on-write).
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    __slots__ = ("size", "stores", "owner", "context")
+
+    def __init__(self, size: int, stores: ArrayR[LayerStore], owner: TiledGrid|None, context: GridContext) -> None:
+        """
+        Description: Initialise the tile
+
+        Args:
+        - size: width and height of the tile
+        - stores: size*size stores, column by column, all using context
+        - owner: grid allowed to write to the tile, None if the tile is shared
+        - context: context shared by the stores of this tile only, so grid-wide specials on one grid
+          don't reach tiles it shares with another
+
+        Time complexity:
+        Best = Worst case: O(count_usage)
+        """
+        self.size = size
+        self.stores = stores
+        self.owner = owner
+        self.context = context
+        self.count_usage()
+
+    def __getitem__(self, index: int) -> LayerStore:
+        return self.stores[index]
+
+    def count_usage(self) -> None:
+        """
+        Description: Count the memory usage of the tile and its stores from scratch, into the context.
+        The count is kept up to date from then on by TiledGrid.paint_cell and erase_cell, and by the
+        stores while they are read, see GridContext.usage.
+
+        Time complexity:
+        Best = Worst case: O(size*size*memory_usage)
+        """
+        usage = {"tiles": object_bytes(self) + array_bytes(self.stores)}
+        for i in range(len(self.stores)):
+            merge(usage, self.stores[i].memory_usage())
+        self.context.usage = usage
+
+    def copy(self, owner: TiledGrid) -> Tile:
+        """
+        Description: Returns an independent tile with copies of every store
+
+        Args:
+        - owner: grid the new tile belongs to
+
+        Time complexity:
+        Best = Worst case: O(size*size*copy)
+        """
+        context = GridContext()
+        context.special_count = self.context.special_count
+        stores = ArrayR(len(self.stores))
+        for i in range(len(self.stores)):
+            stores[i] = self.stores[i].copy()
+            stores[i].context = context
+        return Tile(self.size, stores, owner, context)
+
+
+class TiledGrid(Grid):
+    """
+    Grid split into TILE_SIZE x TILE_SIZE tiles. Tiles are only created once a cell in them is
+    written, and are shared between grids until one of them writes to the tile. Forking,
+    comparing or swapping canvases therefore costs O(tiles) instead of O(x*y).
+
+    Grid-wide specials don't write to shared tiles either: the grid reads them with its own context
+    instead (see shared_contexts), which is folded into the tile once the grid writes to it.
+
+    Each tile keeps a running count of its memory usage, so memory_usage is O(tiles) rather than O(x*y).
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    TILE_SIZE = 32
+
+    def __init__(self, draw_style: str, x: int, y: int) -> None:
+        """
+        Description: Initialise the tiled grid object.
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        - x: x dimension of the grid
+        - y: y dimension of the grid
+
+        Time complexity:
+        Best = Worst case: O(x), no tile is created until it is written
+        """
+        self.draw_style = draw_style
+        self.x = x
+        self.y = y
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+
+        # written tiles, keyed by (x // TILE_SIZE, y // TILE_SIZE)
+        self.tiles = {}
+
+        # context of the blank store, each tile has its own. The blank store is measured by memory_usage,
+        # so its usage is not counted.
+        self.context = GridContext()
+
+        # contexts the cells of shared tiles are read with, keyed like tiles, for the shared tiles this grid
+        # applied grid-wide specials to. Their special count is the tile's own plus those specials.
+        self.shared_contexts = {}
+
+        # every cell of an unwritten tile reads from this store, new tiles start as copies of it
+        self.blank = self.new_store()
+
+        # cells changed since the renderer last took them, see take_dirty
+        self.dirty = set()
+        self.all_dirty = True
+
+        # O(x)
+        self.grid = ArrayR(x)
+        for i in range(len(self.grid)):
+            self.grid[i] = GridColumn(self, i)
+
+    def cell(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return a store view of a single cell
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - store view which copies the cell's tile before writing to it if the tile is shared
+        """
+        return TiledCell(self, x, y)
+
+    def tile_key(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Description: return the key of the tile holding a cell
+        """
+        return (x // TiledGrid.TILE_SIZE, y // TiledGrid.TILE_SIZE)
+
+    def tile_index(self, x: int, y: int) -> int:
+        """
+        Description: return the position of a cell inside its tile
+        """
+        return (x % TiledGrid.TILE_SIZE) * TiledGrid.TILE_SIZE + y % TiledGrid.TILE_SIZE
+
+    def read_store(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return the store of a cell for reading only
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - the store in the cell's tile, or the blank store if the tile was never written
+        """
+        tile = self.tiles.get(self.tile_key(x, y))
+        if tile is None:
+            return self.blank
+        return tile[self.tile_index(x, y)]
+
+    def read_context(self, x: int, y: int) -> GridContext|None:
+        """
+        Description: return the context a cell must be read with, see shared_contexts
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - the context, or None if the cell's store is read with its own
+        """
+        if not self.shared_contexts:
+            return None
+        return self.shared_contexts.get(self.tile_key(x, y))
+
+    def write_store(self, x: int, y: int) -> LayerStore:
+        """
+        Description: return the store of a cell for writing
+
+        Args:
+        - x: x coordinate of the cell
+        - y: y coordinate of the cell
+
+        Returns:
+        - the store in the cell's tile, after the tile is created or copied if needed
+
+        Time complexity:
+        Best case: O(1), when this grid already owns the tile
+        Worst case: O(TILE_SIZE**2*copy), when the tile is created or copied
+        """
+        return self.writable_tile(self.tile_key(x, y))[self.tile_index(x, y)]
+
+    def writable_tile(self, key: tuple[int, int]) -> Tile:
+        """
+        Description: return a tile owned by this grid, creating or copying it if needed
+
+        Args:
+        - key: key of the tile
+
+        Time complexity:
+        Best case: O(1), when this grid already owns the tile
+        Worst case: O(TILE_SIZE**2*copy), when the tile is created or copied
+        """
+        tile = self.tiles.get(key)
+        if tile is None:
+            context = GridContext()
+            context.special_count = self.context.special_count
+            stores = ArrayR(TiledGrid.TILE_SIZE * TiledGrid.TILE_SIZE)
+            for i in range(len(stores)):
+                stores[i] = self.blank.copy()
+                stores[i].context = context
+            tile = Tile(TiledGrid.TILE_SIZE, stores, self, context)
+            self.tiles[key] = tile
+        elif tile.owner is not self:
+            tile = tile.copy(self)
+            shared_context = self.shared_contexts.pop(key, None)
+            if shared_context is not None:
+                tile.context.special_count = shared_context.special_count
+            self.tiles[key] = tile
+        return tile
+
+    def get_tile(self, key: tuple[int, int]) -> Tile|None:
+        """
+        Description: return a tile so that it can be kept or swapped into another grid.
+        The tile becomes shared, so later writes from this grid copy it first.
+
+        Args:
+        - key: key of the tile
+
+        Returns:
+        - the tile, or None if it was never written
+
+        Time complexity:
+        Best case: O(1)
+        Worst case: O(TILE_SIZE**2*copy), when the tile is shared and this grid applied specials to it
+        since, which have to be written into a copy of it first
+        """
+        if key in self.shared_contexts:
+            self.writable_tile(key)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            tile.owner = None
+        return tile
+
+    def set_tile(self, key: tuple[int, int], tile: Tile|None) -> None:
+        """
+        Description: swap a whole tile into the grid, sharing it with wherever it came from.
+        Tiles must come from a grid with the same draw style.
+
+        Args:
+        - key: key of the tile
+        - tile: tile to place, or None to reset it to blank
+        """
+        self.shared_contexts.pop(key, None)
+        if tile is None:
+            self.tiles.pop(key, None)
+        else:
+            tile.owner = None
+            self.tiles[key] = tile
+        self.mark_all_dirty()
+
+    def fork(self) -> TiledGrid:
+        """
+        Description: return a copy of the grid which shares every tile with this one
+
+        Time complexity:
+        Best = Worst case: O(x+tiles)
+        """
+        grid = TiledGrid(self.draw_style, self.x, self.y)
+        grid.brush_size = self.brush_size
+        grid.context.special_count = self.context.special_count
+        grid.blank = self.blank.copy()
+        grid.blank.context = grid.context
+        for key, tile in self.tiles.items():
+            tile.owner = None
+            grid.tiles[key] = tile
+        for key, shared_context in self.shared_contexts.items():
+            grid.shared_contexts[key] = GridContext()
+            grid.shared_contexts[key].special_count = shared_context.special_count
+            grid.shared_contexts[key].usage = shared_context.usage
+        return grid
+
+    def tile_special_count(self, key: tuple[int, int]) -> int:
+        """
+        Description: return the special count a written tile is read with by this grid
+        """
+        shared_context = self.shared_contexts.get(key)
+        if shared_context is not None:
+            return shared_context.special_count
+        return self.tiles[key].context.special_count
+
+    def changed_tiles(self, other: TiledGrid) -> list[tuple[int, int]]:
+        """
+        Description: return the keys of tiles that are not shared with another grid, or that one of them
+        applied grid-wide specials to since
+
+        Args:
+        - other: grid to compare with
+
+        Time complexity:
+        Best = Worst case: O(tiles)
+        """
+        keys = []
+        for key, tile in self.tiles.items():
+            if other.tiles.get(key) is not tile or self.tile_special_count(key) != other.tile_special_count(key):
+                keys.append(key)
+        for key in other.tiles:
+            if key not in self.tiles:
+                keys.append(key)
+        return keys
+
+    def paint_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Add a layer to a cell, see Grid.paint_cell. The change in memory usage is counted
+        by the cell's tile, which is created or copied first if needed.
+
+        Time complexity:
+        Best case: O(add+memory_usage), when this grid already owns the tile
+        Worst case: O(add+TILE_SIZE**2*(copy+memory_usage)), when the tile is created or copied
+        """
+        tile = self.writable_tile(self.tile_key(x, y))
+        store = tile[self.tile_index(x, y)]
+        before = store.memory_usage()
+        changed = store.add(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            change(tile.context.usage, before, store.memory_usage())
+        return changed
+
+    def erase_cell(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Description: Erase a layer from a cell, see paint_cell. Cells of unwritten tiles have nothing to erase.
+
+        Time complexity:
+        Best case: O(1), when the tile of the cell was never written
+        Worst case: O(erase+TILE_SIZE**2*(copy+memory_usage)), when the tile is copied
+        """
+        key = self.tile_key(x, y)
+        if key not in self.tiles:
+            return False
+        tile = self.writable_tile(key)
+        store = tile[self.tile_index(x, y)]
+        before = store.memory_usage()
+        changed = store.erase(layer)
+        if changed:
+            self.mark_dirty(x, y)
+            change(tile.context.usage, before, store.memory_usage())
+        return changed
+
+    def memory_usage(self) -> dict[str, dict[str, int]]:
+        """
+        Description: Approximate bytes used by the grid, keyed by draw style and split by category.
+        Tiles shared with other grids are counted by each of them. The running counts of the tiles are
+        kept up to date like the ones of Grid, see Grid.memory_usage and Tile.count_usage.
+
+        Time complexity:
+        Best = Worst case: O(t*c+memory_usage), where t is the number of written tiles, c the number of
+        categories, and memory_usage the complexity of the blank store's
+        """
+        usage = {"grid": object_bytes(self) + array_bytes(self.grid) + self.column_views_bytes()}
+        usage["grid"] += sys.getsizeof(self.tiles) + sys.getsizeof(self.shared_contexts)
+        usage["grid"] += len(self.shared_contexts) * object_bytes(self.context)
+        merge(usage, self.blank.memory_usage())
+        for tile in self.tiles.values():
+            merge(usage, tile.context.usage)
+        return {self.draw_style: usage}
+
+    def clear(self) -> None:
+        """
+        Description: Empty the grid. Every tile is dropped, so only the blank store is kept.
+
+        Time complexity:
+        Best = Worst case: O(1), ignoring the release of the dropped tiles
+        """
+        self.brush_size = Grid.DEFAULT_BRUSH_SIZE
+        self.context.special_count = 0
+        self.mark_all_dirty()
+        self.tiles = {}
+        self.shared_contexts = {}
+        self.blank.clear()
+
+    def reinitialise(self, draw_style: str) -> None:
+        """
+        Description: Empty the grid and switch it to a draw style
+
+        Args:
+        - draw_style: Style with which colours will be drawn
+        """
+        if draw_style != self.draw_style:
+            self.draw_style = draw_style
+            self.blank = self.new_store()
+        self.clear()
+
+    def special(self):
+        """
+        Description: Activate the special affect on all grid squares.
+
+        Time complexity:
+        Best case: O(t), if draw style set to Set or Additive Layer store, where t is the number of written
+        tiles. Only the special count of each tile's context changes, see Grid.special, or the one of this
+        grid's shared context for the tile if the tile is shared, so shared tiles stay shared.
+        Worst case: O(t*TILE_SIZE**2*special), for Sequence Layer store. Unwritten tiles share the blank
+        store, so they are handled by a single call.
+        """
+        self.mark_all_dirty()
+        if self.special_is_shared():
+            self.context.special_count += 1
+            for key, tile in self.tiles.items():
+                if tile.owner is self:
+                    tile.context.special_count += 1
+                    continue
+                shared_context = self.shared_contexts.get(key)
+                if shared_context is None:
+                    shared_context = GridContext()
+                    shared_context.special_count = tile.context.special_count
+                    shared_context.usage = tile.context.usage
+                    self.shared_contexts[key] = shared_context
+                shared_context.special_count += 1
+            return
+        self.blank.special()
+        for key in list(self.tiles):
+            tile = self.writable_tile(key)
+            for i in range(len(tile.stores)):
+                tile[i].special()
+            tile.count_usage()
+
+
+class TiledCell(LayerStore):
+    """
+    Store view of one cell of a TiledGrid.
+    """
+
+    __slots__ = ("grid", "x", "y")
+
+    def __init__(self, grid: TiledGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        return self.grid.write_store(self.x, self.y).add(layer)
+
+    def read(self, method: str, *args):
+        """
+        Calls a method of the cell's store by name, with the context the grid reads the cell with (see
+        TiledGrid.read_context) in place of the store's own during the call.
+        """
+        store = self.grid.read_store(self.x, self.y)
+        context = self.grid.read_context(self.x, self.y)
+        if context is None:
+            return getattr(store, method)(*args)
+        own, store.context = store.context, context
+        try:
+            return getattr(store, method)(*args)
+        finally:
+            store.context = own
+
+    def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        return self.read("get_color", start, timestamp, x, y)
+
+    def erase(self, layer: Layer) -> bool:
+        if self.grid.tile_key(self.x, self.y) not in self.grid.tiles:
+            return False  # an empty store has nothing to erase
+        return self.grid.write_store(self.x, self.y).erase(layer)
+
+    def layer_indices(self) -> list[int]:
+        return self.grid.read_store(self.x, self.y).layer_indices()
+
+    def compute_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
+        return self.read("compute_color", start, timestamp, x, y)
+
+    def special(self):
+        self.grid.write_store(self.x, self.y).special()
+
+    def copy(self) -> LayerStore:
+        store = self.grid.read_store(self.x, self.y).copy()
+        context = self.grid.read_context(self.x, self.y)
+        if context is not None:
+            store.context = context
+        return store
+
+    def clear(self) -> None:
+        if self.grid.tile_key(self.x, self.y) in self.grid.tiles:
+            self.grid.write_store(self.x, self.y).clear()
+
+    def memory_usage(self) -> dict[str, int]:
+        # the cell's store is counted by the grid
+        return {"views": sys.getsizeof(self)}
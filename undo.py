@@ -2,6 +2,7 @@ from __future__ import annotations
 from action import PaintAction
 from grid import Grid
 from data_structures.stack_adt import ArrayStack
+from memory import array_bytes, object_bytes
 
 class UndoTracker:
     """
@@ -20,6 +21,13 @@ class UndoTracker:
         self.tree = ArrayStack(UndoTracker.CAPACITY)
         self.branch = ArrayStack(UndoTracker.CAPACITY)
 
+        # running memory_usage, see memory_usage. The stacks have fixed capacities, only the actions change.
+        self.slot_bytes = 0
+        for stack in (self.tree, self.branch):
+            self.slot_bytes += object_bytes(stack) + array_bytes(stack.array)
+        self.tree_bytes = 0
+        self.branch_bytes = 0
+
     def add_action(self, action: PaintAction) -> None:
         """
         Description: Adds an action to the undo tracker. When collection full, exit early
@@ -30,7 +38,9 @@ class UndoTracker:
         if self.tree.is_full():
             return  # exit early
         self.tree.push(action)
+        self.tree_bytes += action.nbytes()
         self.branch.clear()  # new action clears redo branch
+        self.branch_bytes = 0
 
     def undo(self, grid: Grid) -> PaintAction|None:
         """
@@ -50,6 +60,8 @@ class UndoTracker:
         else:
             undo_action = self.tree.pop()
             self.branch.push(undo_action)
+            self.tree_bytes -= undo_action.nbytes()
+            self.branch_bytes += undo_action.nbytes()
 
             # O(undo_apply)
             undo_action.undo_apply(grid)
@@ -73,8 +85,22 @@ class UndoTracker:
         else:
             redo_action = self.branch.pop()
             self.tree.push(redo_action)
+            self.branch_bytes -= redo_action.nbytes()
+            self.tree_bytes += redo_action.nbytes()
 
             # O(redo_apply)
             redo_action.redo_apply(grid)
             return redo_action
 
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Description: Approximate bytes used by the undo and redo stacks and their actions, kept up to date
+        by add_action, undo and redo. Actions also held by the ReplayTracker are counted by both.
+
+        Returns:
+        - bytes by category, see memory.py
+        """
+        usage = {"history_slots": self.slot_bytes}
+        if self.tree_bytes + self.branch_bytes > 0:
+            usage["history"] = self.tree_bytes + self.branch_bytes
+        return usage
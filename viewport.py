@@ -0,0 +1,127 @@
+from __future__ import annotations
+import math
+
+class Viewport:
+    """
+    Part of a grid shown in the drawing panel. At zoom 1 the whole grid fits the panel, as cells of
+    fit_width by fit_height pixels. Zooming in makes cells bigger, and panning moves the visible part,
+    so only the visible cells need to be evaluated and drawn.
+
+    Positions in cells are floats: left and bottom are the cell coordinates shown at the bottom left
+    corner of the panel.
+
+    When cells are smaller than MIN_CELL_PIXELS, they are drawn in blocks from a level of detail of a
+    Mipmap instead (see level), so the number of blocks drawn depends on the panel, not the grid.
+
+    Complexity of class methods are O(1), unless otherwise specified
+    """
+
+    # cells or blocks are never drawn smaller than this
+    MIN_CELL_PIXELS = 4
+    MAX_CELL_PIXELS = 200
+
+    def __init__(self, grid_x: int, grid_y: int, width: float, height: float, lod: bool = True) -> None:
+        """
+        Description: Initialise a viewport showing as much of the grid as fits, from its bottom left corner
+
+        Args:
+        - grid_x: x dimension of the grid
+        - grid_y: y dimension of the grid
+        - width: width of the drawing panel in pixels
+        - height: height of the drawing panel in pixels
+        - lod: if the grid can be zoomed out until it fits, drawing blocks of cells. Otherwise large grids
+          start zoomed in, so cells are at least MIN_CELL_PIXELS.
+        """
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.width = width
+        self.height = height
+        self.fit_width = width / grid_x
+        self.fit_height = height / grid_y
+        self.lod = lod
+        self.min_zoom = 1.0 if lod else max(1.0, Viewport.MIN_CELL_PIXELS / min(self.fit_width, self.fit_height))
+        self.max_zoom = max(self.min_zoom, Viewport.MAX_CELL_PIXELS / min(self.fit_width, self.fit_height))
+        self.zoom = self.min_zoom
+        self.left = 0.0
+        self.bottom = 0.0
+
+    def cell_size(self) -> tuple[float, float]:
+        """
+        Description: Returns the width and height of a cell on screen
+        """
+        return (self.fit_width * self.zoom, self.fit_height * self.zoom)
+
+    def screen_to_cell(self, x: float, y: float) -> tuple[float, float]:
+        """
+        Description: Returns the cell coordinates under a position in the panel
+        """
+        width, height = self.cell_size()
+        return (self.left + x / width, self.bottom + y / height)
+
+    def cell_to_screen(self, x: float, y: float) -> tuple[float, float]:
+        """
+        Description: Returns the position in the panel of cell coordinates
+        """
+        width, height = self.cell_size()
+        return ((x - self.left) * width, (y - self.bottom) * height)
+
+    def level(self) -> int:
+        """
+        Description: Returns the level of detail to draw, the smallest l such that blocks of 2**l by 2**l
+        cells are at least MIN_CELL_PIXELS, 0 when cells are big enough
+
+        Time complexity:
+        Best case: O(1), when cells are big enough
+        Worst case: O(log(max(grid_x, grid_y)))
+        """
+        size = min(self.cell_size())
+        level = 0
+        while size * 2**level < Viewport.MIN_CELL_PIXELS and 2**level < max(self.grid_x, self.grid_y):
+            level += 1
+        return level
+
+    def visible_cells(self, level: int = 0) -> tuple[int, int, int, int]:
+        """
+        Description: Returns x0, y0, x1, y1 such that the blocks x0 <= x < x1, y0 <= y < y1 of a level cover
+        the panel. Blocks of level 0 are cells, and block x, y of level l starts at cell x*2**l, y*2**l.
+        """
+        width, height = self.cell_size()
+        block = 2**level
+        x0 = max(0, math.floor(self.left / block))
+        y0 = max(0, math.floor(self.bottom / block))
+        x1 = min(math.ceil(self.grid_x / block), math.ceil((self.left + self.width / width) / block))
+        y1 = min(math.ceil(self.grid_y / block), math.ceil((self.bottom + self.height / height) / block))
+        return (x0, y0, max(x1, x0+1), max(y1, y0+1))
+
+    def pan(self, dx: float, dy: float) -> None:
+        """
+        Description: Move the grid by dx, dy pixels on screen, keeping it inside the panel
+        """
+        width, height = self.cell_size()
+        self.left -= dx / width
+        self.bottom -= dy / height
+        self.clamp()
+
+    def zoom_at(self, factor: float, x: float, y: float) -> None:
+        """
+        Description: Multiply the zoom by factor, keeping the cell under the panel position x, y in place
+
+        Args:
+        - factor: more than 1 to zoom in, less than 1 to zoom out
+        - x: x position in the panel
+        - y: y position in the panel
+        """
+        cell_x, cell_y = self.screen_to_cell(x, y)
+        self.zoom = min(self.max_zoom, max(self.min_zoom, self.zoom * factor))
+        width, height = self.cell_size()
+        self.left = cell_x - x / width
+        self.bottom = cell_y - y / height
+        self.clamp()
+
+    def clamp(self) -> None:
+        """
+        Description: Keep the visible part inside the grid
+        """
+        width, height = self.cell_size()
+        self.left = min(max(0.0, self.left), max(0.0, self.grid_x - self.width / width))
+        self.bottom = min(max(0.0, self.bottom), max(0.0, self.grid_y - self.height / height))